@@ -0,0 +1,119 @@
+"""
+Compares the sync and async search paths against a local stand-in ES.
+
+    cd backend
+    python -m benchmarks.bench_async_search --requests 2000 --delay 0.05
+
+The sync path runs `fetch_media` on a pool of `--sync-workers` threads,
+which models that many gunicorn sync workers each blocked for the full
+ES round trip. The async path runs `async_fetch_media` on one event loop
+with up to `--concurrency` searches in flight.
+
+A search that fails or comes back without hits aborts the run: timing
+errors would only measure how fast the stand-in can refuse requests.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .stub_es_server import StubESServer, use_stub
+
+
+class BenchmarkError(Exception):
+    """Some searches failed or returned nothing; the timings are meaningless."""
+
+
+def check(outcomes):
+    """Returns the latencies, or raises BenchmarkError if any search failed."""
+    failures = [outcome for outcome in outcomes if isinstance(outcome, str)]
+    if failures:
+        raise BenchmarkError(f"{len(failures)} of {len(outcomes)} searches failed, e.g. {failures[0]}")
+    return outcomes
+
+
+def outcome(hits, started):
+    """The latency of a search, or why it does not count."""
+    if not hits:
+        return "empty result page"
+    return time.perf_counter() - started
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, latencies, elapsed):
+    print(
+        f"{label:<6} requests={len(latencies):<6} "
+        f"throughput={len(latencies) / elapsed:9.1f} req/s  "
+        f"p50={statistics.median(latencies) * 1000:7.1f} ms  "
+        f"p99={percentile(latencies, 99) * 1000:7.1f} ms"
+    )
+
+
+def run_sync(es_client, total, workers):
+    def one(_):
+        started = time.perf_counter()
+        try:
+            hits, _ = es_client.fetch_media(query="Barcelona", page=1, page_size=10)
+        except Exception as e:
+            return repr(e)
+        return outcome(hits, started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(one, range(total)))
+    return check(outcomes), time.perf_counter() - started
+
+
+async def run_async(es_client, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                hits, _ = await es_client.async_fetch_media(query="Barcelona", page=1, page_size=10)
+            except Exception as e:
+                return repr(e)
+            return outcome(hits, started)
+
+    try:
+        # Warm the connection pool before timing
+        check([await one()])
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await es_client.get_async_es().close()
+    return check(outcomes), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--delay", type=float, default=0.05, help="stand-in ES latency in seconds")
+    parser.add_argument("--sync-workers", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    args = parser.parse_args()
+
+    with StubESServer(delay=args.delay) as server:
+        use_stub(server)
+        os.environ["ES_ASYNC_CONNECTIONS"] = str(args.concurrency)
+        from media_api import es_client
+
+        print(f"stand-in ES at {server.url}, delay={args.delay * 1000:.0f} ms")
+        try:
+            report("sync", *run_sync(es_client, args.requests, args.sync_workers))
+            report("async", *asyncio.run(run_async(es_client, args.requests, args.concurrency)))
+        except BenchmarkError as e:
+            parser.exit(1, f"Aborted: {e}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Payload size and latency of search responses per `fields=` preset.
+
+    cd backend
+    python -m benchmarks.bench_field_projection            # local stand-in ES
+    python -m benchmarks.bench_field_projection --live     # ES_HOST from .env
+
+For every preset this times `fetch_media` plus `normalize_hit` over
+`--rounds` searches and reports the mean latency and the size of the JSON
+body the API would return for one page. A preset whose search fails or
+returns no hits aborts the run instead of being reported.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from .bench_async_search import BenchmarkError
+from .stub_es_server import StubESServer, use_stub
+
+PRESETS = ("full", "detail", "card")
+
+
+def measure(es_client, preset, query, page_size, rounds):
+    fields = es_client.resolve_source_fields(preset)
+    latencies = []
+    payload = b""
+    for _ in range(rounds):
+        started = time.perf_counter()
+        hits, _ = es_client.fetch_media(query=query, page_size=page_size, fields=fields)
+        if not hits:
+            raise BenchmarkError(f"{preset!r}: the search for {query!r} returned no hits")
+        results = [es_client.normalize_hit(hit) for hit in hits]
+        latencies.append(time.perf_counter() - started)
+        payload = json.dumps({"results": results}).encode("utf-8")
+    return statistics.mean(latencies), len(payload)
+
+
+def run(query, page_size, rounds):
+    from media_api import es_client
+
+    print(f"{'preset':<8} {'bytes/page':>12} {'bytes/hit':>10} {'mean ms':>9}")
+    for preset in PRESETS:
+        latency, size = measure(es_client, preset, query, page_size, rounds)
+        print(f"{preset:<8} {size:>12} {size // max(page_size, 1):>10} {latency * 1000:>9.2f}")
+
+
+def use_live():
+    """ES_HOST, ES_INDEX and credentials from .env, as the server reads them."""
+    from django.conf import settings
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    if not os.getenv("ES_INDEX"):
+        raise BenchmarkError("ES_INDEX is not set")
+    if not settings.configured:
+        settings.configure()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="query ES_HOST instead of the stand-in server")
+    parser.add_argument("--query", default="Barcelona")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    try:
+        if args.live:
+            use_live()
+            run(args.query, args.page_size, args.rounds)
+            return
+
+        with StubESServer(delay=0) as server:
+            use_stub(server)
+            run(args.query, args.page_size, args.rounds)
+    except Exception as e:
+        parser.exit(1, f"Aborted: {e}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Search latency with and without index sorting on `bildnummer desc, db asc`.
+
+    cd backend
+    python -m benchmarks.bench_index_sort
+    python -m benchmarks.bench_index_sort --docs 1000000 --pages 5
+
+Runs on a media_api.fake_es synthetic corpus. Each search walks `--pages`
+pages with search_after, the way infinite scroll does.
+
+"before" models the index without the template. The corpus has
+`index_sorted = False`, so every match is collected and sorted, and each
+page is counted up to the default track_total_hits. "after" models the
+sorted index and the current search path. Pages come off the sorted
+corpus, and pages after the first skip counting (track_total_hits=false),
+because search_utils reuses the total of page 1.
+
+The fake only stands in for Lucene's early termination. Compare absolute
+numbers on a real cluster with indices built with and without the
+template.
+"""
+import argparse
+import os
+import statistics
+import time
+
+WORKLOAD = {
+    "match_all": {},
+    "common_term": {"query": "Berlin"},
+    "rare_term": {"query": "Pokal3"},
+    # The most frequent photographer of the corpus is filled in by run()
+    "fotograf": {"fotografen": None},
+    "date_range": {"datum_von": "2010-01-01", "datum_bis": "2015-12-31"},
+}
+
+
+def walk(store, build_search_body, search, pages, page_size, skip_later_counts):
+    latencies = []
+    search_after = None
+    for page in range(pages):
+        track_total_hits = False if skip_later_counts and page else None
+        body = build_search_body(
+            page_size=page_size, search_after=search_after, track_total_hits=track_total_hits, **search
+        )
+        started = time.perf_counter()
+        hits = store.search(body=body)["hits"]["hits"]
+        latencies.append(time.perf_counter() - started)
+        if len(hits) < page_size:
+            break
+        search_after = hits[-1]["sort"]
+    return latencies
+
+
+def run(docs, pages, page_size, rounds):
+    from media_api.es_client import build_search_body
+    from media_api.fake_es import FakeElasticsearch
+
+    print(f"building a {docs}-document corpus ...")
+    store = FakeElasticsearch.synthetic(docs, seed=7)
+    WORKLOAD["fotograf"]["fotografen"] = store.keyword_values["fotografen"][:1]
+    print(f"{'search':<12} {'path':<7} {'ms/page':>9} {'p95 ms':>8} {'speedup':>8}")
+    for name, search in WORKLOAD.items():
+        baseline = None
+        for path, sorted_index in (("before", False), ("after", True)):
+            store.index_sorted = sorted_index
+            latencies = []
+            for _ in range(rounds):
+                latencies += walk(store, build_search_body, search, pages, page_size, sorted_index)
+            mean = statistics.mean(latencies)
+            p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+            baseline = baseline or mean
+            print(f"{name:<12} {path:<7} {mean * 1e3:>9.2f} {p95 * 1e3:>8.2f} {baseline / mean:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200000)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "imago_backend.settings")
+    import django
+    django.setup()
+
+    run(args.docs, args.pages, args.page_size, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Load and latency benchmark for /api/media/search/ and search/by-*.
+
+    cd backend
+    python -m benchmarks.bench_load                              # in-process, fake ES
+    python -m benchmarks.bench_load --requests 5000 --concurrency 8 --output run.json
+    python -m benchmarks.bench_load --compare baseline.json --output run.json
+    python -m benchmarks.bench_load --url http://127.0.0.1:8000/api/media
+
+By default the Django views are driven through the test client, with
+es_client serving from media_api.fake_es (ES_FAKE_CORPUS documents), so
+no network or cluster is involved and the numbers reflect views.py,
+search_utils.py and es_client.py alone. With --url the same workload is
+sent over HTTP to a running server (start it with ES_FAKE_CORPUS set for
+the same stand-in).
+
+The workload is a seeded mix of text, bildnummer, date and photographer
+searches, deep pages and search_after chains. Latency percentiles and
+throughput come from a timed pass; allocations per request come from a
+separate tracemalloc pass over a sample, so tracing does not skew the
+latencies. Results are written as JSON so runs can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from .bench_async_search import percentile
+
+# Scenario weights of the default mix
+WORKLOAD_MIX = {
+    "text": 30,
+    "bildnummer": 10,
+    "by_bildnummer": 5,
+    "date": 15,
+    "by_fotograf": 15,
+    "deep_page": 10,
+    "search_after_chain": 15,
+}
+
+CHAIN_LENGTH = 5
+
+
+def build_workload(count, corpus_size, seed=0):
+    """
+    A reproducible list of scenarios. Each is (name, path, params, follow)
+    where `follow` is the number of further pages fetched by passing the
+    previous response's next_search_after.
+    """
+    from media_api.fake_es import SYNTHETIC_SURNAMES, SYNTHETIC_WORDS
+
+    rng = random.Random(seed)
+    names, weights = zip(*WORKLOAD_MIX.items())
+    workload = []
+    for name in rng.choices(names, weights, k=count):
+        words = " ".join(rng.sample(SYNTHETIC_WORDS, rng.randint(1, 2)))
+        if name == "text":
+            workload.append((name, "search/", {"q": words, "page_size": rng.choice((10, 20, 50))}, 0))
+        elif name == "bildnummer":
+            workload.append((name, "search/", {"q": str(rng.randint(1, corpus_size))}, 0))
+        elif name == "by_bildnummer":
+            workload.append((name, "search/by-bildnummer/", {"bildnummer": str(rng.randint(1, corpus_size))}, 0))
+        elif name == "date":
+            year = rng.randint(2001, 2024)
+            workload.append((name, "search/by-datum/", {
+                "datum_von": f"{year}-{rng.randint(1, 6):02d}-01",
+                "datum_bis": f"{year}-{rng.randint(7, 12):02d}-28",
+            }, 0))
+        elif name == "by_fotograf":
+            fotograf = f"IMAGO / {rng.choice(SYNTHETIC_SURNAMES)} {rng.randint(0, 40):03d}"
+            workload.append((name, "search/by-fotograf/", {"fotograf": fotograf}, 0))
+        elif name == "deep_page":
+            workload.append((name, "search/", {"q": words, "page": rng.randint(20, 200), "page_size": 20}, 0))
+        else:
+            workload.append((name, "search/", {"q": words, "page_size": 20}, CHAIN_LENGTH - 1))
+    return workload
+
+
+class InProcessClient:
+    """Drives the views through django.test.Client; one per thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def get(self, path, params):
+        from django.test import Client
+
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = Client()
+        response = client.get(f"/api/media/{path}", params)
+        return response.status_code, response.content
+
+
+class HTTPClient:
+    def __init__(self, base_url):
+        import requests
+
+        self.base_url = base_url.rstrip("/")
+        self._local = threading.local()
+        self._requests = requests
+
+    def get(self, path, params):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        response = session.get(f"{self.base_url}/{path}", params=params, verify=False)
+        return response.status_code, response.content
+
+
+def run_scenario(client, scenario, samples):
+    """Runs one scenario; appends (name, seconds, status) per request."""
+    name, path, params, follow = scenario
+    params = dict(params)
+    for step in range(follow + 1):
+        started = time.perf_counter()
+        status, content = client.get(path, params)
+        samples.append((name, time.perf_counter() - started, status))
+        if step == follow or status != 200:
+            return
+        search_after = json.loads(content).get("next_search_after")
+        if search_after is None:
+            return
+        params["search_after"] = json.dumps(search_after)
+
+
+def timed_pass(client, workload, concurrency):
+    samples = []
+    started = time.perf_counter()
+    if concurrency == 1:
+        for scenario in workload:
+            run_scenario(client, scenario, samples)
+    else:
+        # list.append is atomic, so the threads can share `samples`
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda scenario: run_scenario(client, scenario, samples), workload))
+    return samples, time.perf_counter() - started
+
+
+def allocation_pass(client, workload):
+    """Peak traced bytes and net live blocks per request, by scenario."""
+    allocations = defaultdict(list)
+    tracemalloc.start()
+    try:
+        for scenario in workload:
+            samples = []
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            run_scenario(client, scenario, samples)
+            after, peak = tracemalloc.get_traced_memory()
+            requests_made = len(samples)
+            allocations[scenario[0]].append(((peak - before) / requests_made, (after - before) / requests_made))
+    finally:
+        tracemalloc.stop()
+    return {
+        name: {
+            "peak_kib_per_request": round(sum(peak for peak, _ in values) / len(values) / 1024, 1),
+            "retained_bytes_per_request": round(sum(net for _, net in values) / len(values)),
+        }
+        for name, values in allocations.items()
+    }
+
+
+def summarize(samples, elapsed):
+    def stats(entries):
+        latencies = [seconds for _, seconds, _ in entries]
+        return {
+            "requests": len(entries),
+            "errors": sum(1 for _, _, status in entries if status != 200),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "max_ms": round(max(latencies) * 1000, 3),
+        }
+
+    by_scenario = defaultdict(list)
+    for sample in samples:
+        by_scenario[sample[0]].append(sample)
+    overall = stats(samples)
+    overall["throughput_rps"] = round(len(samples) / elapsed, 1)
+    return overall, {name: stats(entries) for name, entries in sorted(by_scenario.items())}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result, baseline=None):
+    def delta(current, previous, higher_is_better=False):
+        if previous in (None, 0):
+            return ""
+        change = (current - previous) / previous * 100
+        better = change > 0 if higher_is_better else change < 0
+        return f" ({change:+.1f}%{'' if better or abs(change) < 1 else ' !'})"
+
+    overall = result["overall"]
+    base_overall = (baseline or {}).get("overall", {})
+    print(f"rev={result['meta']['git_revision']} corpus={result['meta']['corpus']} "
+          f"concurrency={result['meta']['concurrency']} cache={result['meta']['cache']}")
+    print(f"throughput {overall['throughput_rps']} req/s"
+          f"{delta(overall['throughput_rps'], base_overall.get('throughput_rps'), True)}")
+    print(f"{'scenario':<20} {'reqs':>6} {'err':>4} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16} {'peak KiB':>9}")
+    rows = [("overall", overall)] + list(result["scenarios"].items())
+    for name, stats in rows:
+        base = base_overall if name == "overall" else (baseline or {}).get("scenarios", {}).get(name, {})
+        allocation = result["allocations"].get(name, {}).get("peak_kib_per_request", "")
+        cells = [
+            f"{stats[key]:.2f}{delta(stats[key], base.get(key))}".rjust(16)
+            for key in ("p50_ms", "p95_ms", "p99_ms")
+        ]
+        print(f"{name:<20} {stats['requests']:>6} {stats['errors']:>4} {' '.join(cells)} {allocation:>9}")
+
+
+def setup_in_process(corpus, cache):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "imago_backend.settings")
+    os.environ["ES_FAKE_CORPUS"] = str(corpus)
+    import django
+    from django.conf import settings
+
+    django.setup()
+    settings.ALLOWED_HOSTS = ["*"]
+    settings.MEDIA_SEARCH_CACHE = {**settings.MEDIA_SEARCH_CACHE, "ENABLED": cache}
+
+    # Throttling would turn most of the run into 429s; rates are bound at import
+    from rest_framework.throttling import SimpleRateThrottle
+    SimpleRateThrottle.THROTTLE_RATES = {"anon": None, "user": None}
+
+    started = time.perf_counter()
+    from media_api import es_client
+    print(f"fake ES corpus of {len(es_client.get_es())} documents built in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server instead of the in-process client")
+    parser.add_argument("--corpus", type=int, default=200000, help="fake ES documents (in-process only)")
+    parser.add_argument("--requests", type=int, default=2000, help="scenarios in the timed pass")
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--alloc-sample", type=int, default=300, help="scenarios in the tracemalloc pass (0 skips)")
+    parser.add_argument("--cache", action="store_true", help="keep the result cache on (off by default)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to diff against")
+    args = parser.parse_args()
+
+    if args.url:
+        client = HTTPClient(args.url)
+    else:
+        setup_in_process(args.corpus, args.cache)
+        client = InProcessClient()
+
+    workload = build_workload(args.warmup + args.requests, args.corpus, args.seed)
+    timed_pass(client, workload[:args.warmup], args.concurrency)
+    samples, elapsed = timed_pass(client, workload[args.warmup:], args.concurrency)
+    overall, scenarios = summarize(samples, elapsed)
+
+    allocations = {}
+    if args.alloc_sample and not args.url:
+        allocations = allocation_pass(client, build_workload(args.alloc_sample, args.corpus, args.seed + 1))
+
+    result = {
+        "meta": {
+            "git_revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "target": args.url or "in-process",
+            "corpus": None if args.url else args.corpus,
+            "requests": len(samples),
+            "concurrency": args.concurrency,
+            "cache": args.cache,
+            "seed": args.seed,
+        },
+        "overall": overall,
+        "scenarios": scenarios,
+        "allocations": allocations,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+    print_report(result, baseline)
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(result, handle, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
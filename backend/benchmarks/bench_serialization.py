@@ -0,0 +1,79 @@
+"""
+CPU time to turn one page of ES hits into a search response body.
+
+    cd backend
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --rounds 500 --page-sizes 10 100
+
+"before" is the original path: `normalize_hit` per hit and DRF's stdlib
+JSONRenderer. "after" is `normalize_hits` plus FastJSONRenderer (orjson
+when installed). Both start from identical freshly parsed hits, which
+are prepared outside the timed section.
+"""
+import argparse
+import copy
+import os
+import time
+
+from .stub_es_server import fake_search_response
+
+PAGE_SIZES = (10, 100, 1000)
+
+
+def build_response(hits, normalize, page_size):
+    return {
+        "count": 10000,
+        "count_exact": False,
+        "page": 1,
+        "page_size": page_size,
+        "results": normalize(hits),
+        "next_search_after": hits[-1]["sort"] if hits else None,
+    }
+
+
+def measure(normalize, renderer, page_size, rounds):
+    hits = fake_search_response(page_size)["hits"]["hits"]
+    # normalize_hit(s) update _source in place, so each round gets a fresh page
+    pages = [copy.deepcopy(hits) for _ in range(rounds)]
+    size = 0
+    started = time.process_time()
+    for page in pages:
+        size = len(renderer.render(build_response(page, normalize, page_size)))
+    return (time.process_time() - started) / rounds, size
+
+
+def run(page_sizes, rounds):
+    from rest_framework.renderers import JSONRenderer
+
+    from media_api import es_client, renderers
+
+    paths = {
+        "before": (lambda hits: [es_client.normalize_hit(hit) for hit in hits], JSONRenderer()),
+        "after": (es_client.normalize_hits, renderers.FastJSONRenderer()),
+    }
+    encoder = "orjson" if renderers.orjson is not None else "stdlib json (orjson not installed)"
+    print(f"encoder: {encoder}")
+    print(f"{'page_size':>9} {'path':<7} {'bytes':>9} {'us/response':>12} {'speedup':>8}")
+    for page_size in page_sizes:
+        baseline = None
+        for name, (normalize, renderer) in paths.items():
+            cpu, size = measure(normalize, renderer, page_size, rounds)
+            baseline = baseline or cpu
+            print(f"{page_size:>9} {name:<7} {size:>9} {cpu * 1e6:>12.1f} {baseline / cpu:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=list(PAGE_SIZES))
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "imago_backend.settings")
+    import django
+    django.setup()
+
+    run(args.page_sizes, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
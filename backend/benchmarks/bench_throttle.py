@@ -0,0 +1,78 @@
+"""
+Per-request cost of the anonymous rate throttle.
+
+    cd backend
+    python -m benchmarks.bench_throttle
+    python -m benchmarks.bench_throttle --rounds 5000 --fills 10 1000
+
+"before" is DRF's AnonRateThrottle, whose cached history holds one
+timestamp per request still in the window; "after" is
+media_api.throttling.SlidingWindowAnonThrottle, which holds two counters.
+Each client is first sent `fill` requests untimed, the load it carries at
+that point of a window, then `rounds` more are timed. The rate is high
+enough that nothing is rejected. "state bytes" is what the client's entry
+takes in the cache after the timed requests. Both run against the configured default
+cache (local memory unless CACHES says otherwise), so a networked backend
+adds its round trips on top.
+"""
+import argparse
+import os
+import time
+from types import SimpleNamespace
+
+FILLS = (10, 100, 1000)
+
+
+def measure(throttle_class, fill, rounds):
+    from django.contrib.auth.models import AnonymousUser
+    from django.core.cache import cache
+
+    cache.clear()
+    throttle_class.THROTTLE_RATES = {"anon": f"{10 * (fill + rounds)}/hour"}
+    request = SimpleNamespace(user=AnonymousUser(), META={"REMOTE_ADDR": "192.0.2.1"})
+    for _ in range(fill):
+        throttle_class().allow_request(request, None)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        assert throttle_class().allow_request(request, None)
+    elapsed = (time.perf_counter() - started) / rounds
+
+    # The local memory backend stores values pickled
+    state = None
+    if hasattr(cache, "_cache"):
+        state = sum(len(value) for value in cache._cache.values())
+    return elapsed, state
+
+
+def run(fills, rounds):
+    from rest_framework.throttling import AnonRateThrottle
+
+    from media_api.throttling import SlidingWindowAnonThrottle
+
+    paths = {"before": AnonRateThrottle, "after": SlidingWindowAnonThrottle}
+    print(f"{'fill':>6} {'path':<7} {'state bytes':>12} {'us/request':>11} {'speedup':>8}")
+    for fill in fills:
+        baseline = None
+        for name, throttle_class in paths.items():
+            elapsed, state = measure(throttle_class, fill, rounds)
+            baseline = baseline or elapsed
+            print(f"{fill:>6} {name:<7} {state if state is not None else '-':>12} "
+                  f"{elapsed * 1e6:>11.1f} {baseline / elapsed:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fills", type=int, nargs="+", default=list(FILLS))
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "imago_backend.settings")
+    import django
+    django.setup()
+
+    run(args.fills, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Local stand-in for Elasticsearch used by the benchmarks.
+
+Answers `POST /<index>/_search` with a fixed page of hits after an
+artificial delay, which is enough to measure how many searches the
+Django/ES client layer can keep in flight without a real cluster.
+
+Call `use_stub(server)` before the first import of media_api.es_client,
+which reads its connection settings from the environment on import.
+"""
+import asyncio
+import json
+import os
+import threading
+
+from aiohttp import web
+
+ES_HEADERS = {
+    "X-Elastic-Product": "Elasticsearch",
+    "Content-Type": "application/vnd.elasticsearch+json; compatible-with=8",
+}
+
+
+# Long captions are what dominate real response sizes
+STUB_SUCHTEXT = " ".join(["Stub caption text with photographer credit and location"] * 30)
+
+
+def project_source(source, source_filter):
+    if not isinstance(source_filter, dict):
+        return source
+    includes = source_filter.get("includes")
+    excludes = set(source_filter.get("excludes", ()))
+    return {
+        key: value for key, value in source.items()
+        if (not includes or key in includes) and key not in excludes
+    }
+
+
+def fake_search_response(size, source_filter=None):
+    hits = [
+        {
+            "_index": "imago",
+            "_id": str(100000 - i),
+            "_source": project_source({
+                "bildnummer": str(100000 - i),
+                "db": "st",
+                "datum": "2020-01-01T00:00:00.000Z",
+                "suchtext": STUB_SUCHTEXT,
+                "fotografen": "Stub",
+                "hoehe": "100",
+                "breite": "100",
+            }, source_filter),
+            "sort": [100000 - i, "st"],
+        }
+        for i in range(size)
+    ]
+    return {"took": 1, "hits": {"total": {"value": 10000, "relation": "eq"}, "hits": hits}}
+
+
+STUB_INDEX = "imago-bench"
+
+
+def use_stub(server):
+    """
+    Points es_client at `server`: host, index and dummy credentials, with
+    no fake corpus. Django gets default settings if nothing configured it,
+    so the media_api settings helpers fall back to their defaults.
+    """
+    from django.conf import settings
+
+    os.environ.update({
+        "ES_HOST": server.url,
+        "ES_HOSTS": server.url,
+        "ES_INDEX": STUB_INDEX,
+        "ES_USER": "bench",
+        "ES_PASS": "bench",
+    })
+    os.environ.pop("ES_FAKE_CORPUS", None)
+    if not settings.configured:
+        settings.configure()
+
+
+class StubESServer:
+    """Runs the stand-in server on its own event loop thread."""
+
+    def __init__(self, delay=0.02, host="127.0.0.1", port=0):
+        self.delay = delay
+        self.host = host
+        self.port = port
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._started = threading.Event()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def _handle_search(self, request):
+        body = await request.json() if request.can_read_body else {}
+        await asyncio.sleep(self.delay)
+        payload = fake_search_response(int(body.get("size", 10)), body.get("_source"))
+        return web.Response(text=json.dumps(payload), headers=ES_HEADERS)
+
+    async def _handle_root(self, request):
+        payload = {"version": {"number": "8.15.0"}, "tagline": "You Know, for Search"}
+        return web.Response(text=json.dumps(payload), headers=ES_HEADERS)
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_route("*", "/{index}/_search", self._handle_search)
+        app.router.add_get("/", self._handle_root)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port, backlog=4096)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._start())
+        self._started.set()
+        self._loop.run_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def stop(self):
+        future = asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop)
+        future.result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
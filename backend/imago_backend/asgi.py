@@ -0,0 +1,26 @@
+"""
+ASGI config for imago_backend project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Served this way, the media search routes use the async views in
+media_api/async_views.py, e.g.:
+
+    gunicorn imago_backend.asgi:application -k uvicorn.workers.UvicornWorker
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'imago_backend.settings')
+os.environ.setdefault('MEDIA_API_ASYNC_VIEWS', '1')
+
+application = get_asgi_application()
+
+# Warm this worker's ES connections up; /api/media/ready/ reports when done
+from media_api.warmup import warmer  # noqa: E402
+
+warmer.start()
@@ -12,6 +12,11 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+# ES_* and other deployment variables read by media_api (see es_client.py)
+load_dotenv()
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -49,6 +54,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so the Server-Timing total covers the whole stack
+    'media_api.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -132,9 +139,23 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Request threads only queue log records; a background thread per worker
+# formats and writes them (see media_api/logs.py). Search requests slower
+# than MEDIA_SEARCH_LOGGING['SLOW_QUERY_THRESHOLD'] also go to
+# slow_queries.log as one JSON object per line.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'media_api.logs.JsonFormatter',
+        },
+    },
+    'filters': {
+        'sampled': {
+            '()': 'media_api.logs.SamplingFilter',
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
@@ -143,28 +164,56 @@ LOGGING = {
             'class': 'logging.FileHandler',
             'filename': 'search_api.log',
         },
+        'json_file': {
+            'class': 'logging.FileHandler',
+            'filename': 'slow_queries.log',
+            'formatter': 'json',
+            'delay': True,
+        },
+        # Named to sort after their targets: dictConfig builds handlers in
+        # name order and logging.shutdown closes them newest first, so
+        # the queues are drained before the files close
+        'queued': {
+            '()': 'media_api.logs.QueueingHandler',
+            'targets': ['console', 'file'],
+        },
+        'queued_slow_queries': {
+            '()': 'media_api.logs.QueueingHandler',
+            'targets': ['json_file'],
+        },
     },
     'root': {
-        'handlers': ['console', 'file'],
+        'handlers': ['queued'],
         'level': 'INFO',
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queued'],
             'level': 'INFO',
             'propagate': True,
         },
         'elasticsearch': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queued'],
             'level': 'WARNING',
             'propagate': True,
         },
+        # One DEBUG line per search once its level is set to DEBUG;
+        # INFO_SAMPLE_RATE thins it out
+        'media_api.planner': {
+            'filters': ['sampled'],
+        },
+        'media_api.slow_queries': {
+            'handlers': ['queued_slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
 
 REST_FRAMEWORK = {
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
+        # AnonRateThrottle's rate with constant-size state, see media_api/throttling.py
+        'media_api.throttling.SlidingWindowAnonThrottle',
         'rest_framework.throttling.UserRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
@@ -172,3 +221,109 @@ REST_FRAMEWORK = {
         'user': '120/minute', 
     }
 }
+
+# Two-tier cache for /api/media/search/ responses (see media_api/cache.py).
+# The shared tier uses the default Django cache backend above.
+MEDIA_SEARCH_CACHE = {
+    'ENABLED': True,
+    'LOCAL_MAXSIZE': 1024,  # entries kept in each worker's LRU
+    'LOCAL_TTL': 10,        # seconds
+    'SHARED_TTL': 60,       # seconds
+    'COUNT_TTL': 30,        # totals reused by later pages of a query, which skip counting
+    'FACETS_TTL': 300,      # filter sidebar counts, shared by all pages
+    'STALE_TTL': 86400,     # last good copy, served (marked stale) while ES is down
+    # One stale copy per distinct query per day: kept in the shared backend
+    # only if it culls by count and MAX_ENTRIES is at least this (Django's
+    # default LocMemCache holds 300), otherwise in each worker's LRU
+    'STALE_MIN_SHARED_ENTRIES': 10000,
+    'STALE_LOCAL_MAXSIZE': 256,
+    # Exact bildnummer lookups (found / known-missing ids), per worker
+    'BILDNUMMER_MAXSIZE': 4096,
+    'BILDNUMMER_TTL': 60,
+    'MISSING_BILDNUMMER_MAXSIZE': 100000,
+    'MISSING_BILDNUMMER_TTL': 300,
+}
+
+# Lifetime in seconds of a point-in-time search cursor; renewed on every page
+MEDIA_SEARCH_CURSOR_TTL = 120
+
+# Phase timers on /api/media/ requests: Server-Timing header and the
+# per-query-type histograms served on /metrics (see media_api/timing.py)
+MEDIA_SEARCH_METRICS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+}
+
+# Identical concurrent searches share one ES call: within a worker, and
+# across workers through a short lock in the cache backend above
+# (see media_api/singleflight.py)
+MEDIA_SEARCH_SINGLE_FLIGHT = {
+    'ENABLED': True,
+    'SHARED': True,
+    'LOCK_TTL': 10,   # seconds; upper bound on one search holding the lock
+    'WAIT': 10.0,     # seconds a waiting request gives the leader
+}
+
+# Circuit breaker around ES calls (see media_api/breaker.py). While it is
+# open, searches get the last good cached result marked "stale": true,
+# or a 503 with Retry-After when there is none. The per-call timeout is
+# the ES_REQUEST_TIMEOUT environment variable.
+MEDIA_SEARCH_BREAKER = {
+    'ENABLED': True,
+    'FAILURE_RATE': 0.5,   # failed share of calls in WINDOW that opens it
+    'MIN_CALLS': 10,
+    'WINDOW': 30,          # seconds
+    'OPEN_SECONDS': 15,    # before half-open probing
+    'HALF_OPEN_PROBES': 1,
+}
+
+# In-memory prefix index behind /api/media/search/suggest/ (see
+# media_api/suggest.py), rebuilt in the background from ES aggregations
+MEDIA_SEARCH_SUGGEST = {
+    'ENABLED': True,
+    'REFRESH_INTERVAL': 300,   # seconds
+    'RETRY_MIN_INTERVAL': 5,   # first retry after a failed build; doubles up to REFRESH_INTERVAL
+    'FOTOGRAFEN_SIZE': 10000,  # photographers from the terms aggregation
+    'SAMPLE_SIZE': 5000,       # newest documents counted for frequent terms
+}
+
+# Background fetch of the next result page into the result cache (see
+# media_api/prefetch.py); off by default, it only uses idle ES capacity
+MEDIA_SEARCH_PREFETCH = {
+    'ENABLED': False,
+    'MAX_WORKERS': 2,
+    'MAX_PENDING': 4,       # prefetches queued or running; more are dropped
+    'MAX_FOREGROUND': 16,   # user searches in flight that count as busy
+    'BUSY_LATENCY': 0.5,    # seconds of average user ES time that count as busy
+}
+
+# Federated search: /api/media/search/ queries every target in parallel and
+# merges the pages on bildnummer (see media_api/federation.py). Each target
+# is {"name", "index"}, plus optional "hosts" (another cluster) and
+# "timeout"; a target that misses its timeout leaves the page "partial".
+MEDIA_SEARCH_FEDERATION = {
+    'ENABLED': False,
+    'TARGETS': [],
+    'TIMEOUT': 2.0,     # seconds per target unless it sets its own
+    'MAX_WORKERS': 8,
+}
+
+# Logging on the search path (see media_api/logs.py)
+MEDIA_SEARCH_LOGGING = {
+    'QUEUE_SIZE': 10000,          # records waiting to be written; more are dropped
+    'INFO_SAMPLE_RATE': 1.0,      # share of sampled loggers' INFO lines kept, e.g. 0.05 under load
+    'SLOW_QUERY_THRESHOLD': 1.0,  # seconds; None turns the slow-query log off
+}
+
+# Warm-up of each worker's ES connections on boot (see media_api/warmup.py);
+# /api/media/ready/ answers 503 until it has finished
+MEDIA_SEARCH_WARMUP = {
+    'ENABLED': True,
+    'CONNECTIONS': None,   # None: ES_CONNECTIONS_PER_NODE per node
+    'QUERIES': [           # es_client.fetch_media arguments
+        {},
+        {'query': 'Berlin'},
+        {'datum_von': '2020-01-01', 'datum_bis': '2020-12-31'},
+    ],
+    'RETRY_INTERVAL': 5,   # seconds between failed attempts
+}
@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
+from media_api.views import prometheus_metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/media/', include('media_api.urls')),
+    path('metrics', prometheus_metrics, name='metrics'),
 ]
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'imago_backend.settings')
 
 application = get_wsgi_application()
+
+# Warm this worker's ES connections up; /api/media/ready/ reports when done
+from media_api.warmup import warmer  # noqa: E402
+
+warmer.start()
@@ -0,0 +1,280 @@
+"""
+Async counterparts of the views in views.py, used when the project is
+served through imago_backend/asgi.py. They share parameter handling with
+the sync views but await AsyncElasticsearch instead of blocking a worker
+for the whole ES round trip.
+"""
+import logging
+import threading
+from datetime import datetime
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework import status
+
+from .search_utils import (
+    aexecute_media_search,
+    aexecute_bildnummer_lookup,
+    aexecute_facet_search,
+    iter_media_export,
+)
+from .renderers import FastJsonResponse
+from .timing import phase
+from .es_client import resolve_source_fields, parse_count_mode
+from .cursors import InvalidCursor
+from .breaker import SearchUnavailable
+from .views import (
+    MediaSearchParamsSerializer,
+    export_lines,
+    export_params,
+    export_response,
+    facet_search_kwargs,
+    media_search_kwargs,
+    pagination_params,
+    throttle_response,
+    unavailable_response,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# DRF throttles are sync and read request.user (a lazy session lookup)
+check_throttle = sync_to_async(throttle_response)
+
+
+@require_GET
+async def media_search(request):
+    throttled = await check_throttle(request)
+    if throttled is not None:
+        return throttled
+
+    with phase("validate"):
+        serializer = MediaSearchParamsSerializer(data=request.GET)
+        valid = serializer.is_valid()
+    if not valid:
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    params = serializer.validated_data
+
+    if params.get('datum_von') and params.get('datum_bis'):
+        if params['datum_von'] > params['datum_bis']:
+            return JsonResponse(
+                {'error': '"datum_von" must be before or equal to "datum_bis".'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+    try:
+        search_after, cursor = pagination_params(request)
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        search_kwargs = media_search_kwargs(params, search_after)
+        result = await aexecute_media_search(cursor=cursor, **search_kwargs)
+
+        if params.get('facets'):
+            try:
+                facets = (await aexecute_facet_search(**facet_search_kwargs(params, search_kwargs)))["facets"]
+            except SearchUnavailable:
+                facets = None
+            result = {**result, "facets": facets}
+
+        return FastJsonResponse(result, status=status.HTTP_200_OK)
+
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except SearchUnavailable as e:
+        return unavailable_response(e, JsonResponse)
+    except Exception:
+        logger.exception("Search failed")
+        return JsonResponse({'error': 'Failed to search media data.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@require_GET
+async def search_by_fotograf(request):
+    throttled = await check_throttle(request)
+    if throttled is not None:
+        return throttled
+
+    try:
+        fields = resolve_source_fields(request.GET.get("fields"))
+        count_mode = request.GET.get("count_mode") or None
+        parse_count_mode(count_mode)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    try:
+        search_after, cursor = pagination_params(request)
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    fotograf = request.GET.get("fotograf")
+    if not fotograf:
+        return JsonResponse({"error": "Missing fotograf parameter"}, status=400)
+
+    try:
+        page = int(request.GET.get("page", 1))
+        page_size = int(request.GET.get("page_size", 10))
+
+        result = await aexecute_media_search(
+            page=page,
+            page_size=page_size,
+            fotografen=[fotograf],
+            search_after=search_after,
+            fields=fields,
+            cursor=cursor,
+            count_mode=count_mode
+        )
+        return FastJsonResponse(result)
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except SearchUnavailable as e:
+        return unavailable_response(e, JsonResponse)
+    except Exception as e:
+        logger.exception("Error in search_by_fotograf:")
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@require_GET
+async def search_by_datum(request):
+    throttled = await check_throttle(request)
+    if throttled is not None:
+        return throttled
+
+    try:
+        fields = resolve_source_fields(request.GET.get("fields"))
+        count_mode = request.GET.get("count_mode") or None
+        parse_count_mode(count_mode)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    try:
+        search_after, cursor = pagination_params(request)
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    try:
+        datum_von_raw = request.GET.get("datum_von")
+        datum_bis_raw = request.GET.get("datum_bis")
+        page = int(request.GET.get("page", 1))
+        page_size = int(request.GET.get("page_size", 10))
+
+        datum_von = datetime.strptime(datum_von_raw, "%Y-%m-%d").date() if datum_von_raw else None
+        datum_bis = datetime.strptime(datum_bis_raw, "%Y-%m-%d").date() if datum_bis_raw else None
+
+        if datum_von and datum_bis and datum_von > datum_bis:
+            return JsonResponse({"error": '"datum_von" must be before or equal to "datum_bis".'}, status=400)
+
+        result = await aexecute_media_search(
+            datum_von=datum_von,
+            datum_bis=datum_bis,
+            page=page,
+            page_size=page_size,
+            search_after=search_after,
+            fields=fields,
+            cursor=cursor,
+            count_mode=count_mode
+        )
+        return FastJsonResponse(result)
+
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except SearchUnavailable as e:
+        return unavailable_response(e, JsonResponse)
+    except Exception:
+        logger.exception("Search by datum failed:")
+        return JsonResponse({'error': 'Search by datum failed.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@require_GET
+async def search_by_bildnummer(request):
+    throttled = await check_throttle(request)
+    if throttled is not None:
+        return throttled
+
+    try:
+        fields = resolve_source_fields(request.GET.get("fields"))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    bildnummer = request.GET.get("bildnummer")
+    if not bildnummer:
+        return JsonResponse({"error": "Missing bildnummer parameter"}, status=400)
+
+    try:
+        result = await aexecute_bildnummer_lookup(bildnummer, page_size=1, fields=fields)
+        return FastJsonResponse({
+            "results": result.get("results", []),
+            "count": result.get("count", 0),
+            "page": result.get("page", 1),
+            "next_search_after": result.get("next_search_after"),
+        })
+
+    except SearchUnavailable as e:
+        return unavailable_response(e, JsonResponse)
+    except Exception:
+        logger.exception("Search by bildnummer failed")
+        return JsonResponse({'error': 'Search by bildnummer failed.'}, status=500)
+
+
+class AsyncExportLines:
+    """
+    Async view of the sync export lines. Each step joins up to one PIT batch
+    of lines in a worker thread, so the export streams instead of being
+    collected into a list by Django's ASGI handler. StreamingHttpResponse
+    registers close(), so the lines and with them the PIT are closed when
+    the response is, including after a client disconnect.
+    """
+
+    def __init__(self, lines, batch_size):
+        self.lines = lines
+        self.batch_size = batch_size
+        # Keeps close() from running while a worker still advances the
+        # generator ("generator already executing")
+        self.lock = threading.Lock()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        # Not thread-sensitive: a long export must not hold up the one
+        # thread that other sync_to_async calls share
+        chunk = await sync_to_async(self.next_chunk, thread_sensitive=False)()
+        if not chunk:
+            await sync_to_async(self.close, thread_sensitive=False)()
+            raise StopAsyncIteration
+        return chunk[0][:0].join(chunk)
+
+    def next_chunk(self):
+        with self.lock:
+            return list(islice(self.lines, self.batch_size))
+
+    def close(self):
+        with self.lock:
+            self.lines.close()
+
+
+@require_GET
+async def export_media(request):
+    throttled = await check_throttle(request)
+    if throttled is not None:
+        return throttled
+
+    spec = export_params(request)
+    if isinstance(spec, HttpResponse):
+        return spec
+    export_format, batch_size, limit, search_kwargs = spec
+
+    try:
+        rows = await sync_to_async(iter_media_export, thread_sensitive=False)(
+            batch_size=batch_size, limit=limit, **search_kwargs
+        )
+    except SearchUnavailable as e:
+        return unavailable_response(e, JsonResponse)
+    except Exception:
+        logger.exception("Export failed")
+        return JsonResponse({'error': 'Failed to export media data.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return export_response(AsyncExportLines(export_lines(rows, export_format), batch_size), export_format)
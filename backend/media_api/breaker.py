@@ -0,0 +1,194 @@
+"""
+Circuit breaker around the Elasticsearch client.
+
+es_client runs every ES call inside `es_breaker.guard()`. The breaker
+records whether each call succeeded and trips from closed to open when
+the error rate over the last WINDOW seconds reaches FAILURE_RATE, once
+there have been at least MIN_CALLS calls. While open, calls are rejected
+at once with CircuitOpenError instead of reaching a struggling cluster.
+After OPEN_SECONDS the breaker turns half-open and lets HALF_OPEN_PROBES
+calls through: a success closes it again and a failure reopens it.
+
+A call counts as failed if ES could not be reached or timed out
+(TransportError, which includes ConnectionError and ConnectionTimeout)
+or if ES itself reports overload (HTTP 429 or 5xx). Other API errors,
+such as a 400 for a bad query, show that the cluster is answering.
+
+The per-call timeout is the client's request timeout (ES_REQUEST_TIMEOUT
+in es_client). search_utils turns SearchUnavailable into the last good
+cached result, marked stale, and the views turn it into a 503 when there
+is none. The breaker is per process.
+"""
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from elasticsearch8.exceptions import ApiError, TransportError
+
+from .timing import Counter, register
+
+DEFAULT_BREAKER_SETTINGS = {
+    "ENABLED": True,
+    # Share of failed calls in WINDOW that opens the breaker
+    "FAILURE_RATE": 0.5,
+    # Calls needed in WINDOW before the rate is trusted
+    "MIN_CALLS": 10,
+    "WINDOW": 30,
+    # Seconds to stay open before probing the cluster again
+    "OPEN_SECONDS": 15,
+    "HALF_OPEN_PROBES": 1,
+}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+breaker_events = register(Counter(
+    "media_search_breaker_events_total",
+    "Circuit breaker state changes and ES calls rejected while open.",
+    ("event",),
+))
+
+degraded_responses = register(Counter(
+    "media_search_degraded_responses_total",
+    "Searches answered while ES was unavailable, by outcome.",
+    ("outcome",),
+))
+
+
+def breaker_settings():
+    # es_client is also used by standalone scripts without Django settings
+    configured = getattr(settings, "MEDIA_SEARCH_BREAKER", {}) if settings.configured else {}
+    return {**DEFAULT_BREAKER_SETTINGS, **configured}
+
+
+class SearchUnavailable(Exception):
+    """ES cannot answer right now; `retry_after` is a hint in seconds."""
+
+    def __init__(self, message="Search backend unavailable.", retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(SearchUnavailable):
+    pass
+
+
+def is_unavailable(error):
+    """True for errors that mean the cluster is down or overloaded."""
+    if isinstance(error, (SearchUnavailable, TransportError)):
+        return True
+    if isinstance(error, ApiError):
+        status = error.status_code
+        return status == 429 or status >= 500
+    return False
+
+
+class CircuitBreaker:
+    def __init__(self, name="elasticsearch"):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self._opened_at = 0.0
+            self._probes = 0
+            # (timestamp, failed) of recent calls, oldest first
+            self._calls = deque()
+            self._failures = 0
+
+    def _prune(self, now, window):
+        calls = self._calls
+        while calls and now - calls[0][0] > window:
+            _, failed = calls.popleft()
+            self._failures -= failed
+
+    def _transition(self, state, now):
+        self.state = state
+        self._probes = 0
+        if state == OPEN:
+            self._opened_at = now
+        if state != HALF_OPEN:
+            self._calls.clear()
+            self._failures = 0
+        breaker_events.inc((state,))
+
+    def retry_after(self):
+        """Seconds until the breaker will probe the cluster again."""
+        config = breaker_settings()
+        remaining = self._opened_at + config["OPEN_SECONDS"] - time.monotonic()
+        return max(1, math.ceil(remaining))
+
+    def _acquire(self, config):
+        """Returns True if the call is a half-open probe; raises when open."""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN:
+                if now - self._opened_at < config["OPEN_SECONDS"]:
+                    breaker_events.inc(("rejected",))
+                    raise CircuitOpenError(retry_after=self.retry_after())
+                self._transition(HALF_OPEN, now)
+            if self.state == HALF_OPEN:
+                if self._probes >= config["HALF_OPEN_PROBES"]:
+                    breaker_events.inc(("rejected",))
+                    raise CircuitOpenError(retry_after=1)
+                self._probes += 1
+                return True
+        return False
+
+    def _release(self, config, probe, failed):
+        """`failed` is None for a call abandoned without an answer."""
+        now = time.monotonic()
+        with self._lock:
+            if probe:
+                if self.state == HALF_OPEN:
+                    if failed is None:
+                        self._probes -= 1
+                    else:
+                        self._transition(OPEN if failed else CLOSED, now)
+                return
+            if self.state != CLOSED or failed is None:
+                return
+            self._calls.append((now, failed))
+            self._failures += failed
+            self._prune(now, config["WINDOW"])
+            calls = len(self._calls)
+            if calls >= config["MIN_CALLS"] and self._failures / calls >= config["FAILURE_RATE"]:
+                self._transition(OPEN, now)
+
+    @contextmanager
+    def guard(self):
+        """Wraps one ES call; raises CircuitOpenError while open."""
+        config = breaker_settings()
+        if not config["ENABLED"]:
+            yield
+            return
+        probe = self._acquire(config)
+        try:
+            yield
+        except Exception as e:
+            self._release(config, probe, is_unavailable(e))
+            raise
+        except BaseException:
+            # Cancelled or interrupted: says nothing about the cluster
+            self._release(config, probe, None)
+            raise
+        self._release(config, probe, False)
+
+    def stats(self):
+        with self._lock:
+            calls = len(self._calls)
+            return {
+                "state": self.state,
+                "calls": calls,
+                "failures": self._failures,
+                "failure_rate": self._failures / calls if calls else 0.0,
+            }
+
+
+es_breaker = CircuitBreaker()
@@ -0,0 +1,361 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+GENERATION_KEY = "media_api:index_generation"
+
+DEFAULT_CACHE_SETTINGS = {
+    "ENABLED": True,
+    "LOCAL_MAXSIZE": 1024,
+    "LOCAL_TTL": 10,
+    "SHARED_TTL": 60,
+    "COUNT_TTL": 30,
+    "FACETS_TTL": 300,
+    # Last good copy of each result, served while ES is unavailable; 0 disables
+    "STALE_TTL": 86400,
+    # Stale copies only go to a shared backend that culls by entry count
+    # (locmem, file, database) if its MAX_ENTRIES is at least this
+    "STALE_MIN_SHARED_ENTRIES": 10000,
+    # Otherwise each worker keeps this many in its own LRU
+    "STALE_LOCAL_MAXSIZE": 256,
+    "GENERATION_CHECK_INTERVAL": 1.0,
+    "KEY_PREFIX": "media_api:search",
+    "BILDNUMMER_MAXSIZE": 4096,
+    "BILDNUMMER_TTL": 60,
+    "MISSING_BILDNUMMER_MAXSIZE": 100000,
+    "MISSING_BILDNUMMER_TTL": 300,
+}
+
+
+def cache_settings():
+    configured = getattr(settings, "MEDIA_SEARCH_CACHE", {})
+    return {**DEFAULT_CACHE_SETTINGS, **configured}
+
+
+def _iso(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value or None
+
+
+def canonical_query(query=None, page=1, page_size=10, fotografen=None,
+                    datum_von=None, datum_bis=None, bildnummer=None,
+                    search_after=None, fields=None, count_mode=None, sort=None):
+    """Returns a hashable, order-independent form of a search request."""
+    q = (query or "").strip().casefold()
+    if q == "*":
+        q = ""
+    if search_after is not None and not isinstance(search_after, (list, tuple)):
+        search_after = [search_after]
+    return (
+        ("q", q),
+        ("fotografen", tuple(sorted(fotografen)) if fotografen else ()),
+        ("datum_von", _iso(datum_von)),
+        ("datum_bis", _iso(datum_bis)),
+        ("bildnummer", str(bildnummer).strip() if bildnummer else None),
+        ("page", int(page)),
+        ("page_size", int(page_size)),
+        ("search_after", tuple(search_after) if search_after is not None else None),
+        ("fields", fields),
+        ("count_mode", count_mode or None),
+        ("sort", sort or None),
+    )
+
+
+def make_cache_key(namespace, canonical, generation):
+    digest = hashlib.sha1(
+        json.dumps(canonical, separators=(",", ":"), default=str).encode("utf-8")
+    ).hexdigest()
+    prefix = cache_settings()["KEY_PREFIX"]
+    return f"{prefix}:{namespace}:g{generation}:{digest}"
+
+
+class LocalLRUCache:
+    """Thread-safe in-process LRU with a per-entry TTL."""
+
+    def __init__(self, maxsize=1024, ttl=10):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _initial_generation():
+    # Seed from the clock so a generation key lost to eviction never
+    # falls back to a value that older cache entries were written under.
+    return int(time.time())
+
+
+def get_index_generation():
+    generation = shared_cache.get(GENERATION_KEY)
+    if generation is None:
+        shared_cache.add(GENERATION_KEY, _initial_generation(), timeout=None)
+        generation = shared_cache.get(GENERATION_KEY, _initial_generation())
+    return generation
+
+
+def bump_index_generation():
+    """Invalidates every cached search result in all workers at once."""
+    try:
+        generation = shared_cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Key was evicted; make sure the new value still moves forward.
+        generation = max(_initial_generation(), (result_cache._generation or 0) + 1)
+        shared_cache.set(GENERATION_KEY, generation, timeout=None)
+    result_cache.reset_generation()
+    return generation
+
+
+def stale_fits_shared_cache():
+    """Whether the shared backend has room for a day of stale copies."""
+    backend = caches["default"]
+    if not isinstance(backend, (LocMemCache, FileBasedCache, DatabaseCache)):
+        # memcached and Redis evict by memory, least recently used first
+        return True
+    return backend._max_entries >= cache_settings()["STALE_MIN_SHARED_ENTRIES"]
+
+
+class ResultCache:
+    """
+    Two-tier cache for search responses: a per-worker LRU in front of the
+    Django cache backend. Keys embed the index generation, so bumping the
+    generation after a reindex orphans every previously cached entry.
+
+    Every miss also writes a stale copy that lives for STALE_TTL, so the
+    shared tier holds one extra page (a few KB to a few hundred KB with
+    large page sizes) per distinct query seen that day. Django's default
+    LocMemCache keeps 300 entries and culls a third of them when full, so
+    those copies would push out live entries. They go to the shared tier
+    only when stale_fits_shared_cache(), and to a per-worker LRU of
+    STALE_LOCAL_MAXSIZE entries otherwise.
+    """
+
+    def __init__(self):
+        config = cache_settings()
+        self.local = LocalLRUCache(config["LOCAL_MAXSIZE"], config["LOCAL_TTL"])
+        self.stale_local = LocalLRUCache(config["STALE_LOCAL_MAXSIZE"], config["STALE_TTL"])
+        self._generation = None
+        self._generation_checked_at = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "sets": 0}
+
+    @property
+    def enabled(self):
+        return cache_settings()["ENABLED"]
+
+    def generation(self):
+        interval = cache_settings()["GENERATION_CHECK_INTERVAL"]
+        now = time.monotonic()
+        if self._generation is None or now - self._generation_checked_at >= interval:
+            generation = get_index_generation()
+            if self._generation is not None and generation != self._generation:
+                self.local.clear()
+            self._generation = generation
+            self._generation_checked_at = now
+        return self._generation
+
+    def reset_generation(self):
+        self._generation = None
+        self.local.clear()
+
+    def key_for(self, namespace, canonical):
+        return make_cache_key(namespace, canonical, self.generation())
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+        value = shared_cache.get(key)
+        if value is not None:
+            self.local.set(key, value)
+            self._count("shared_hits")
+            return value
+        self._count("misses")
+        return None
+
+    def set(self, key, value, ttl=None):
+        config = cache_settings()
+        self.local.set(key, value, min(config["LOCAL_TTL"], ttl or config["LOCAL_TTL"]))
+        shared_cache.set(key, value, timeout=ttl or config["SHARED_TTL"])
+        self._count("sets")
+
+    async def aget(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+        value = await shared_cache.aget(key)
+        if value is not None:
+            self.local.set(key, value)
+            self._count("shared_hits")
+            return value
+        self._count("misses")
+        return None
+
+    def set_stale(self, key, value):
+        """Keeps `value` as the fallback for `key` once the fresh entry expires."""
+        ttl = cache_settings()["STALE_TTL"]
+        if not ttl:
+            return
+        if stale_fits_shared_cache():
+            shared_cache.set(f"{key}:stale", value, timeout=ttl)
+        else:
+            self.stale_local.set(key, value, ttl)
+
+    def get_stale(self, key):
+        if stale_fits_shared_cache():
+            return shared_cache.get(f"{key}:stale")
+        return self.stale_local.get(key)
+
+    async def aset_stale(self, key, value):
+        ttl = cache_settings()["STALE_TTL"]
+        if not ttl:
+            return
+        if stale_fits_shared_cache():
+            await shared_cache.aset(f"{key}:stale", value, timeout=ttl)
+        else:
+            self.stale_local.set(key, value, ttl)
+
+    async def aget_stale(self, key):
+        if stale_fits_shared_cache():
+            return await shared_cache.aget(f"{key}:stale")
+        return self.stale_local.get(key)
+
+    def peek(self, key):
+        """Reads the shared tier without touching the LRU or the stats."""
+        return shared_cache.get(key)
+
+    async def apeek(self, key):
+        return await shared_cache.aget(key)
+
+    async def aset(self, key, value, ttl=None):
+        config = cache_settings()
+        self.local.set(key, value, min(config["LOCAL_TTL"], ttl or config["LOCAL_TTL"]))
+        await shared_cache.aset(key, value, timeout=ttl or config["SHARED_TTL"])
+        self._count("sets")
+
+    def clear_local(self):
+        self.local.clear()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_ratio"] = (
+            (stats["local_hits"] + stats["shared_hits"]) / lookups if lookups else 0.0
+        )
+        stats["local_size"] = len(self.local)
+        stats["stale_local_size"] = len(self.stale_local)
+        stats["generation"] = self._generation
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+
+result_cache = ResultCache()
+
+
+class BildnummerCache:
+    """
+    Per-worker caches for exact bildnummer lookups: recently found results,
+    and a bounded negative cache of bildnummers that do not exist so that
+    scrapers walking invalid ranges never reach ES twice for the same id.
+    """
+
+    def __init__(self):
+        config = cache_settings()
+        self.found = LocalLRUCache(config["BILDNUMMER_MAXSIZE"], config["BILDNUMMER_TTL"])
+        self.missing = LocalLRUCache(
+            config["MISSING_BILDNUMMER_MAXSIZE"], config["MISSING_BILDNUMMER_TTL"]
+        )
+        self._lock = threading.Lock()
+        self._stats = {"found_hits": 0, "missing_hits": 0, "misses": 0}
+
+    def _key(self, bildnummer, size, fields=None):
+        return (result_cache.generation(), bildnummer, size, fields)
+
+    def get(self, bildnummer, size, fields=None):
+        """Returns (known, result); result is None for a known-missing id."""
+        key = self._key(bildnummer, size, fields)
+        if self.missing.get(key[:2]) is not None:
+            self._count("missing_hits")
+            return True, None
+        result = self.found.get(key)
+        if result is not None:
+            self._count("found_hits")
+            return True, result
+        self._count("misses")
+        return False, None
+
+    def set(self, bildnummer, size, result, fields=None):
+        if result["results"]:
+            self.found.set(self._key(bildnummer, size, fields), result)
+        else:
+            # Missing ids are remembered regardless of size and projection
+            self.missing.set(self._key(bildnummer, size)[:2], True)
+
+    def clear(self):
+        self.found.clear()
+        self.missing.clear()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["found_size"] = len(self.found)
+        stats["missing_size"] = len(self.missing)
+        return stats
+
+
+bildnummer_cache = BildnummerCache()
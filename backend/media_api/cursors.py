@@ -0,0 +1,72 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core import signing
+
+CURSOR_SALT = "media_api.cursor"
+
+# Value of `cursor=` that opens a new point-in-time cursor
+CURSOR_START = "start"
+
+
+class InvalidCursor(ValueError):
+    """Raised for search_after values or cursor tokens that cannot be used."""
+
+
+def cursor_ttl():
+    """Seconds a cursor (and the PIT behind it) stays valid after each page."""
+    return getattr(settings, "MEDIA_SEARCH_CURSOR_TTL", 120)
+
+
+def cursor_keep_alive():
+    return f"{cursor_ttl()}s"
+
+
+def parse_search_after(raw):
+    """
+    Decodes a JSON `search_after` parameter into a list of sort values.
+    A bare scalar is wrapped in a list; anything else is rejected.
+    """
+    if raw is None or raw == "":
+        return None
+    if isinstance(raw, (list, tuple)):
+        values = list(raw)
+    else:
+        try:
+            values = json.loads(raw)
+        except (TypeError, ValueError):
+            raise InvalidCursor("search_after must be a JSON array of sort values.")
+        if not isinstance(values, list):
+            values = [values]
+    if not values or any(isinstance(value, (dict, list)) for value in values):
+        raise InvalidCursor("search_after must be a JSON array of sort values.")
+    return values
+
+
+def query_fingerprint(canonical):
+    """Binds a cursor to the query it was opened for."""
+    encoded = json.dumps(canonical, separators=(",", ":"), default=str).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+def encode_cursor(pit_id, search_after, fingerprint):
+    payload = {"pit": pit_id, "sa": search_after, "fp": fingerprint}
+    return signing.dumps(payload, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token, fingerprint=None):
+    """
+    Returns (pit_id, search_after) from a signed cursor token. Raises
+    InvalidCursor for tampered or expired tokens, or when the token was
+    issued for a different query than `fingerprint`.
+    """
+    try:
+        payload = signing.loads(token, salt=CURSOR_SALT, max_age=cursor_ttl())
+    except signing.SignatureExpired:
+        raise InvalidCursor("Cursor has expired.")
+    except signing.BadSignature:
+        raise InvalidCursor("Cursor is not valid.")
+    if fingerprint is not None and payload.get("fp") != fingerprint:
+        raise InvalidCursor("Cursor does not belong to this query.")
+    return payload["pit"], payload["sa"]
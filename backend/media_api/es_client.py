@@ -1,14 +1,29 @@
-from elasticsearch8 import Elasticsearch
-from elasticsearch8.exceptions import ConnectionError, TransportError
+from elasticsearch8 import Elasticsearch, AsyncElasticsearch
+from elasticsearch8.exceptions import ConnectionError, TransportError, NotFoundError
+from elastic_transport import Urllib3HttpNode
+from urllib3.connection import HTTPConnection
+import asyncio
 import logging
+import socket
+import string
+import threading
 import urllib3
 import os
-from dotenv import load_dotenv
+
+from .breaker import es_breaker
+from .indexing import check_id_template
+from .planner import BILDNUMMER_SORT, plan_query
+from .timing import phase, record
 
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 logger = logging.getLogger(__name__)
-load_dotenv()
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
 
 ES_HOST = os.getenv("ES_HOST")
 ES_USER = os.getenv("ES_USER")
@@ -16,16 +31,174 @@ ES_PASS = os.getenv("ES_PASS")
 ES_INDEX = os.getenv("ES_INDEX")
 BASE_THUMBNAIL_URL = os.getenv("BASE_THUMBNAIL_URL")
 
-es = Elasticsearch(
-    ES_HOST,
-    basic_auth=(ES_USER, ES_PASS),
-    verify_certs=False,
-    ssl_show_warn=False,
-    headers={
-        "Accept": "application/vnd.elasticsearch+json; compatible-with=8",
-        "Content-Type": "application/vnd.elasticsearch+json; compatible-with=8",
-    }
+# Comma-separated node URLs; requests are spread over them round-robin.
+# Falls back to the single ES_HOST.
+ES_HOSTS = [host.strip() for host in os.getenv("ES_HOSTS", ES_HOST or "").split(",") if host.strip()]
+
+# Document id pattern of the index over `bildnummer` and `db`; index_media
+# writes ids with it (indexing.DEFAULT_ID_TEMPLATE when unset). When set,
+# bildnummer lookups get documents by id, one per db in ES_DBS; without
+# ES_DBS they use a non-scoring term filter. Both sides accept the same
+# patterns (indexing.check_id_template).
+ES_BILDNUMMER_ID_TEMPLATE = os.getenv("ES_BILDNUMMER_ID_TEMPLATE", "")
+
+# Comma-separated `db` values of the index, e.g. "st,sp"
+ES_DBS = [db.strip() for db in os.getenv("ES_DBS", "").split(",") if db.strip()]
+
+# Seconds before a single ES call is abandoned (and counted as a failure
+# by the circuit breaker in media_api/breaker.py)
+ES_REQUEST_TIMEOUT = float(os.getenv("ES_REQUEST_TIMEOUT", "5"))
+
+# Pooled, kept-alive connections per node for the sync client. Size it to
+# the worker's threads: a request waits for a free connection rather than
+# opening and discarding extra ones.
+ES_CONNECTIONS_PER_NODE = int(os.getenv("ES_CONNECTIONS_PER_NODE", "10"))
+
+# Connections the async client may keep open; bounds in-flight ES requests per process
+ES_ASYNC_CONNECTIONS = int(os.getenv("ES_ASYNC_CONNECTIONS", "256"))
+
+# Seconds before an idle pooled connection sends TCP keep-alive probes, so
+# firewalls and load balancers don't silently drop it; 0 disables
+ES_TCP_KEEPALIVE = int(os.getenv("ES_TCP_KEEPALIVE", "60"))
+
+# gzip request bodies and ask for gzipped responses
+ES_HTTP_COMPRESS = _env_bool("ES_HTTP_COMPRESS", True)
+
+# Retries go to the next node in the pool; a node that fails is skipped
+# for ES_RETRY_BACKOFF * 2 ** (failures - 1) seconds, up to ES_MAX_RETRY_BACKOFF.
+# Retrying timeouts is off by default since it multiplies ES_REQUEST_TIMEOUT.
+ES_MAX_RETRIES = int(os.getenv("ES_MAX_RETRIES", "2"))
+ES_RETRY_ON_TIMEOUT = _env_bool("ES_RETRY_ON_TIMEOUT", False)
+ES_RETRY_ON_STATUS = tuple(
+    int(code) for code in os.getenv("ES_RETRY_ON_STATUS", "429,502,503,504").split(",") if code.strip()
 )
+ES_RETRY_BACKOFF = float(os.getenv("ES_RETRY_BACKOFF", "1"))
+ES_MAX_RETRY_BACKOFF = float(os.getenv("ES_MAX_RETRY_BACKOFF", "30"))
+
+# Discover the cluster's other nodes from the ES_HOSTS seeds
+ES_SNIFF_ON_START = _env_bool("ES_SNIFF_ON_START", False)
+ES_SNIFF_ON_NODE_FAILURE = _env_bool("ES_SNIFF_ON_NODE_FAILURE", False)
+ES_SNIFF_INTERVAL = float(os.getenv("ES_SNIFF_INTERVAL", "60"))
+ES_SNIFF_TIMEOUT = float(os.getenv("ES_SNIFF_TIMEOUT", "1"))
+
+ES_HEADERS = {
+    "Accept": "application/vnd.elasticsearch+json; compatible-with=8",
+    "Content-Type": "application/vnd.elasticsearch+json; compatible-with=8",
+}
+
+# Serve every search from media_api.fake_es with a synthetic corpus of this
+# many documents instead of ES_HOST (load tests, CI, laptops)
+ES_FAKE_CORPUS = int(os.getenv("ES_FAKE_CORPUS", "0"))
+
+def keepalive_socket_options(idle):
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    # Linux names; macOS only has TCP_KEEPALIVE for the idle time
+    idle_option = getattr(socket, "TCP_KEEPIDLE", getattr(socket, "TCP_KEEPALIVE", None))
+    if idle_option is not None:
+        options.append((socket.IPPROTO_TCP, idle_option, idle))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, idle // 4)))
+    if hasattr(socket, "TCP_KEEPCNT"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 4))
+    return options
+
+class KeepAliveUrllib3HttpNode(Urllib3HttpNode):
+    """Urllib3HttpNode whose pooled connections use TCP keep-alive."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.pool.conn_kw["socket_options"] = (
+            HTTPConnection.default_socket_options + keepalive_socket_options(ES_TCP_KEEPALIVE)
+        )
+
+def client_options():
+    """Transport settings shared by the sync and async clients."""
+    options = dict(
+        verify_certs=False,
+        ssl_show_warn=False,
+        headers=ES_HEADERS,
+        request_timeout=ES_REQUEST_TIMEOUT,
+        http_compress=ES_HTTP_COMPRESS,
+        max_retries=ES_MAX_RETRIES,
+        retry_on_timeout=ES_RETRY_ON_TIMEOUT,
+        retry_on_status=ES_RETRY_ON_STATUS,
+        dead_node_backoff_factor=ES_RETRY_BACKOFF,
+        max_dead_node_backoff=ES_MAX_RETRY_BACKOFF,
+        sniff_on_start=ES_SNIFF_ON_START,
+        sniff_on_node_failure=ES_SNIFF_ON_NODE_FAILURE,
+        min_delay_between_sniffing=ES_SNIFF_INTERVAL,
+        sniff_timeout=ES_SNIFF_TIMEOUT,
+    )
+    if ES_USER:
+        options["basic_auth"] = (ES_USER, ES_PASS)
+    return options
+
+def create_es(hosts=None):
+    """A sync client for `hosts`, ES_HOSTS by default, with the shared transport settings."""
+    options = client_options()
+    if ES_TCP_KEEPALIVE:
+        options["node_class"] = KeepAliveUrllib3HttpNode
+    return Elasticsearch(hosts or ES_HOSTS, connections_per_node=ES_CONNECTIONS_PER_NODE, **options)
+
+def create_async_es():
+    return AsyncElasticsearch(ES_HOSTS, connections_per_node=ES_ASYNC_CONNECTIONS, **client_options())
+
+# The process's sync client; get_es() builds it on first use, so imports
+# that never search (management commands, test collection) skip it
+es = None
+_es_lock = threading.Lock()
+
+def get_es():
+    global es
+    client = es
+    if client is None:
+        with _es_lock:
+            if es is None:
+                if ES_FAKE_CORPUS:
+                    from .fake_es import FakeElasticsearch
+                    es = FakeElasticsearch.synthetic(ES_FAKE_CORPUS, index=ES_INDEX)
+                else:
+                    es = create_es()
+            client = es
+    return client
+
+_async_es = None
+_async_es_loop = None
+
+def get_async_es():
+    """
+    Returns the AsyncElasticsearch client for the running event loop.
+    The aiohttp session is bound to the loop it was created on, so a new
+    client is built if the loop changes (e.g. between asyncio.run calls).
+    """
+    global _async_es, _async_es_loop
+    if ES_FAKE_CORPUS:
+        from .fake_es import AsyncFakeElasticsearch
+        if _async_es is None:
+            _async_es = AsyncFakeElasticsearch(get_es())
+        return _async_es
+
+    loop = asyncio.get_running_loop()
+    if _async_es is None or _async_es_loop is not loop:
+        _async_es = create_async_es()
+        _async_es_loop = loop
+    return _async_es
+
+def _reset_after_fork():
+    """
+    Gives a forked worker (gunicorn --preload) its own connection pools.
+    Sockets opened in the parent would otherwise be shared, and responses
+    read by one process could belong to another's request. The copies
+    inherited from the parent are just dropped, to be rebuilt on first use;
+    the parent keeps its own.
+    """
+    global es, _es_lock, _async_es, _async_es_loop
+    _es_lock = threading.Lock()
+    if not ES_FAKE_CORPUS:
+        es = None
+        _async_es, _async_es_loop = None, None
+
+os.register_at_fork(after_in_child=_reset_after_fork)
 
 def build_thumbnail_url(db, bildnummer):
     bildnummer_str = str(bildnummer).zfill(10)
@@ -33,92 +206,429 @@ def build_thumbnail_url(db, bildnummer):
 
 def normalize_hit(hit):
     source = hit.get('_source', {})
-    db = source.get('db', 'st')
-    bildnummer = source.get('bildnummer', '0')
-    source['thumbnail_url'] = build_thumbnail_url(db, bildnummer)
+    # A projection may leave out bildnummer; don't invent a thumbnail then
+    if 'bildnummer' in source:
+        source['thumbnail_url'] = build_thumbnail_url(source.get('db', 'st'), source['bildnummer'])
     return source
 
+def normalize_hits(hits):
+    """
+    normalize_hit for a whole page in one pass: each `_source` is updated
+    in place and returned, never copied, and the thumbnail prefix is
+    resolved once per page instead of once per hit.
+    """
+    prefix = f"{BASE_THUMBNAIL_URL}/"
+    results = []
+    append = results.append
+    for hit in hits:
+        source = hit.get('_source', {})
+        bildnummer = source.get('bildnummer')
+        if bildnummer is not None:
+            source['thumbnail_url'] = f"{prefix}{source.get('db', 'st')}/{str(bildnummer).zfill(10)}/s.jpg"
+        append(source)
+    return results
+
+# Source Filtering
+
+SOURCE_FIELDS = ("bildnummer", "db", "datum", "fotografen", "suchtext", "hoehe", "breite")
+
+# Named `fields=` presets as (includes, excludes); None means the full _source
+SOURCE_PRESETS = {
+    "card": (("bildnummer", "datum", "db", "fotografen"), ()),
+    "detail": (tuple(sorted(SOURCE_FIELDS)), ()),
+    "full": None,
+}
+
+def resolve_source_fields(fields):
+    """
+    Turns a `fields=` value into a hashable (includes, excludes) projection.
+    Accepts a preset name or a comma-separated list of field names, where a
+    leading "-" excludes a field. bildnummer and db are always kept on
+    includes so thumbnail URLs can still be built. Raises ValueError for
+    unknown presets or fields.
+    """
+    if fields is None or isinstance(fields, tuple):
+        return fields
+    fields = fields.strip()
+    if not fields:
+        return None
+    if fields in SOURCE_PRESETS:
+        return SOURCE_PRESETS[fields]
+
+    includes, excludes = set(), set()
+    for name in (part.strip() for part in fields.split(",")):
+        target = excludes if name.startswith("-") else includes
+        name = name.lstrip("-")
+        if name not in SOURCE_FIELDS:
+            raise ValueError(f"Unknown field or preset: {name!r}")
+        target.add(name)
+
+    if includes:
+        includes |= {"bildnummer", "db"}
+    excludes -= {"bildnummer", "db"}
+    return tuple(sorted(includes)), tuple(sorted(excludes))
+
+def source_filter(fields):
+    if not fields:
+        return None
+    includes, excludes = fields
+    source = {}
+    if includes:
+        source["includes"] = list(includes)
+    if excludes:
+        source["excludes"] = list(excludes)
+    return source or None
+
 #Query Builders
 
 def build_query(query=None, fotografen=None, datum_von=None, datum_bis=None, bildnummer=None):
-    must = []
-    filter_ = []
+    # Non-scoring filter context; see media_api/planner.py
+    return {"query": plan_query(query, fotografen, datum_von, datum_bis, bildnummer).query}
 
-    if bildnummer:
-        must.append({
-            "term": {
-                "bildnummer": int(bildnummer)
-            }
-        })
-    elif query and query != "*":
-        must.append({
-            "multi_match": {
-                "query": query,
-                "fields": ["suchtext^3", "fotografen"]
-            }
-        })
+# Hit Counting
 
-    if fotografen:
-        if len(fotografen) == 1:
-            filter_.append({"term": {"fotografen": fotografen[0]}})
-        else:
-            filter_.append({"terms": {"fotografen": fotografen}})
-
-
-    if datum_von or datum_bis:
-        range_filter = {}
-        if datum_von:
-            range_filter["gte"] = datum_von
-        if datum_bis:
-            range_filter["lte"] = datum_bis
-        filter_.append({
-            "range": {
-                "datum": range_filter
-            }
-        })
+# ES counts hits accurately up to this many unless told otherwise
+DEFAULT_TRACK_TOTAL_HITS = 10000
 
+def parse_count_mode(count_mode):
+    """
+    Maps a count_mode (exact, lower_bound:N, none) onto the value of
+    track_total_hits. None keeps the ES default. Raises ValueError.
+    """
+    if count_mode in (None, ""):
+        return None
+    if count_mode == "exact":
+        return True
+    if count_mode == "none":
+        return False
+    if count_mode.startswith("lower_bound:"):
+        limit = count_mode.split(":", 1)[1]
+        if limit.isdigit():
+            return int(limit)
+    raise ValueError(f"Invalid count_mode: {count_mode!r}")
+
+def count_is_exact(total, track_total_hits=None):
+    """
+    Whether `total` is an exact hit count. ES stops counting at the
+    track_total_hits limit, so a total that reaches it is a lower bound.
+    """
+    if total is None:
+        return None
+    if track_total_hits is True:
+        return True
+    limit = DEFAULT_TRACK_TOTAL_HITS if track_total_hits is None else track_total_hits
+    return total < limit
+
+# Search Handle
+
+def build_search_body(query=None, page=1, page_size=10, fotografen=None,
+                      datum_von=None, datum_bis=None, bildnummer=None,
+                      search_after=None, fields=None, pit=None,
+                      track_total_hits=None, sort=None):
+    plan = plan_query(query, fotografen, datum_von, datum_bis, bildnummer, sort)
+    # Sort by `bildnummer` and `db` to ensure uniqueness for search_after,
+    # after _score when the plan ranks by relevance
+    query_body = {"query": plan.query, "sort": list(plan.sort)}
+    if not plan.scored:
+        query_body["track_scores"] = False
+
+    if search_after is not None:
+        query_body["search_after"] = search_after if isinstance(search_after, list) else [search_after]
+    else:
+        from_ = (page - 1) * page_size
+        query_body["from"] = from_
+
+    query_body["size"] = page_size
+
+    source = source_filter(fields)
+    if source is not None:
+        query_body["_source"] = source
+
+    # A point in time replaces the index and pins the searched snapshot
+    if pit is not None:
+        query_body["pit"] = pit
+
+    if track_total_hits is not None:
+        query_body["track_total_hits"] = track_total_hits
+
+    logger.debug("ES Query: %s", query_body)
+    return query_body
+
+def record_took(response):
+    """ES's own processing time, to compare with the "es" round trip phase."""
+    record("es_took", response.get("took", 0) / 1000)
+
+def parse_search_response(response):
+    hits = response.get('hits', {}).get('hits', [])
+    # No total at all when the search ran with track_total_hits=false
+    total = response.get('hits', {}).get('total')
+    return hits, (total.get('value', 0) if total is not None else None)
+
+def fetch_media(query=None, page=1, page_size=10, fotografen=None,
+                datum_von=None, datum_bis=None, bildnummer=None,
+                search_after=None, fields=None, track_total_hits=None, sort=None):
+    with phase("build_query"):
+        query_body = build_search_body(
+            query, page, page_size, fotografen, datum_von, datum_bis, bildnummer, search_after, fields,
+            track_total_hits=track_total_hits, sort=sort
+        )
+    with phase("es"), es_breaker.guard():
+        response = get_es().search(index=ES_INDEX, body=query_body)
+    record_took(response)
+    return parse_search_response(response)
+
+async def async_fetch_media(query=None, page=1, page_size=10, fotografen=None,
+                            datum_von=None, datum_bis=None, bildnummer=None,
+                            search_after=None, fields=None, track_total_hits=None, sort=None):
+    with phase("build_query"):
+        query_body = build_search_body(
+            query, page, page_size, fotografen, datum_von, datum_bis, bildnummer, search_after, fields,
+            track_total_hits=track_total_hits, sort=sort
+        )
+    with phase("es"), es_breaker.guard():
+        response = await get_async_es().search(index=ES_INDEX, body=query_body)
+    record_took(response)
+    return parse_search_response(response)
+
+def open_point_in_time(keep_alive):
+    with es_breaker.guard():
+        response = get_es().open_point_in_time(index=ES_INDEX, keep_alive=keep_alive)
+    return response["id"]
+
+def close_point_in_time(pit_id):
+    try:
+        with es_breaker.guard():
+            get_es().close_point_in_time(id=pit_id)
+    except NotFoundError:
+        # Already expired on the ES side
+        pass
+
+def fetch_media_in_pit(pit_id, keep_alive, query=None, page_size=10, fotografen=None,
+                       datum_von=None, datum_bis=None, bildnummer=None,
+                       search_after=None, fields=None, track_total_hits=None):
+    """
+    Fetches one page from an open point in time, renewing its keep-alive.
+    Returns (hits, total, pit_id); ES may hand back a new PIT id.
+    """
+    with phase("build_query"):
+        query_body = build_search_body(
+            query, 1, page_size, fotografen, datum_von, datum_bis, bildnummer, search_after, fields,
+            pit={"id": pit_id, "keep_alive": keep_alive},
+            track_total_hits=track_total_hits
+        )
+    with phase("es"), es_breaker.guard():
+        response = get_es().search(body=query_body)
+    record_took(response)
+    hits, total = parse_search_response(response)
+    return hits, total, response.get("pit_id", pit_id)
+
+def build_bildnummer_lookup_body(bildnummer, size=1, fields=None):
+    # Filter context, nothing to score; sorted like every search, so the
+    # page's next_search_after leads on to the rest of the bildnummer
     query_body = {
         "query": {
             "bool": {
-                "must": must,
-                "filter": filter_
+                "filter": [{"term": {"bildnummer": int(bildnummer)}}]
             }
-        }
+        },
+        "sort": list(BILDNUMMER_SORT),
+        "size": size,
+        "track_scores": False
     }
+    source = source_filter(fields)
+    if source is not None:
+        query_body["_source"] = source
     return query_body
 
-# Search Handle
+def _get_source_params(fields):
+    source = source_filter(fields) or {}
+    params = {}
+    if source.get("includes"):
+        params["source_includes"] = source["includes"]
+    if source.get("excludes"):
+        params["source_excludes"] = source["excludes"]
+    return params
 
-def search_media(query=None, page=1, page_size=10, fotografen=None,
-                 datum_von=None, datum_bis=None, bildnummer=None,
-                 search_after=None):
-    try:
-        query_body = build_query(query, fotografen, datum_von, datum_bis, bildnummer)
+def bildnummer_doc_ids(bildnummer):
+    """
+    [(db, id)] of the documents a bildnummer can have under
+    ES_BILDNUMMER_ID_TEMPLATE, or None when they can't be known and the
+    lookup needs a search. Raises ValueError for a template index_media
+    would refuse or one over other fields.
+    """
+    if not ES_BILDNUMMER_ID_TEMPLATE:
+        return None
+    check_id_template(ES_BILDNUMMER_ID_TEMPLATE)
+    names = {name for _, name, _, _ in string.Formatter().parse(ES_BILDNUMMER_ID_TEMPLATE) if name}
+    if names != {"bildnummer", "db"}:
+        raise ValueError(f"ES_BILDNUMMER_ID_TEMPLATE may only use {{bildnummer}} and {{db}}: {ES_BILDNUMMER_ID_TEMPLATE!r}")
+    bildnummer = int(bildnummer)
+    if not ES_DBS:
+        return None
+    return [(db, ES_BILDNUMMER_ID_TEMPLATE.format(bildnummer=bildnummer, db=db)) for db in sorted(ES_DBS)]
 
-        # Sort by `bildnummer` and `db` to ensure uniqueness for search_after
-        query_body["sort"] = [
-            {"bildnummer": "desc"},
-            {"db": "asc"}
-        ]
+def parse_mget_response(response, doc_ids, bildnummer, size):
+    """(hits, total) from an _mget, with the sort values a search would give them."""
+    hits = []
+    for (db, _), doc in zip(doc_ids, response["docs"]):
+        if doc.get("found"):
+            hit = dict(doc)
+            hit["sort"] = [int(bildnummer), db]
+            hits.append(hit)
+    return hits[:size], len(hits)
+
+def lookup_bildnummer(bildnummer, size=1, fields=None):
+    """Returns (hits, total) for an exact bildnummer without a scored search."""
+    doc_ids = bildnummer_doc_ids(bildnummer)
+    if doc_ids is not None:
+        with phase("es"), es_breaker.guard():
+            response = get_es().mget(
+                index=ES_INDEX, ids=[doc_id for _, doc_id in doc_ids], realtime=True, **_get_source_params(fields)
+            )
+        return parse_mget_response(response, doc_ids, bildnummer, size)
+
+    with phase("es"), es_breaker.guard():
+        response = get_es().search(index=ES_INDEX, body=build_bildnummer_lookup_body(bildnummer, size, fields))
+    record_took(response)
+    return parse_search_response(response)
 
-        if search_after is not None:
-            query_body["search_after"] = search_after if isinstance(search_after, list) else [search_after]
+async def async_lookup_bildnummer(bildnummer, size=1, fields=None):
+    client = get_async_es()
+    doc_ids = bildnummer_doc_ids(bildnummer)
+    if doc_ids is not None:
+        with phase("es"), es_breaker.guard():
+            response = await client.mget(
+                index=ES_INDEX, ids=[doc_id for _, doc_id in doc_ids], realtime=True, **_get_source_params(fields)
+            )
+        return parse_mget_response(response, doc_ids, bildnummer, size)
+
+    with phase("es"), es_breaker.guard():
+        response = await client.search(index=ES_INDEX, body=build_bildnummer_lookup_body(bildnummer, size, fields))
+    record_took(response)
+    return parse_search_response(response)
+
+def msearch_media(searches):
+    """
+    Runs several searches in one `_msearch` round trip. `searches` is a list
+    of fetch_media keyword dicts; returns one (hits, total) tuple per search,
+    or an error dict for a sub-search that could not be built or that ES
+    reported as failed.
+    """
+    outcomes = [None] * len(searches)
+    request_lines = []
+    sent = []
+    for position, search_kwargs in enumerate(searches):
+        try:
+            body = build_search_body(**search_kwargs)
+        except Exception as e:
+            outcomes[position] = {"type": "invalid_search", "reason": str(e)}
+            continue
+        request_lines.append({"index": ES_INDEX})
+        request_lines.append(body)
+        sent.append(position)
+
+    if not sent:
+        return outcomes
+    with phase("es"), es_breaker.guard():
+        response = get_es().msearch(searches=request_lines)
+    record_took(response)
+    for position, item in zip(sent, response.get("responses", [])):
+        if "error" in item:
+            outcomes[position] = item["error"]
         else:
-            from_ = (page - 1) * page_size
-            query_body["from"] = from_
+            outcomes[position] = parse_search_response(item)
+    return outcomes
+
+# Facets
+
+FACET_FIELDS = ("fotografen", "db", "datum")
+FACET_INTERVALS = ("year", "quarter", "month", "week", "day")
 
-        query_body["size"] = page_size
+def parse_facets(facets):
+    """
+    Maps a `facets` parameter (comma-separated names, or "all") onto a
+    tuple of FACET_FIELDS. Empty means no facets. Raises ValueError.
+    """
+    if facets in (None, ""):
+        return ()
+    if facets in ("all", "true", "1"):
+        return FACET_FIELDS
+    names = tuple(dict.fromkeys(name.strip() for name in facets.split(",") if name.strip()))
+    unknown = [name for name in names if name not in FACET_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown facets: {', '.join(unknown)}")
+    return tuple(name for name in FACET_FIELDS if name in names)
 
-        logger.debug(f"ES Query: {query_body}")
+def build_facets_body(query=None, fotografen=None, datum_von=None, datum_bis=None,
+                      bildnummer=None, facets=FACET_FIELDS, facet_size=10, interval="year"):
+    # size=0: only the aggregations are needed, no hits are fetched or scored
+    query_body = build_query(query, fotografen, datum_von, datum_bis, bildnummer)
+    query_body["size"] = 0
 
-        response = es.search(index=ES_INDEX, body=query_body)
-        hits = response.get('hits', {}).get('hits', [])
-        total = response.get('hits', {}).get('total', {}).get('value', 0)
+    aggs = {}
+    for name in facets:
+        if name == "datum":
+            aggs[name] = {"date_histogram": {
+                "field": "datum", "calendar_interval": interval, "min_doc_count": 1
+            }}
+        else:
+            aggs[name] = {"terms": {"field": name, "size": facet_size}}
+    query_body["aggs"] = aggs
+    return query_body
+
+def parse_facets_response(response):
+    """Returns (facets, total); each facet is a list of {"value", "count"}."""
+    facets = {}
+    for name, agg in response.get("aggregations", {}).items():
+        facets[name] = [
+            {"value": bucket.get("key_as_string", bucket["key"]), "count": bucket["doc_count"]}
+            for bucket in agg.get("buckets", [])
+        ]
+    _, total = parse_search_response(response)
+    return facets, total
+
+def fetch_facets(query=None, fotografen=None, datum_von=None, datum_bis=None,
+                 bildnummer=None, facets=FACET_FIELDS, facet_size=10, interval="year"):
+    query_body = build_facets_body(
+        query, fotografen, datum_von, datum_bis, bildnummer, facets, facet_size, interval
+    )
+    with phase("es"), es_breaker.guard():
+        response = get_es().search(index=ES_INDEX, body=query_body)
+    record_took(response)
+    return parse_facets_response(response)
+
+async def async_fetch_facets(query=None, fotografen=None, datum_von=None, datum_bis=None,
+                             bildnummer=None, facets=FACET_FIELDS, facet_size=10, interval="year"):
+    query_body = build_facets_body(
+        query, fotografen, datum_von, datum_bis, bildnummer, facets, facet_size, interval
+    )
+    with phase("es"), es_breaker.guard():
+        response = await get_async_es().search(index=ES_INDEX, body=query_body)
+    record_took(response)
+    return parse_facets_response(response)
+
+# Suggestions
+
+def build_suggest_sources_body(fotografen_size=10000, sample_size=5000):
+    # Every photographer with its count, and the newest documents' suchtext
+    # as a sample for frequent terms (suchtext has no fielddata to aggregate)
+    return {
+        "query": {"match_all": {}},
+        "size": sample_size,
+        "sort": [{"bildnummer": "desc"}, {"db": "asc"}],
+        "_source": ["suchtext"],
+        "track_total_hits": False,
+        "aggs": {"fotografen": {"terms": {"field": "fotografen", "size": fotografen_size}}},
+    }
 
-        return hits, total
-    except (ConnectionError, TransportError) as e:
-        logger.error(f"Elasticsearch error: {e}")
-        return [], 0
-    except Exception as e:
-        logger.error(f"Unexpected error during search: {e}")
-        return [], 0
+def fetch_suggest_sources(fotografen_size=10000, sample_size=5000):
+    """Returns ([(fotograf, count), ...], [suchtext, ...]) for the suggester."""
+    with phase("es"), es_breaker.guard():
+        response = get_es().search(index=ES_INDEX, body=build_suggest_sources_body(fotografen_size, sample_size))
+    record_took(response)
+    buckets = response.get("aggregations", {}).get("fotografen", {}).get("buckets", [])
+    hits, _ = parse_search_response(response)
+    return (
+        [(bucket["key"], bucket["doc_count"]) for bucket in buckets],
+        [hit.get("_source", {}).get("suchtext") or "" for hit in hits],
+    )
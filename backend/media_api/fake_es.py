@@ -0,0 +1,1116 @@
+"""
+In-process stand-in for the Elasticsearch client.
+
+FakeElasticsearch answers the subset of the search API that es_client
+emits (build_query, build_search_body, the bildnummer lookup, facets,
+_msearch, point in time and realtime get) from indexed in-memory
+columns, so the Django layer can be tested and load-tested without a
+cluster:
+
+    from media_api import es_client
+    from media_api.fake_es import FakeElasticsearch
+    es_client.es = FakeElasticsearch.synthetic(1_000_000)
+
+or set ES_FAKE_CORPUS=1000000 to have es_client build one on first use.
+
+Documents are stored in the index's default sort order (bildnummer desc,
+db asc), so that sort, from/size and search_after are a bisect plus a
+walk over posting lists, the way index sorting lets ES stop early. Set
+`index_sorted = False` to model an index without it: sorted searches then
+collect and sort every match. Queries are compiled into clauses that either
+drive iteration (the most selective one) or act as per-document checks.
+Scores are only computed when a search is not sorted.
+"""
+import asyncio
+import heapq
+import math
+import random
+import re
+import time
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from itertools import chain, islice
+
+from elastic_transport import ApiResponseMeta, HttpHeaders, NodeConfig
+from elasticsearch8.exceptions import BadRequestError, NotFoundError
+
+TOKEN_RE = re.compile(r"\w+")
+
+TEXT_FIELDS = ("suchtext",)
+KEYWORD_FIELDS = ("db", "fotografen")
+
+# Sort of the stored documents, i.e. the order build_search_body asks for
+STORAGE_SORT = (("bildnummer", "desc"), ("db", "asc"))
+
+DEFAULT_TRACK_TOTAL_HITS = 10000
+
+DATUM_MISSING = -2 ** 63
+DAY_MS = 86400000
+
+def tokenize(text):
+    """Roughly the standard analyzer: lowercased word characters."""
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+def _api_error(cls, status, error_type, reason):
+    meta = ApiResponseMeta(
+        status=status, http_version="1.1", headers=HttpHeaders(), duration=0.0,
+        node=NodeConfig("http", "fake-es", 9200)
+    )
+    body = {"error": {"type": error_type, "reason": reason}, "status": status}
+    return cls(message=error_type, meta=meta, body=body)
+
+def bad_request(reason):
+    return _api_error(BadRequestError, 400, "parsing_exception", reason)
+
+def not_found(error_type, reason):
+    return _api_error(NotFoundError, 404, error_type, reason)
+
+# Dates
+
+def to_millis(value, round_up=False):
+    """
+    Epoch milliseconds of a date, datetime, ISO string or number. With
+    round_up, missing components are filled with their maximum, as ES
+    does for `lte` and `gt` bounds ("2020-01-01" -> end of that day).
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, datetime):
+        moment = value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        return int(moment.timestamp() * 1000)
+    if isinstance(value, date):
+        start = to_millis(datetime(value.year, value.month, value.day))
+        return start + DAY_MS - 1 if round_up else start
+
+    text = str(value).strip()
+    if len(text) == 4 and text.isdigit():
+        start, end = datetime(int(text), 1, 1), datetime(int(text) + 1, 1, 1)
+    elif len(text) == 7:
+        year, month = int(text[:4]), int(text[5:7])
+        start = datetime(year, month, 1)
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+    elif len(text) == 10:
+        start = datetime.fromisoformat(text)
+        end = start + timedelta(days=1)
+    else:
+        return to_millis(datetime.fromisoformat(text))
+    if round_up:
+        return to_millis(end) - 1
+    return to_millis(start)
+
+def format_millis(millis):
+    moment = datetime.fromtimestamp(millis // 1000, tz=timezone.utc)
+    return f"{moment:%Y-%m-%dT%H:%M:%S}.{millis % 1000:03d}Z"
+
+def parse_duration(value):
+    """Seconds in an ES time value such as "120s", "5m" or "1h"."""
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400}
+    match = re.fullmatch(r"(\d+)(ms|s|m|h|d)", str(value).strip())
+    if not match:
+        raise bad_request(f"failed to parse time value [{value}]")
+    return int(match.group(1)) * units[match.group(2)]
+
+def _positions(postings, start):
+    """Positions >= start of a sorted array, without copying it."""
+    index = bisect_left(postings, start) if start else 0
+    return memoryview(postings)[index:] if isinstance(postings, array) else postings[index:]
+
+def _contains(postings, position):
+    index = bisect_left(postings, position)
+    return index < len(postings) and postings[index] == position
+
+def _merge(iterables):
+    """Dedupes the merge of several ascending position streams."""
+    previous = None
+    for position in heapq.merge(*iterables):
+        if position != previous:
+            previous = position
+            yield position
+
+# Query clauses
+
+class Clause:
+    """
+    A compiled query. iter_from yields matching positions in storage
+    order; matches checks one position; score is only used unsorted.
+    """
+    match_all = False
+
+    def __init__(self, store):
+        self.store = store
+
+    def estimate(self):
+        raise NotImplementedError
+
+    def iter_from(self, start=0):
+        raise NotImplementedError
+
+    def matches(self, position):
+        raise NotImplementedError
+
+    def score(self, position):
+        return 1.0
+
+class MatchAll(Clause):
+    match_all = True
+
+    def __init__(self, store, boost=1.0):
+        super().__init__(store)
+        self.boost = boost
+
+    def estimate(self):
+        return len(self.store)
+
+    def iter_from(self, start=0):
+        return range(start, len(self.store))
+
+    def matches(self, position):
+        return True
+
+    def score(self, position):
+        return self.boost
+
+class MatchNone(Clause):
+    def estimate(self):
+        return 0
+
+    def iter_from(self, start=0):
+        return ()
+
+    def matches(self, position):
+        return False
+
+class Postings(Clause):
+    """
+    The union of sorted position arrays (posting lists). Nothing is
+    materialised: iteration merges the lists and checks bisect them.
+    """
+
+    def __init__(self, store, lists, boost=1.0):
+        super().__init__(store)
+        self.lists = [postings for postings in lists if len(postings)]
+        self.boost = boost
+
+    def estimate(self):
+        return sum(len(postings) for postings in self.lists)
+
+    def iter_from(self, start=0):
+        if len(self.lists) == 1:
+            return _positions(self.lists[0], start)
+        return _merge([_positions(postings, start) for postings in self.lists])
+
+    def matches(self, position):
+        return any(_contains(postings, position) for postings in self.lists)
+
+    def score(self, position):
+        return self.boost
+
+class KeywordTerms(Postings):
+    """term/terms on a keyword column; checks compare the column code."""
+
+    def __init__(self, store, field, values, boost=1.0):
+        lookup = store.keyword_codes[field]
+        self.codes = {lookup[value] for value in values if value in lookup}
+        self.column = store.keyword_columns[field]
+        super().__init__(store, [store.keyword_postings[field][code] for code in self.codes], boost)
+
+    def matches(self, position):
+        return self.column[position] in self.codes
+
+class BildnummerRange(Clause):
+    """
+    Range (or term) on bildnummer. Storage is sorted on bildnummer desc,
+    so every range is one contiguous run of positions.
+    """
+
+    def __init__(self, store, low=None, high=None, boost=1.0):
+        super().__init__(store)
+        self.low, self.high = low, high
+        self.boost = boost
+        self.first, self.stop = store.bildnummer_span(low, high)
+
+    def estimate(self):
+        return self.stop - self.first
+
+    def iter_from(self, start=0):
+        return range(max(start, self.first), self.stop)
+
+    def matches(self, position):
+        return self.first <= position < self.stop
+
+    def score(self, position):
+        return self.boost
+
+class BildnummerTerms(Postings):
+    def __init__(self, store, values, boost=1.0):
+        spans = [store.bildnummer_span(value, value) for value in sorted(values, reverse=True)]
+        postings = array("i", chain.from_iterable(range(first, stop) for first, stop in spans))
+        super().__init__(store, [postings], boost)
+
+class DatumRange(Clause):
+    def __init__(self, store, low, high, boost=1.0):
+        super().__init__(store)
+        self.low = DATUM_MISSING + 1 if low is None else low
+        self.high = 2 ** 63 - 1 if high is None else high
+        self.boost = boost
+        self.column = store.datum
+        self.first = bisect_left(store.datum_sorted, self.low)
+        self.stop = bisect_right(store.datum_sorted, self.high)
+        self._postings = None
+
+    def estimate(self):
+        return max(self.stop - self.first, 0)
+
+    def iter_from(self, start=0):
+        if self._postings is None:
+            self._postings = array("i", sorted(self.store.datum_order[self.first:self.stop]))
+        return _positions(self._postings, start)
+
+    def matches(self, position):
+        return self.low <= self.column[position] <= self.high
+
+    def score(self, position):
+        return self.boost
+
+class TextMatch(Postings):
+    """
+    multi_match / match over text and keyword fields, best_fields style:
+    a document scores the best of its per-field scores. Text fields
+    are tokenized; keyword fields only match the whole query string.
+    """
+
+    def __init__(self, store, query, fields, operator="or", boost=1.0):
+        self.query = str(query)
+        self.tokens = list(dict.fromkeys(tokenize(self.query)))
+        self.fields = fields
+        lists = []
+        for field, _ in fields:
+            if field in TEXT_FIELDS:
+                token_lists = [store.text_postings[field].get(token, array("i")) for token in self.tokens]
+                if operator == "and":
+                    lists.append(_intersect(token_lists))
+                else:
+                    lists.extend(token_lists)
+            elif field in KEYWORD_FIELDS:
+                code = store.keyword_codes[field].get(self.query)
+                if code is not None:
+                    lists.append(store.keyword_postings[field][code])
+            else:
+                raise bad_request(f"multi_match on unsupported field [{field}]")
+        super().__init__(store, lists, boost)
+        self.idf = {
+            field: {token: store.idf(field, token) for token in self.tokens}
+            for field, _ in fields if field in TEXT_FIELDS
+        }
+        self._scores = {}
+
+    def _text_score(self, field, text):
+        # Keyed by text: repeated captions (and synthetic corpora) score once
+        key = (field, text)
+        value = self._scores.get(key)
+        if value is None:
+            idf = self.idf[field]
+            value = self._scores[key] = sum(idf[token] for token in set(tokenize(text)) if token in idf)
+        return value
+
+    def score(self, position):
+        store = self.store
+        best = 0.0
+        for field, field_boost in self.fields:
+            if field in TEXT_FIELDS:
+                value = self._text_score(field, store.text_columns[field][position])
+            else:
+                code = store.keyword_columns[field][position]
+                matched = store.keyword_values[field][code] == self.query
+                value = store.keyword_idf(field, code) if matched else 0.0
+            best = max(best, value * field_boost)
+        return best * self.boost
+
+def _intersect(lists):
+    if not lists or not all(len(postings) for postings in lists):
+        return array("i")
+    lists = sorted(lists, key=len)
+    members = set(lists[0])
+    for postings in lists[1:]:
+        members.intersection_update(postings)
+    return array("i", sorted(members))
+
+class Bool(Clause):
+    def __init__(self, store, must=(), filter=(), should=(), must_not=(), minimum_should_match=None, boost=1.0):
+        super().__init__(store)
+        self.scoring = list(must)
+        self.should = list(should)
+        self.must_not = list(must_not)
+        self.boost = boost
+        required = list(must) + list(filter)
+        if self.should and (not required or minimum_should_match):
+            required.append(AnyOf(store, self.should))
+        self.required = required
+
+        if required:
+            self.driver = min(required, key=lambda clause: clause.estimate())
+        else:
+            self.driver = MatchAll(store)
+        self.checks = [clause.matches for clause in required if clause is not self.driver]
+        self.excluded = [clause.matches for clause in self.must_not]
+
+    @property
+    def match_all(self):
+        return self.driver.match_all and not self.checks and not self.excluded
+
+    def estimate(self):
+        return self.driver.estimate()
+
+    def iter_from(self, start=0):
+        positions = self.driver.iter_from(start)
+        checks, excluded = self.checks, self.excluded
+        if not checks and not excluded:
+            return positions
+        return (
+            position for position in positions
+            if all(check(position) for check in checks) and not any(exclude(position) for exclude in excluded)
+        )
+
+    def matches(self, position):
+        return (
+            self.driver.matches(position)
+            and all(check(position) for check in self.checks)
+            and not any(exclude(position) for exclude in self.excluded)
+        )
+
+    def score(self, position):
+        score = sum(clause.score(position) for clause in self.scoring)
+        score += sum(clause.score(position) for clause in self.should if clause.matches(position))
+        # Filter-only bools score every hit alike (0), as ES does
+        return score * self.boost
+
+class AnyOf(Clause):
+    def __init__(self, store, clauses):
+        super().__init__(store)
+        self.clauses = clauses
+
+    def estimate(self):
+        return sum(clause.estimate() for clause in self.clauses)
+
+    def iter_from(self, start=0):
+        return _merge([clause.iter_from(start) for clause in self.clauses])
+
+    def matches(self, position):
+        return any(clause.matches(position) for clause in self.clauses)
+
+class ConstantScore(Clause):
+    def __init__(self, store, inner, boost=1.0):
+        super().__init__(store)
+        self.inner = inner
+        self.boost = boost
+        self.match_all = inner.match_all
+
+    def estimate(self):
+        return self.inner.estimate()
+
+    def iter_from(self, start=0):
+        return self.inner.iter_from(start)
+
+    def matches(self, position):
+        return self.inner.matches(position)
+
+    def score(self, position):
+        return self.boost
+
+# Query compilation
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+def _field_value(spec, key="value"):
+    """Unwraps {"field": value} and {"field": {"value": value, "boost": b}}."""
+    ((field, value),) = spec.items()
+    boost = 1.0
+    if isinstance(value, dict):
+        boost = value.get("boost", 1.0)
+        value = value.get(key)
+    return field, value, boost
+
+def _parse_field_boost(field):
+    name, _, boost = field.partition("^")
+    return name, float(boost) if boost else 1.0
+
+def compile_query(store, query):
+    if not query:
+        return MatchAll(store)
+    if len(query) != 1:
+        raise bad_request(f"query malformed, expected a single query type: {sorted(query)}")
+    ((kind, spec),) = query.items()
+
+    if kind == "match_all":
+        return MatchAll(store, spec.get("boost", 1.0))
+    if kind == "match_none":
+        return MatchNone(store)
+
+    if kind == "bool":
+        compile_all = lambda key: [compile_query(store, clause) for clause in _as_list(spec.get(key))]
+        return Bool(
+            store,
+            must=compile_all("must"),
+            filter=compile_all("filter"),
+            should=compile_all("should"),
+            must_not=compile_all("must_not"),
+            minimum_should_match=spec.get("minimum_should_match"),
+            boost=spec.get("boost", 1.0),
+        )
+
+    if kind == "constant_score":
+        return ConstantScore(store, compile_query(store, spec["filter"]), spec.get("boost", 1.0))
+
+    if kind in ("term", "terms"):
+        if kind == "term":
+            field, value, boost = _field_value(spec)
+            values = [value]
+        else:
+            boost = spec.get("boost", 1.0)
+            ((field, values),) = ((f, v) for f, v in spec.items() if f != "boost")
+        if field == "bildnummer":
+            return BildnummerTerms(store, {int(value) for value in values}, boost)
+        if field in KEYWORD_FIELDS:
+            return KeywordTerms(store, field, [str(value) for value in values], boost)
+        if field in TEXT_FIELDS:
+            return Postings(store, [store.text_postings[field].get(str(value), array("i")) for value in values], boost)
+        raise bad_request(f"{kind} query on unsupported field [{field}]")
+
+    if kind == "range":
+        ((field, bounds),) = spec.items()
+        boost = bounds.get("boost", 1.0)
+        if field == "datum":
+            low = to_millis(bounds.get("gte"))
+            if "gt" in bounds:
+                low = to_millis(bounds["gt"], round_up=True) + 1
+            high = to_millis(bounds.get("lte"), round_up=True)
+            if "lt" in bounds:
+                high = to_millis(bounds["lt"]) - 1
+            return DatumRange(store, low, high, boost)
+        if field == "bildnummer":
+            low = int(bounds["gte"]) if "gte" in bounds else None
+            if "gt" in bounds:
+                low = int(bounds["gt"]) + 1
+            high = int(bounds["lte"]) if "lte" in bounds else None
+            if "lt" in bounds:
+                high = int(bounds["lt"]) - 1
+            return BildnummerRange(store, low, high, boost)
+        raise bad_request(f"range query on unsupported field [{field}]")
+
+    if kind == "multi_match":
+        fields = [_parse_field_boost(field) for field in spec.get("fields", ["suchtext"])]
+        return TextMatch(store, spec["query"], fields, spec.get("operator", "or").lower(), spec.get("boost", 1.0))
+
+    if kind == "match":
+        ((field, value),) = spec.items()
+        options = value if isinstance(value, dict) else {"query": value}
+        return TextMatch(
+            store, options["query"], [(field, 1.0)], options.get("operator", "or").lower(), options.get("boost", 1.0)
+        )
+
+    raise bad_request(f"unknown or unsupported query [{kind}]")
+
+# Sorting
+
+def parse_sort(sort):
+    """Normalises a sort spec into a tuple of (field, order) pairs."""
+    if sort is None:
+        return None
+    parsed = []
+    for entry in _as_list(sort):
+        if isinstance(entry, str):
+            field, order = entry, "desc" if entry == "_score" else "asc"
+        else:
+            ((field, order),) = entry.items()
+            if isinstance(order, dict):
+                order = order.get("order", "desc" if field == "_score" else "asc")
+        parsed.append((field, order))
+    return tuple(parsed)
+
+class FakeElasticsearch:
+    """
+    Drop-in for the subset of elasticsearch8.Elasticsearch that es_client
+    uses: search, msearch, count, get, open/close_point_in_time, info,
+    ping. The corpus is immutable once built; use from_documents for
+    explicit fixtures and synthetic() for load tests.
+    """
+
+    def __init__(self, index="imago"):
+        self.index_name = index or "imago"
+        self.bildnummer = array("q")
+        self.datum = array("q")
+        self.keyword_columns = {field: array("I") for field in KEYWORD_FIELDS}
+        self.keyword_values = {field: [] for field in KEYWORD_FIELDS}
+        self.text_columns = {field: [] for field in TEXT_FIELDS}
+        self.extra_columns = {"hoehe": [], "breite": []}
+        self.ids = None
+        self._codes = {field: {} for field in KEYWORD_FIELDS}
+        self._pits = {}
+        self.calls = Counter()
+        self.index_sorted = True
+
+    def __len__(self):
+        return len(self.bildnummer)
+
+    # Building
+
+    @classmethod
+    def from_documents(cls, documents, index="imago"):
+        """
+        Builds a corpus from _source dicts, or hits with "_id" and
+        "_source". Each needs a bildnummer; other fields are optional.
+        """
+        rows = []
+        for document in documents:
+            source = document.get("_source", document)
+            rows.append((-int(source["bildnummer"]), str(source.get("db", "st")), document.get("_id"), source))
+        rows.sort(key=lambda row: (row[0], row[1]))
+
+        store = cls(index)
+        keep_ids = any(row[2] is not None for row in rows)
+        store.ids = [] if keep_ids else None
+        for negated, db, doc_id, source in rows:
+            store._append(
+                -negated, db, source.get("datum"), source.get("fotografen"), source.get("suchtext"),
+                source.get("hoehe"), source.get("breite")
+            )
+            if keep_ids:
+                store.ids.append(str(doc_id) if doc_id is not None else str(-negated))
+        store._build_indexes()
+        return store
+
+    @classmethod
+    def synthetic(cls, size, seed=0, index="imago"):
+        """
+        A reproducible corpus of `size` documents: bildnummer size..1,
+        datum rising with bildnummer, and captions drawn from a skewed
+        vocabulary so term frequencies span common to rare.
+        """
+        rng = random.Random(seed)
+        vocabulary = [f"{word}{n}" if n else word for n in range(4) for word in SYNTHETIC_WORDS]
+        weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+        captions = [
+            " ".join(rng.choices(vocabulary, weights, k=rng.randint(6, 14)))
+            for _ in range(min(size, 5000) or 1)
+        ]
+        fotografen = [f"IMAGO / {rng.choice(SYNTHETIC_SURNAMES)} {n:03d}" for n in range(400)]
+        sizes = [("3000", "2000"), ("2000", "3000"), ("4000", "6000"), ("1920", "1080")]
+
+        start, span = to_millis("2000-01-01"), to_millis("2025-01-01") - to_millis("2000-01-01")
+        jitter = 30 * DAY_MS
+        uniform = rng.random
+
+        # Columns are generated whole; going through _append costs ~4x more
+        store = cls(index)
+        store.bildnummer = array("q", range(size, 0, -1))
+        store.datum = array("q", (
+            start + span * bildnummer // (size + 1) - int(uniform() * jitter)
+            for bildnummer in range(size, 0, -1)
+        ))
+        for field, values, weights in (
+            ("db", ["st", "sp"], [4, 1]),
+            ("fotografen", fotografen, [1.0 / (n + 1) for n in range(len(fotografen))]),
+        ):
+            store.keyword_values[field] = values
+            store._codes[field] = {value: code for code, value in enumerate(values)}
+            store.keyword_columns[field] = array("I", rng.choices(range(len(values)), weights, k=size))
+        store.text_columns["suchtext"] = rng.choices(captions, k=size)
+        size_picks = rng.choices(sizes, k=size)
+        store.extra_columns["hoehe"] = [hoehe for hoehe, _ in size_picks]
+        store.extra_columns["breite"] = [breite for _, breite in size_picks]
+        store._build_indexes()
+        return store
+
+    def _append(self, bildnummer, db, datum, fotografen, suchtext, hoehe, breite):
+        self.bildnummer.append(int(bildnummer))
+        millis = to_millis(datum) if datum not in (None, "") else None
+        self.datum.append(DATUM_MISSING if millis is None else millis)
+        for field, value in (("db", db), ("fotografen", fotografen)):
+            self.keyword_columns[field].append(self._keyword_code(field, "" if value is None else str(value)))
+        self.text_columns["suchtext"].append(suchtext or "")
+        self.extra_columns["hoehe"].append(hoehe)
+        self.extra_columns["breite"].append(breite)
+
+    def _keyword_code(self, field, value):
+        codes = self._codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.keyword_values[field])
+            self.keyword_values[field].append(value)
+        return code
+
+    def _build_indexes(self):
+        self.keyword_codes = self._codes
+        self.keyword_postings = {}
+        for field in KEYWORD_FIELDS:
+            postings = [array("i") for _ in self.keyword_values[field]]
+            for position, code in enumerate(self.keyword_columns[field]):
+                postings[code].append(position)
+            self.keyword_postings[field] = postings
+
+        # Text postings are built per distinct value, then merged per token
+        self.text_postings = {}
+        for field in TEXT_FIELDS:
+            groups = {}
+            for position, text in enumerate(self.text_columns[field]):
+                positions = groups.get(text)
+                if positions is None:
+                    positions = groups[text] = array("i")
+                positions.append(position)
+            by_token = {}
+            for text, positions in groups.items():
+                for token in set(tokenize(text)):
+                    by_token.setdefault(token, []).append(positions)
+            self.text_postings[field] = {
+                token: lists[0] if len(lists) == 1 else array("i", sorted(chain.from_iterable(lists)))
+                for token, lists in by_token.items()
+            }
+
+        order = sorted(
+            (position for position, millis in enumerate(self.datum) if millis != DATUM_MISSING),
+            key=self.datum.__getitem__
+        )
+        self.datum_order = array("i", order)
+        self.datum_sorted = array("q", (self.datum[position] for position in order))
+        self._id_positions = None
+
+    # Index statistics
+
+    def idf(self, field, token):
+        frequency = len(self.text_postings[field].get(token, ()))
+        return math.log(1 + (len(self) - frequency + 0.5) / (frequency + 0.5))
+
+    def keyword_idf(self, field, code):
+        frequency = len(self.keyword_postings[field][code])
+        return math.log(1 + (len(self) - frequency + 0.5) / (frequency + 0.5))
+
+    def bildnummer_span(self, low=None, high=None):
+        """Positions [first, stop) with low <= bildnummer <= high."""
+        negated = lambda position: -self.bildnummer[position]
+        positions = range(len(self))
+        first = 0 if high is None else bisect_left(positions, -high, key=negated)
+        stop = len(self) if low is None else bisect_right(positions, -low, key=negated)
+        return first, stop
+
+    # Documents
+
+    def doc_id(self, position):
+        return self.ids[position] if self.ids is not None else str(self.bildnummer[position])
+
+    def source(self, position, includes=None, excludes=()):
+        millis = self.datum[position]
+        source = {
+            "bildnummer": str(self.bildnummer[position]),
+            "db": self.keyword_values["db"][self.keyword_columns["db"][position]],
+            "datum": format_millis(millis) if millis != DATUM_MISSING else None,
+            "fotografen": self.keyword_values["fotografen"][self.keyword_columns["fotografen"][position]],
+            "suchtext": self.text_columns["suchtext"][position],
+            "hoehe": self.extra_columns["hoehe"][position],
+            "breite": self.extra_columns["breite"][position],
+        }
+        if includes is not None or excludes:
+            source = {
+                field: value for field, value in source.items()
+                if (includes is None or field in includes) and field not in excludes
+            }
+        return source
+
+    def _position_of_id(self, doc_id):
+        if self.ids is None:
+            try:
+                bildnummer = int(doc_id)
+            except ValueError:
+                return None
+            first, stop = self.bildnummer_span(bildnummer, bildnummer)
+            return first if stop > first else None
+        if self._id_positions is None:
+            self._id_positions = {value: position for position, value in enumerate(self.ids)}
+        return self._id_positions.get(str(doc_id))
+
+    # Search
+
+    def _sort_values(self, position, sort, pit):
+        values = []
+        for field, _ in sort:
+            if field == "bildnummer":
+                values.append(self.bildnummer[position])
+            elif field in KEYWORD_FIELDS:
+                values.append(self.keyword_values[field][self.keyword_columns[field][position]])
+            elif field == "datum":
+                values.append(self.datum[position])
+            elif field in ("_doc", "_shard_doc"):
+                values.append(position)
+            else:
+                raise bad_request(f"No mapping found for [{field}] in order to sort on")
+        if pit and sort[-1][0] not in ("_doc", "_shard_doc"):
+            # ES appends the implicit _shard_doc tiebreaker inside a PIT
+            values.append(position)
+        return values
+
+    def _storage_start(self, sort, search_after, pit):
+        """First position after `search_after` for a sort in storage order."""
+        if search_after is None:
+            return 0
+        if sort[0][0] in ("_doc", "_shard_doc"):
+            return int(search_after[0]) + 1
+        target = [-int(search_after[0])] + list(search_after[1:len(sort)])
+        if pit and len(search_after) > len(sort):
+            target.append(int(search_after[len(sort)]))
+        width = len(target)
+
+        def key(position):
+            values = self._sort_values(position, sort, pit)
+            values[0] = -values[0]
+            return values[:width]
+
+        return bisect_right(range(len(self)), target, key=key)
+
+    def _general_order(self, positions, sort):
+        """Sorts positions by any (field, order) sort with stable passes."""
+        positions = list(positions)
+        for index in reversed(range(len(sort))):
+            field, order = sort[index]
+            positions.sort(
+                key=lambda position: self._sort_values(position, sort, False)[index],
+                reverse=order == "desc"
+            )
+        return positions
+
+    def _count(self, clause, limit):
+        if clause.match_all:
+            return len(self)
+        if limit is None:
+            return sum(1 for _ in clause.iter_from(0))
+        return sum(1 for _ in islice(clause.iter_from(0), limit + 1))
+
+    def _aggregate(self, aggs, positions):
+        results = {}
+        for name, spec in aggs.items():
+            if "terms" in spec:
+                field = spec["terms"]["field"]
+                if field not in KEYWORD_FIELDS:
+                    raise bad_request(f"terms aggregation on unsupported field [{field}]")
+                column, values = self.keyword_columns[field], self.keyword_values[field]
+                counts = Counter(column[position] for position in positions)
+                ranked = sorted(counts.items(), key=lambda item: (-item[1], values[item[0]]))
+                size = spec["terms"].get("size", 10)
+                buckets = [{"key": values[code], "doc_count": count} for code, count in ranked[:size]]
+                results[name] = {
+                    "doc_count_error_upper_bound": 0,
+                    "sum_other_doc_count": sum(count for _, count in ranked[size:]),
+                    "buckets": buckets,
+                }
+            elif "date_histogram" in spec:
+                results[name] = self._date_histogram(spec["date_histogram"], positions)
+            else:
+                raise bad_request(f"unsupported aggregation [{name}]")
+        return results
+
+    def _date_histogram(self, spec, positions):
+        if spec.get("field") != "datum":
+            raise bad_request("date_histogram is only supported on [datum]")
+        interval = spec.get("calendar_interval", "month")
+        interval = {"1y": "year", "1q": "quarter", "1M": "month", "1w": "week", "1d": "day"}.get(interval, interval)
+        if interval not in ("year", "quarter", "month", "week", "day"):
+            raise bad_request(f"unsupported calendar_interval [{interval}]")
+
+        bucket_of_day = {}
+        counts = Counter()
+        column = self.datum
+        for position in positions:
+            millis = column[position]
+            if millis == DATUM_MISSING:
+                continue
+            day = millis // DAY_MS
+            key = bucket_of_day.get(day)
+            if key is None:
+                key = bucket_of_day[day] = _bucket_start(day, interval)
+            counts[key] += 1
+
+        min_doc_count = spec.get("min_doc_count", 0)
+        keys = sorted(counts)
+        if min_doc_count == 0 and keys:
+            # ES fills the gaps between the first and last bucket
+            keys, cursor = [], sorted(counts)[0]
+            last = max(counts)
+            while cursor <= last:
+                keys.append(cursor)
+                cursor = _next_bucket(cursor, interval)
+        return {"buckets": [
+            {"key_as_string": format_millis(key), "key": key, "doc_count": counts.get(key, 0)}
+            for key in keys if counts.get(key, 0) >= min_doc_count
+        ]}
+
+    def _execute(self, body, pit=False):
+        started = time.perf_counter()
+        clause = compile_query(self, body.get("query"))
+        sort = parse_sort(body.get("sort"))
+        size = int(body.get("size", 10))
+        from_ = int(body.get("from", 0))
+        search_after = body.get("search_after")
+        aggs = body.get("aggs") or body.get("aggregations")
+
+        track_total_hits = body.get("track_total_hits", DEFAULT_TRACK_TOTAL_HITS)
+        if track_total_hits is True:
+            limit = None
+        elif track_total_hits is False:
+            limit = -1
+        else:
+            limit = int(track_total_hits)
+
+        scored = sort is None or sort[0][0] == "_score"
+        in_storage_order = not scored and (
+            self.index_sorted and sort[:len(STORAGE_SORT)] == STORAGE_SORT[:len(sort)]
+            or sort[0][0] in ("_doc", "_shard_doc")
+        )
+
+        if scored and not size:
+            # Count or aggregations only: nothing to rank
+            hits, matched = [], None
+        elif scored:
+            positions = list(clause.iter_from(0))
+            page = heapq.nsmallest(
+                from_ + size, ((-clause.score(position), position) for position in positions)
+            )[from_:]
+            hits = [(position, -score, [-score] if sort else None) for score, position in page]
+            matched = len(positions)
+        elif in_storage_order:
+            start = self._storage_start(sort, search_after, pit)
+            selected = list(islice(clause.iter_from(start), from_, from_ + size)) if size else []
+            track_scores = body.get("track_scores", False)
+            hits = [
+                (position, clause.score(position) if track_scores else None, self._sort_values(position, sort, pit))
+                for position in selected
+            ]
+            matched = None
+        else:
+            positions = self._general_order(clause.iter_from(0), sort)
+            if search_after is not None:
+                keyed = [(self._sort_values(position, sort, pit), position) for position in positions]
+                positions = [position for values, position in keyed if _after(values, search_after, sort)]
+            hits = [(position, None, self._sort_values(position, sort, pit)) for position in positions[from_:from_ + size]]
+            matched = None
+
+        response_hits = {"max_score": None, "hits": self._render_hits(hits, body.get("_source"))}
+
+        aggregations = None
+        if aggs:
+            all_positions = list(clause.iter_from(0))
+            matched = len(all_positions)
+            aggregations = self._aggregate(aggs, all_positions)
+
+        if limit != -1:
+            total = matched if matched is not None else self._count(clause, limit)
+            if limit is not None and total > limit:
+                response_hits["total"] = {"value": limit, "relation": "gte"}
+            else:
+                response_hits["total"] = {"value": total, "relation": "eq"}
+
+        response = {
+            "took": int((time.perf_counter() - started) * 1000),
+            "timed_out": False,
+            "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+            "hits": response_hits,
+        }
+        if aggregations is not None:
+            response["aggregations"] = aggregations
+        return response
+
+    def _render_hits(self, hits, source_spec):
+        includes, excludes, enabled = None, (), True
+        if source_spec is False:
+            enabled = False
+        elif isinstance(source_spec, (list, str)):
+            includes = set(_as_list(source_spec))
+        elif isinstance(source_spec, dict):
+            includes = set(_as_list(source_spec.get("includes"))) or None
+            excludes = set(_as_list(source_spec.get("excludes")))
+
+        rendered = []
+        for position, score, sort_values in hits:
+            hit = {"_index": self.index_name, "_id": self.doc_id(position), "_score": score}
+            if enabled:
+                hit["_source"] = self.source(position, includes, excludes)
+            if sort_values is not None:
+                hit["sort"] = sort_values
+            rendered.append(hit)
+        return rendered
+
+    # Client API
+
+    def search(self, index=None, body=None, **params):
+        self.calls["search"] += 1
+        body = dict(body or {})
+        for key, value in params.items():
+            if key in SEARCH_BODY_KEYS:
+                body["from" if key == "from_" else key] = value
+        pit = body.pop("pit", None)
+        if pit is not None:
+            self._renew_pit(pit["id"], pit.get("keep_alive"))
+        response = self._execute(body, pit=pit is not None)
+        if pit is not None:
+            response["pit_id"] = pit["id"]
+        return response
+
+    def msearch(self, searches=None, body=None, index=None, **params):
+        self.calls["msearch"] += 1
+        lines = searches if searches is not None else body
+        responses = []
+        for header, search_body in zip(lines[::2], lines[1::2]):
+            try:
+                response = self._execute(search_body)
+                response["status"] = 200
+            except BadRequestError as e:
+                response = {"error": e.body["error"], "status": 400}
+            responses.append(response)
+        return {"took": 0, "responses": responses}
+
+    def count(self, index=None, body=None, query=None, **params):
+        self.calls["count"] += 1
+        query = query if query is not None else (body or {}).get("query")
+        return {"count": self._count(compile_query(self, query), None)}
+
+    def _get_doc(self, doc_id, includes, excludes):
+        position = self._position_of_id(doc_id)
+        if position is None:
+            return None
+        return {
+            "_index": self.index_name,
+            "_id": self.doc_id(position),
+            "_version": 1,
+            "_seq_no": position,
+            "_primary_term": 1,
+            "found": True,
+            "_source": self.source(position, includes, excludes),
+        }
+
+    def get(self, index=None, id=None, source_includes=None, source_excludes=None, **params):
+        self.calls["get"] += 1
+        doc = self._get_doc(id, set(_as_list(source_includes)) or None, set(_as_list(source_excludes)))
+        if doc is None:
+            raise not_found("document_missing_exception", f"[{id}]: document missing")
+        return doc
+
+    def mget(self, index=None, ids=None, body=None, source_includes=None, source_excludes=None, **params):
+        self.calls["mget"] += 1
+        if ids is None:
+            ids = [doc["_id"] for doc in (body or {}).get("docs", [])] or (body or {}).get("ids", [])
+        includes = set(_as_list(source_includes)) or None
+        excludes = set(_as_list(source_excludes))
+        docs = []
+        for doc_id in ids:
+            doc = self._get_doc(doc_id, includes, excludes)
+            docs.append(doc if doc is not None else {"_index": self.index_name, "_id": str(doc_id), "found": False})
+        return {"docs": docs}
+
+    def open_point_in_time(self, index=None, keep_alive="1m", **params):
+        self.calls["open_point_in_time"] += 1
+        pit_id = uuid.uuid4().hex
+        self._pits[pit_id] = time.monotonic() + parse_duration(keep_alive)
+        return {"id": pit_id}
+
+    def close_point_in_time(self, id=None, body=None, **params):
+        self.calls["close_point_in_time"] += 1
+        pit_id = id if id is not None else (body or {}).get("id")
+        if self._pits.pop(pit_id, None) is None:
+            raise not_found("search_context_missing_exception", f"No search context found for id [{pit_id}]")
+        return {"succeeded": True, "num_freed": 1}
+
+    def _renew_pit(self, pit_id, keep_alive):
+        expires = self._pits.get(pit_id)
+        if expires is None or expires < time.monotonic():
+            self._pits.pop(pit_id, None)
+            raise not_found("search_context_missing_exception", f"No search context found for id [{pit_id}]")
+        if keep_alive:
+            self._pits[pit_id] = time.monotonic() + parse_duration(keep_alive)
+
+    def open_pits(self):
+        now = time.monotonic()
+        return sum(1 for expires in self._pits.values() if expires >= now)
+
+    def info(self, **params):
+        return {"name": "fake-es", "version": {"number": "8.15.0"}, "tagline": "You Know, for Search"}
+
+    def ping(self, **params):
+        return True
+
+    def options(self, **params):
+        # Per-request transport options mean nothing to an in-process corpus
+        return self
+
+    def close(self):
+        pass
+
+class AsyncFakeElasticsearch:
+    """AsyncElasticsearch counterpart sharing a FakeElasticsearch corpus."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getattr__(self, name):
+        method = getattr(self.store, name)
+
+        async def call(*args, **kwargs):
+            # Yield once so concurrent callers interleave as they would on I/O
+            await asyncio.sleep(0)
+            return method(*args, **kwargs)
+
+        return call
+
+SEARCH_BODY_KEYS = (
+    "query", "sort", "size", "from_", "search_after", "_source", "pit", "track_total_hits",
+    "track_scores", "aggs", "aggregations",
+)
+
+def _after(values, search_after, sort):
+    """Whether sort values come strictly after search_after in sort order."""
+    for value, after, (_, order) in zip(values, search_after, sort):
+        if value == after:
+            continue
+        return value > after if order == "asc" else value < after
+    return False
+
+def _bucket_start(day, interval):
+    moment = date(1970, 1, 1) + timedelta(days=day)
+    if interval == "year":
+        moment = moment.replace(month=1, day=1)
+    elif interval == "quarter":
+        moment = moment.replace(month=(moment.month - 1) // 3 * 3 + 1, day=1)
+    elif interval == "month":
+        moment = moment.replace(day=1)
+    elif interval == "week":
+        moment = moment - timedelta(days=moment.weekday())
+    return to_millis(moment)
+
+def _next_bucket(millis, interval):
+    moment = datetime.fromtimestamp(millis // 1000, tz=timezone.utc).date()
+    if interval == "day":
+        return millis + DAY_MS
+    if interval == "week":
+        return millis + 7 * DAY_MS
+    months = {"month": 1, "quarter": 3, "year": 12}[interval]
+    month = moment.month - 1 + months
+    return to_millis(date(moment.year + month // 12, month % 12 + 1, 1))
+
+SYNTHETIC_WORDS = (
+    "Fussball", "Bundesliga", "Training", "Pressekonferenz", "Berlin", "Muenchen", "Hamburg",
+    "Barcelona", "Madrid", "Paris", "London", "Tennis", "Formel", "Portrait", "Politik", "Bundestag",
+    "Konzert", "Festival", "Premiere", "Olympia", "Handball", "Eishockey", "Basketball", "Spieler",
+    "Trainer", "Jubel", "Tor", "Stadion", "Fans", "Pokal", "Finale", "Meisterschaft", "Wahl",
+    "Kanzler", "Minister", "Demonstration", "Hochwasser", "Sommer", "Winter", "Strand", "Alpen",
+    "Schnee", "Regen", "Sonnenuntergang", "Flughafen", "Bahnhof", "Autobahn", "Messe", "Mode",
+    "Laufsteg", "Film", "Schauspieler", "Saengerin", "Gala", "Verleihung", "Preis", "Museum",
+)
+
+SYNTHETIC_SURNAMES = (
+    "Mueller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker", "Schulz",
+    "Hoffmann", "Koch", "Richter", "Klein", "Wolf", "Neumann", "Schwarz", "Zimmermann", "Braun",
+)
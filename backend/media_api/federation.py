@@ -0,0 +1,231 @@
+"""
+Federated search over several indices or clusters.
+
+With MEDIA_SEARCH_FEDERATION["ENABLED"], /search/ no longer asks ES_INDEX
+alone. It asks every configured target in parallel:
+
+    MEDIA_SEARCH_FEDERATION = {
+        "ENABLED": True,
+        "TARGETS": [
+            {"name": "live", "index": "imago-live"},
+            {"name": "archive", "index": "imago-archive-*",
+             "hosts": ["https://archive-es:9200"], "timeout": 4.0},
+        ],
+    }
+
+A target without "hosts" lives on the main cluster (ES_HOSTS) and goes
+through its circuit breaker; one with "hosts" gets its own client with the
+same credentials and transport settings. Each target returns its own best
+page, already sorted on `bildnummer desc, db asc`, and the pages are k-way
+merged on that key.
+
+`search_after` becomes a composite cursor, a JSON object with one position
+per target:
+- a list of sort values means the target resumes after that hit,
+- null means the target is exhausted,
+- no entry means the target starts from the top.
+The response's next_search_after is the cursor for the next page.
+
+A target that fails or misses its timeout (TIMEOUT seconds by default) is
+left out of the page, and the response is marked "partial". Its cursor
+position is kept, so the next page asks it again from where it was. The
+response only fails (503) when no target answers.
+
+Facets and PIT cursors still use ES_INDEX alone, and sort=relevance is not
+offered: scores from different indices are not comparable.
+"""
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from itertools import islice
+
+from django.conf import settings
+
+from . import es_client
+from .breaker import SearchUnavailable, es_breaker
+from .cursors import InvalidCursor
+from .es_client import (
+    build_search_body,
+    count_is_exact,
+    parse_count_mode,
+    parse_search_response,
+)
+from .planner import RELEVANCE
+from .timing import phase
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEDERATION_SETTINGS = {
+    "ENABLED": False,
+    "TARGETS": [],
+    # Seconds a target may take before the page is served without it
+    "TIMEOUT": 2.0,
+    "MAX_WORKERS": 8,
+}
+
+_lock = threading.Lock()
+_pid = None
+_executor = None
+_clients = {}
+
+
+def federation_settings():
+    configured = getattr(settings, "MEDIA_SEARCH_FEDERATION", {})
+    return {**DEFAULT_FEDERATION_SETTINGS, **configured}
+
+
+def federation_enabled():
+    config = federation_settings()
+    return bool(config["ENABLED"] and config["TARGETS"])
+
+
+def _per_process():
+    # Threads and sockets don't survive a fork; each worker builds its own
+    global _pid, _executor
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=federation_settings()["MAX_WORKERS"], thread_name_prefix="federation"
+                )
+                _clients.clear()
+                _pid = os.getpid()
+    return _executor
+
+
+def target_client(target):
+    """The client for a target: the main one, or one for its own hosts."""
+    hosts = target.get("hosts")
+    if not hosts:
+        return es_client.get_es()
+    key = tuple(hosts)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = es_client.create_es(list(hosts))
+    return client
+
+
+def parse_composite_search_after(raw):
+    """Decodes a composite search_after into {target name: sort values or None}."""
+    if raw is None or raw == "":
+        return None
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            raise InvalidCursor("search_after must be a JSON object of per-target positions.")
+    if not isinstance(raw, dict):
+        raise InvalidCursor("search_after must be a JSON object of per-target positions.")
+    names = {target["name"] for target in federation_settings()["TARGETS"]}
+    for name, position in raw.items():
+        if name not in names:
+            raise InvalidCursor(f"Unknown search target in search_after: {name!r}.")
+        if position is not None and not (
+            isinstance(position, list) and position and not any(isinstance(value, (dict, list)) for value in position)
+        ):
+            raise InvalidCursor(f"Invalid search_after position for {name!r}.")
+    return raw
+
+
+def _search(target, body, timeout):
+    client = target_client(target).options(request_timeout=timeout)
+    if target.get("hosts"):
+        return client.search(index=target["index"], body=body)
+    with es_breaker.guard():
+        return client.search(index=target["index"], body=body)
+
+
+def _sort_key(hit):
+    bildnummer, db = hit["sort"][:2]
+    return -int(bildnummer), db
+
+
+def federated_search(query=None, page=1, page_size=10, fotografen=None, datum_von=None,
+                     datum_bis=None, bildnummer=None, search_after=None, fields=None,
+                     count_mode=None, sort=None):
+    """A page merged from every target; same shape as execute_media_search's, plus "partial" and "targets"."""
+    if sort == RELEVANCE:
+        raise InvalidCursor("sort=relevance is not available for federated search.")
+    config = federation_settings()
+    executor = _per_process()
+    positions = parse_composite_search_after(search_after) or {}
+    track_total_hits = parse_count_mode(count_mode)
+
+    # Without a cursor, page N needs the first N pages of every target
+    skip = (page - 1) * page_size if not positions else 0
+    size = skip + page_size
+
+    started = time.monotonic()
+    pending = {}
+    for target in config["TARGETS"]:
+        name = target["name"]
+        if name in positions and positions[name] is None:
+            continue
+        body = build_search_body(
+            query, 1, size, fotografen, datum_von, datum_bis, bildnummer, positions.get(name), fields,
+            track_total_hits=track_total_hits,
+        )
+        timeout = target.get("timeout", config["TIMEOUT"])
+        pending[name] = (executor.submit(_search, target, body, timeout), timeout)
+
+    statuses, pages, totals = {}, {}, []
+    with phase("es"):
+        for name, (future, timeout) in pending.items():
+            try:
+                response = future.result(timeout=max(0.0, started + timeout - time.monotonic()))
+            except FutureTimeout:
+                future.cancel()
+                statuses[name] = "timeout"
+                logger.warning("Federated target %s timed out after %ss", name, timeout)
+                continue
+            except Exception as e:
+                statuses[name] = "error"
+                logger.error("Federated target %s failed: %s", name, e)
+                continue
+            hits, total = parse_search_response(response)
+            statuses[name], pages[name] = "ok", hits
+            totals.append(total)
+
+    if pending and not pages:
+        raise SearchUnavailable("No search target answered.")
+
+    # Tag each hit with its target, merge, then see how far into each page we got
+    streams = [[(_sort_key(hit), name, hit) for hit in hits] for name, hits in pages.items()]
+    merged = list(islice(heapq.merge(*streams, key=lambda entry: entry[:2]), size))
+    consumed = {name: 0 for name in pages}
+    for _, name, _ in merged:
+        consumed[name] += 1
+
+    next_positions = dict(positions)
+    for name, hits in pages.items():
+        taken = consumed[name]
+        if taken == len(hits) and len(hits) < size:
+            next_positions[name] = None
+        elif taken:
+            next_positions[name] = hits[taken - 1]["sort"]
+    more = any(next_positions.get(target["name"], True) is not None for target in config["TARGETS"])
+
+    partial = len(pages) < len(pending)
+    page_hits = [hit for _, _, hit in merged[skip:]]
+    with phase("normalize"):
+        results = es_client.normalize_hits(page_hits)
+    counted = None if any(total is None for total in totals) else sum(totals)
+    return {
+        "count": counted,
+        "count_exact": None if counted is None else (
+            not partial and all(count_is_exact(total, track_total_hits) for total in totals)
+        ),
+        "page": page,
+        "page_size": page_size,
+        "results": results,
+        "next_search_after": next_positions if more else None,
+        "partial": partial,
+        "targets": statuses,
+    }
@@ -0,0 +1,333 @@
+"""
+Bulk loading of media records into a fresh index behind the ES_INDEX alias.
+
+A load creates a new versioned index, e.g. "imago-20261018093000", with
+refresh off and no replicas, and fills it with parallel `_bulk` batches.
+It then restores refresh and replicas, refreshes once, and moves the alias
+onto it in one `_aliases` call. Searches keep hitting the previous index
+until that call, so ES_INDEX never serves a half-built index.
+
+Document ids come from a template over the record (ES_BILDNUMMER_ID_TEMPLATE
+when set), so indexing a batch twice overwrites rather than duplicates.
+That makes loads resumable: a checkpoint file records the index and the
+batches done, and a rerun with resume skips them.
+
+Indices are created from a versioned index template matching "<alias>-*"
+(`manage.py install_index_template`). It holds the mapping build_query
+relies on and sorts each index on `bildnummer desc, db asc`, the sort of
+every search, so ES can stop collecting once a page is full instead of
+sorting all matches. Index sorting is fixed when an index is created,
+which is why it lives in the template rather than in put_settings.
+
+Used by `manage.py index_media` and `manage.py install_index_template`.
+"""
+import csv
+import json
+import logging
+import os
+import string
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from itertools import islice
+
+logger = logging.getLogger(__name__)
+
+# Bump when the template changes; install_index_template only replaces
+# an installed template with a lower version
+TEMPLATE_VERSION = 1
+
+MEDIA_MAPPINGS = {
+    "dynamic": False,
+    "properties": {
+        "bildnummer": {"type": "long"},
+        "db": {"type": "keyword"},
+        "datum": {"type": "date"},
+        "fotografen": {"type": "keyword"},
+        "suchtext": {"type": "text", "analyzer": "suchtext"},
+        "hoehe": {"type": "integer"},
+        "breite": {"type": "integer"},
+    },
+}
+
+MEDIA_ANALYSIS = {
+    "analyzer": {
+        # "Müller", "Mueller" and "MULLER" all index as "muller"
+        "suchtext": {
+            "type": "custom",
+            "tokenizer": "standard",
+            "filter": ["lowercase", "german_normalization", "asciifolding"],
+        },
+    },
+}
+
+# Matches the sort of build_search_body
+INDEX_SORT = {"field": ["bildnummer", "db"], "order": ["desc", "asc"]}
+
+# While loading: no periodic refreshes, and replicas are built once at
+# the end by copying segments instead of indexing every document twice
+BULK_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+
+# Restored after the load unless the index behind the alias says otherwise
+LIVE_SETTINGS = {"refresh_interval": "1s", "number_of_replicas": 1}
+
+# Shared with es_client's bildnummer lookup through ES_BILDNUMMER_ID_TEMPLATE
+DEFAULT_ID_TEMPLATE = "{db}-{bildnummer}"
+
+# Items ES rejects for load (429) are retried this many times with backoff
+BULK_RETRIES = 3
+BULK_RETRY_BACKOFF = 1.0
+
+
+class IngestError(Exception):
+    """A load that stopped; rerunning it with resume picks it up."""
+
+
+def detect_format(path):
+    if path.lower().endswith(".csv"):
+        return "csv"
+    return "ndjson"
+
+
+class InvalidRecord(IngestError):
+    """A record that can't be indexed; fix the file, then resume."""
+
+
+def clean_record(record):
+    """
+    A record as stored: empty fields dropped, bildnummer an int. Raises
+    ValueError without a bildnummer and db, which every document id needs.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("expected an object")
+    source = {key: value for key, value in record.items() if value not in (None, "")}
+    missing = [field for field in ("bildnummer", "db") if field not in source]
+    if missing:
+        raise ValueError(f"missing {' and '.join(missing)}")
+    try:
+        source["bildnummer"] = int(source["bildnummer"])
+    except (TypeError, ValueError):
+        raise ValueError(f"bildnummer is not a number: {source['bildnummer']!r}")
+    return source
+
+
+def read_records(path, format=None):
+    """Yields cleaned records from an NDJSON or CSV file; raises InvalidRecord with the line number."""
+    format = format or detect_format(path)
+    with open(path, newline="", encoding="utf-8") as handle:
+        if format == "csv":
+            reader = csv.DictReader(handle)
+            rows = ((reader.line_num, row) for row in reader)
+        else:
+            rows = ((number, line) for number, line in enumerate(handle, 1) if line.strip())
+        for number, row in rows:
+            try:
+                yield clean_record(row if format == "csv" else json.loads(row))
+            except ValueError as e:
+                raise InvalidRecord(f"{path}, line {number}: {e}") from None
+
+
+def numbered_batches(records, size, skip=frozenset()):
+    """Yields (number, records) for each `size` records, minus batches in `skip`."""
+    records = iter(records)
+    number = 0
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        if number not in skip:
+            yield number, batch
+        number += 1
+
+
+def check_id_template(id_template):
+    """Raises ValueError unless the template tells every (bildnummer, db) apart."""
+    names = {name for _, name, _, _ in string.Formatter().parse(id_template) if name}
+    if not {"bildnummer", "db"} <= names:
+        # bildnummer alone is not unique: the same number exists in several dbs
+        raise ValueError(f"The id template must use {{bildnummer}} and {{db}}: {id_template!r}")
+
+
+def bulk_operations(index, records, id_template):
+    operations = []
+    for record in records:
+        operations.append({"index": {"_index": index, "_id": id_template.format(**record)}})
+        operations.append(record)
+    return operations
+
+
+def index_batch(client, index, records, id_template):
+    """Indexes one batch; returns (indexed, errors) after retrying rejected items."""
+    pending = records
+    errors = []
+    for attempt in range(BULK_RETRIES + 1):
+        response = client.bulk(operations=bulk_operations(index, pending, id_template), refresh=False)
+        if not response.get("errors"):
+            return len(records) - len(errors), errors
+        rejected = []
+        for record, item in zip(pending, response["items"]):
+            result = next(iter(item.values()))
+            if result.get("status") == 429 and attempt < BULK_RETRIES:
+                rejected.append(record)
+            elif "error" in result:
+                errors.append({"_id": result.get("_id"), "error": result["error"]})
+        if not rejected:
+            break
+        time.sleep(BULK_RETRY_BACKOFF * 2 ** attempt)
+        pending = rejected
+    return len(records) - len(errors), errors
+
+
+def template_name(alias):
+    return f"{alias}-template"
+
+
+def index_template(alias):
+    """The composable index template for every versioned index of `alias`."""
+    return {
+        "index_patterns": [f"{alias}-*"],
+        "version": TEMPLATE_VERSION,
+        "priority": 100,
+        "template": {
+            "settings": {"index": {"sort": INDEX_SORT}, "analysis": MEDIA_ANALYSIS},
+            "mappings": MEDIA_MAPPINGS,
+        },
+        "_meta": {"managed_by": "media_api.indexing"},
+    }
+
+
+def installed_template_version(client, alias):
+    name = template_name(alias)
+    if not client.indices.exists_index_template(name=name):
+        return None
+    templates = client.indices.get_index_template(name=name)["index_templates"]
+    return templates[0]["index_template"].get("version")
+
+
+def install_index_template(client, alias, force=False):
+    """Installs the template unless it is already at TEMPLATE_VERSION or newer; returns whether it did."""
+    installed = installed_template_version(client, alias)
+    if not force and installed is not None and installed >= TEMPLATE_VERSION:
+        return False
+    client.indices.put_index_template(name=template_name(alias), **index_template(alias))
+    return True
+
+
+def versioned_index_name(alias, now=None):
+    now = now or datetime.now(timezone.utc)
+    return f"{alias}-{now:%Y%m%d%H%M%S}"
+
+
+def aliased_indices(client, alias):
+    """Names of the indices `alias` points at; raises if it is a concrete index."""
+    if client.indices.exists(index=alias) and not client.indices.exists_alias(name=alias):
+        raise IngestError(f"{alias} is an index, not an alias; reindex it behind an alias first.")
+    if not client.indices.exists_alias(name=alias):
+        return []
+    return sorted(client.indices.get_alias(name=alias))
+
+
+def live_settings(client, indices):
+    """The refresh and replica settings to restore, taken from the serving index."""
+    restored = dict(LIVE_SETTINGS)
+    if indices:
+        current = client.indices.get_settings(index=indices[0])[indices[0]]["settings"]["index"]
+        for name in restored:
+            if name in current:
+                restored[name] = current[name]
+    return restored
+
+
+def swap_alias(client, alias, index, old_indices):
+    """Points `alias` at `index` only, atomically."""
+    actions = [{"remove": {"index": old, "alias": alias}} for old in old_indices if old != index]
+    actions.append({"add": {"index": index, "alias": alias}})
+    client.indices.update_aliases(actions=actions)
+
+
+class Checkpoint:
+    """Progress of one load, kept in a JSON file so it survives a crash."""
+
+    def __init__(self, path, state):
+        self.path = path
+        self.state = state
+        self.done = set(state["done"])
+        self._lock = threading.Lock()
+
+    @classmethod
+    def start(cls, path, index, source, batch_size):
+        return cls(path, {
+            "index": index, "source": os.path.abspath(source), "batch_size": batch_size,
+            "done": [], "indexed": 0, "failed": 0,
+        })
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as handle:
+            return cls(path, json.load(handle))
+
+    def record(self, number, indexed, failed):
+        with self._lock:
+            self.done.add(number)
+            self.state["indexed"] += indexed
+            self.state["failed"] += failed
+            self.save()
+
+    def save(self):
+        self.state["done"] = sorted(self.done)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump(self.state, handle)
+        # Atomic on POSIX: a crash leaves the old or the new file, never half
+        os.replace(temporary, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def load_batches(client, checkpoint, batches, id_template, workers, report=None, report_interval=10.0):
+    """
+    Indexes `batches` on `workers` threads, recording each in `checkpoint`.
+    At most two batches per worker are read ahead, so memory stays flat
+    whatever the file size. Raises IngestError on the first failed call.
+    """
+    index = checkpoint.state["index"]
+    started = last_report = time.perf_counter()
+    indexed = 0
+    in_flight = {}
+
+    def finish(done):
+        nonlocal indexed, last_report
+        for future in done:
+            number = in_flight.pop(future)
+            try:
+                batch_indexed, errors = future.result()
+            except Exception as e:
+                raise IngestError(f"Batch {number} failed: {e}") from e
+            for error in errors[:3]:
+                logger.warning("Document %s rejected: %s", error["_id"], error["error"])
+            checkpoint.record(number, batch_indexed, len(errors))
+            indexed += batch_indexed
+        now = time.perf_counter()
+        if report is not None and now - last_report >= report_interval:
+            report(indexed, now - started)
+            last_report = now
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-index") as pool:
+        try:
+            for number, records in batches:
+                if len(in_flight) >= 2 * workers:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    finish(done)
+                future = pool.submit(index_batch, client, index, records, id_template)
+                in_flight[future] = number
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                finish(done)
+        except BaseException:
+            for future in in_flight:
+                future.cancel()
+            raise
+    return indexed, time.perf_counter() - started
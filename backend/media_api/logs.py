@@ -0,0 +1,196 @@
+"""
+Logging for the search path: a background writer, sampling and a slow-query log.
+
+QueueingHandler stands in front of the console and file handlers in
+LOGGING. A request thread only appends the record to a bounded queue; a
+listener thread renders the message and writes it out. Together with
+%-style arguments (never f-strings) on the search path, a record below
+the configured level costs one level check, and one that passes costs a
+queue put. Messages are rendered on the writer thread, so arguments must
+not be mutated after they are logged. When the queue is full, records are
+dropped and counted rather than blocking the request. A forked worker
+starts its own queue and thread on its first record.
+
+SamplingFilter keeps MEDIA_SEARCH_LOGGING["INFO_SAMPLE_RATE"] of the INFO
+and DEBUG records of high-volume loggers such as media_api.planner;
+warnings and errors always pass.
+
+ServerTimingMiddleware calls log_slow_query for every timed /api/media/
+request. A request slower than SLOW_QUERY_THRESHOLD seconds is logged on
+"media_api.slow_queries" with its canonical query, ES `took`, wall time
+and hit count; JsonFormatter writes those as one JSON object per line.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import weakref
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+DEFAULT_LOGGING_SETTINGS = {
+    # Records waiting for the writer thread; more are dropped
+    "QUEUE_SIZE": 10000,
+    # Share of INFO/DEBUG records kept by SamplingFilter
+    "INFO_SAMPLE_RATE": 1.0,
+    # Seconds; None turns the slow-query log off
+    "SLOW_QUERY_THRESHOLD": 1.0,
+}
+
+slow_query_logger = logging.getLogger("media_api.slow_queries")
+
+_queueing_handlers = weakref.WeakSet()
+
+
+def logging_settings():
+    configured = getattr(settings, "MEDIA_SEARCH_LOGGING", {})
+    return {**DEFAULT_LOGGING_SETTINGS, **configured}
+
+
+def _handler_named(name):
+    # logging.getHandlerByName only exists from Python 3.12 on; dictConfig
+    # has built the handlers named before this one by the time it is called
+    lookup = getattr(logging, "getHandlerByName", None)
+    handler = lookup(name) if lookup is not None else logging._handlers.get(name)
+    if handler is None:
+        raise ValueError(f"No logging handler named {name!r}")
+    return handler
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Waits for room, unlike put_nowait: the queue may be full at shutdown
+        self.queue.put(self._sentinel)
+
+
+class QueueingHandler(QueueHandler):
+    """
+    Passes records to `targets` (handlers or names of handlers in LOGGING)
+    on a background thread.
+    """
+
+    def __init__(self, targets=(), queue_size=None):
+        super().__init__(None)
+        # Resolved now: LOGGING only references handlers by name, and the
+        # name registry drops a handler that nothing else holds on to
+        self.targets = [target if isinstance(target, logging.Handler) else _handler_named(target)
+                        for target in targets]
+        self.queue_size = logging_settings()["QUEUE_SIZE"] if queue_size is None else queue_size
+        self.listener = None
+        self.dropped = 0
+        self._pid = None
+        _queueing_handlers.add(self)
+
+    def _start(self):
+        # The parent's queue lock and thread are unusable after a fork
+        self.queue = queue.Queue(self.queue_size)
+        self.listener = _Listener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+        self._pid = os.getpid()
+
+    def emit(self, record):
+        # Handler.handle holds self.lock, so only one thread starts the listener
+        if self._pid != os.getpid():
+            self._start()
+        super().emit(record)
+
+    def prepare(self, record):
+        # QueueHandler.prepare would render the message here; the listener does it instead
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self.acquire()
+        try:
+            if self.listener is not None and self._pid == os.getpid():
+                # Writes out whatever is still queued
+                self.listener.stop()
+            self.listener = None
+        finally:
+            self.release()
+        super().close()
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "dropped": self.dropped,
+        }
+
+
+def queue_stats():
+    """Queued and dropped records, summed over this process's QueueingHandlers."""
+    totals = {"queued": 0, "dropped": 0}
+    for handler in list(_queueing_handlers):
+        for name, value in handler.stats().items():
+            totals[name] += value
+    return totals
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps INFO_SAMPLE_RATE of the records below WARNING."""
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = logging_settings()["INFO_SAMPLE_RATE"]
+        return rate >= 1 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the record's `fields` at the top level."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _milliseconds(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def log_slow_query(request, response, timer, total):
+    """Logs the request on media_api.slow_queries if it took `total` >= SLOW_QUERY_THRESHOLD seconds."""
+    threshold = logging_settings()["SLOW_QUERY_THRESHOLD"]
+    if threshold is None or total < threshold or not slow_query_logger.isEnabledFor(logging.WARNING):
+        return
+
+    if timer.search is not None:
+        # Imported here: cache builds its ResultCache from settings on import,
+        # and es_client (through timing) must import without settings
+        from .cache import canonical_query
+        query = dict(canonical_query(**timer.search))
+    else:
+        # Searches that bypass execute_media_search's main path (cursor, id lookup)
+        query = {name: request.GET.getlist(name) for name in sorted(request.GET)}
+    data = getattr(response, "data", None)
+    results = data.get("results") if isinstance(data, dict) else None
+    slow_query_logger.warning(
+        "Slow search: %s took %.0f ms", request.path, total * 1000,
+        extra={"fields": {
+            "path": request.path,
+            "status": response.status_code,
+            "query_type": timer.query_type,
+            "query": query,
+            "es_took_ms": _milliseconds(timer.phases.get("es_took")),
+            "es_ms": _milliseconds(timer.phases.get("es")),
+            "total_ms": _milliseconds(total),
+            "hits": len(results) if isinstance(results, list) else None,
+            "count": data.get("count") if isinstance(data, dict) else None,
+        }},
+    )
@@ -0,0 +1,136 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from elasticsearch8.exceptions import ApiError, TransportError
+
+from media_api import es_client
+from media_api.cache import bump_index_generation
+from media_api.indexing import (
+    BULK_SETTINGS,
+    DEFAULT_ID_TEMPLATE,
+    Checkpoint,
+    IngestError,
+    aliased_indices,
+    check_id_template,
+    install_index_template,
+    live_settings,
+    load_batches,
+    numbered_batches,
+    read_records,
+    swap_alias,
+    versioned_index_name,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Indexes NDJSON or CSV media records into a new versioned index, then "
+        "points the ES_INDEX alias at it. Rerun with --resume after a crash."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON (one record per line) or CSV file with a header row.")
+        parser.add_argument("--format", choices=("ndjson", "csv"), help="Defaults to the file extension.")
+        parser.add_argument("--alias", default=es_client.ES_INDEX, help="Alias to repoint (default: ES_INDEX).")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument(
+            "--id-template", default=es_client.ES_BILDNUMMER_ID_TEMPLATE or DEFAULT_ID_TEMPLATE,
+            help="Document id pattern over record fields (default: ES_BILDNUMMER_ID_TEMPLATE or %(default)s).",
+        )
+        parser.add_argument("--checkpoint", help="Progress file (default: <path>.checkpoint.json).")
+        parser.add_argument("--resume", action="store_true", help="Continue the load recorded in the checkpoint.")
+        parser.add_argument("--delete-old", action="store_true", help="Delete the indices the alias pointed at before.")
+        parser.add_argument("--request-timeout", type=float, default=120.0)
+
+    def handle(self, *args, **options):
+        alias = options["alias"]
+        if not alias:
+            raise CommandError("No alias given and ES_INDEX is not set.")
+        try:
+            check_id_template(options["id_template"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        checkpoint_path = options["checkpoint"] or f"{options['path']}.checkpoint.json"
+        client = es_client.get_es().options(request_timeout=options["request_timeout"])
+
+        try:
+            old_indices = aliased_indices(client, alias)
+            if options["resume"]:
+                checkpoint = self.resume(checkpoint_path, options)
+            else:
+                if os.path.exists(checkpoint_path):
+                    raise CommandError(
+                        f"{checkpoint_path} records an unfinished load; pass --resume or delete it."
+                    )
+                checkpoint = self.start(client, alias, old_indices, checkpoint_path, options)
+            index = checkpoint.state["index"]
+
+            batches = numbered_batches(
+                read_records(options["path"], options["format"]), options["batch_size"], checkpoint.done
+            )
+            indexed, elapsed = load_batches(
+                client, checkpoint, batches, options["id_template"], options["workers"], self.report
+            )
+            self.stdout.write(
+                f"Indexed {indexed} documents into {index} in {elapsed:.1f}s "
+                f"({indexed / elapsed if elapsed else 0:.0f} docs/s)."
+            )
+            if checkpoint.state["failed"]:
+                self.stderr.write(f"{checkpoint.state['failed']} documents were rejected; see the log.")
+
+            try:
+                client.indices.put_settings(index=index, settings=checkpoint.state["live_settings"])
+                client.indices.refresh(index=index)
+                swap_alias(client, alias, index, old_indices)
+            except (ApiError, TransportError) as e:
+                raise IngestError(f"Finishing {index} failed: {e}") from e
+        except IngestError as e:
+            raise CommandError(f"{e}. Progress is saved in {checkpoint_path}; rerun with --resume.")
+
+        checkpoint.remove()
+        generation = bump_index_generation()
+        self.stdout.write(self.style.SUCCESS(
+            f"{alias} now points at {index} ({checkpoint.state['indexed']} documents); "
+            f"search cache generation {generation}."
+        ))
+        if options["delete_old"]:
+            for old in old_indices:
+                if old != index:
+                    client.indices.delete(index=old)
+                    self.stdout.write(f"Deleted {old}.")
+
+    def start(self, client, alias, old_indices, checkpoint_path, options):
+        index = versioned_index_name(alias)
+        restored = live_settings(client, old_indices)
+        # Mapping and index sorting come from the template
+        if install_index_template(client, alias):
+            self.stdout.write(f"Installed the {alias} index template.")
+        client.indices.create(index=index, settings=BULK_SETTINGS)
+        checkpoint = Checkpoint.start(checkpoint_path, index, options["path"], options["batch_size"])
+        checkpoint.state["live_settings"] = restored
+        checkpoint.save()
+        self.stdout.write(f"Loading {options['path']} into {index}.")
+        return checkpoint
+
+    def resume(self, checkpoint_path, options):
+        if not os.path.exists(checkpoint_path):
+            raise CommandError(f"Nothing to resume: {checkpoint_path} does not exist.")
+        checkpoint = Checkpoint.load(checkpoint_path)
+        source = os.path.abspath(options["path"])
+        if checkpoint.state["source"] != source:
+            raise CommandError(
+                f"{checkpoint_path} records a load of {checkpoint.state['source']}, not {source}."
+            )
+        if checkpoint.state["batch_size"] != options["batch_size"]:
+            raise CommandError(
+                f"The load was started with --batch-size {checkpoint.state['batch_size']}; resume with the same."
+            )
+        self.stdout.write(
+            f"Resuming the load into {checkpoint.state['index']}: "
+            f"{len(checkpoint.done)} batches ({checkpoint.state['indexed']} documents) already done."
+        )
+        return checkpoint
+
+    def report(self, indexed, elapsed):
+        self.stdout.write(f"  {indexed} documents, {indexed / elapsed:.0f} docs/s")
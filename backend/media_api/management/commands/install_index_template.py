@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from media_api import es_client
+from media_api.indexing import (
+    TEMPLATE_VERSION,
+    install_index_template,
+    installed_template_version,
+    template_name,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Installs the index template (mapping and index sorting on bildnummer desc, db asc) "
+        "applied to every new versioned index behind the ES_INDEX alias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--alias", default=es_client.ES_INDEX, help="Alias whose indices it applies to (default: ES_INDEX).")
+        parser.add_argument("--force", action="store_true", help="Replace the template even if it is up to date.")
+
+    def handle(self, *args, **options):
+        alias = options["alias"]
+        if not alias:
+            raise CommandError("No alias given and ES_INDEX is not set.")
+        installed = installed_template_version(es_client.get_es(), alias)
+        if install_index_template(es_client.get_es(), alias, options["force"]):
+            self.stdout.write(self.style.SUCCESS(
+                f"Installed {template_name(alias)} version {TEMPLATE_VERSION} (was {installed or 'absent'}). "
+                f"It applies to indices created from now on; run index_media to rebuild."
+            ))
+        else:
+            self.stdout.write(f"{template_name(alias)} is up to date (version {installed}).")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from media_api.cache import bump_index_generation
+
+
+class Command(BaseCommand):
+    help = "Invalidates all cached search results by bumping the index generation."
+
+    def handle(self, *args, **options):
+        generation = bump_index_generation()
+        self.stdout.write(self.style.SUCCESS(f"Search cache invalidated (generation {generation})."))
@@ -0,0 +1,107 @@
+"""
+Query planning: the cheapest DSL for each class of search.
+
+Results are sorted on `bildnummer desc, db asc`, so relevance scores would
+be computed only to be thrown away. plan_query classifies a search and
+emits non-scoring DSL for it:
+
+    id_lookup      bildnummer term (plus any filters)   constant_score
+    filter_only    photographer and/or date filters     constant_score, or
+                   or nothing at all (q=*)              match_all
+    text           q                                    constant_score
+    text_filters   q plus filters                       constant_score
+
+In filter context ES skips scoring entirely, caches the filters, and can
+stop early on an index sorted like the search. Only `sort=relevance` on a
+text search scores: the text goes in `must` and results are ordered by
+_score, then bildnummer.
+
+Every plan is logged at DEBUG on "media_api.planner" for auditing; it is
+off the hot path unless that logger is turned up.
+"""
+import logging
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+ID_LOOKUP = "id_lookup"
+FILTER_ONLY = "filter_only"
+TEXT = "text"
+TEXT_FILTERS = "text_filters"
+
+# Sort modes a search can ask for; None is the bildnummer sort
+RELEVANCE = "relevance"
+SORT_MODES = ("bildnummer", RELEVANCE)
+
+BILDNUMMER_SORT = [{"bildnummer": "desc"}, {"db": "asc"}]
+RELEVANCE_SORT = [{"_score": "desc"}, *BILDNUMMER_SORT]
+
+TEXT_FIELDS = ["suchtext^3", "fotografen"]
+
+
+class QueryPlan(NamedTuple):
+    kind: str
+    scored: bool
+    query: dict
+    sort: list
+
+
+def has_text(query):
+    return bool(query) and query.strip() not in ("", "*")
+
+
+def classify(query=None, fotografen=None, datum_von=None, datum_bis=None, bildnummer=None):
+    if bildnummer:
+        return ID_LOOKUP
+    filtered = bool(fotografen or datum_von or datum_bis)
+    if has_text(query):
+        return TEXT_FILTERS if filtered else TEXT
+    return FILTER_ONLY
+
+
+def filter_clauses(fotografen=None, datum_von=None, datum_bis=None, bildnummer=None):
+    clauses = []
+    if bildnummer:
+        clauses.append({"term": {"bildnummer": int(bildnummer)}})
+    if fotografen:
+        if len(fotografen) == 1:
+            clauses.append({"term": {"fotografen": fotografen[0]}})
+        else:
+            clauses.append({"terms": {"fotografen": fotografen}})
+    if datum_von or datum_bis:
+        bounds = {}
+        if datum_von:
+            bounds["gte"] = datum_von
+        if datum_bis:
+            bounds["lte"] = datum_bis
+        clauses.append({"range": {"datum": bounds}})
+    return clauses
+
+
+def plan_query(query=None, fotografen=None, datum_von=None, datum_bis=None, bildnummer=None, sort=None):
+    """Returns the QueryPlan of a search; `sort` is None or RELEVANCE."""
+    kind = classify(query, fotografen, datum_von, datum_bis, bildnummer)
+    filters = filter_clauses(fotografen, datum_von, datum_bis, bildnummer)
+    text = None
+    if kind in (TEXT, TEXT_FILTERS):
+        text = {"multi_match": {"query": query, "fields": TEXT_FIELDS}}
+
+    if sort == RELEVANCE and text is not None:
+        plan = QueryPlan(kind, True, {"bool": {"must": [text], "filter": filters}}, RELEVANCE_SORT)
+    else:
+        clauses = filters + ([text] if text is not None else [])
+        if not clauses:
+            dsl = {"match_all": {}}
+        elif len(clauses) == 1:
+            dsl = {"constant_score": {"filter": clauses[0]}}
+        else:
+            dsl = {"constant_score": {"filter": {"bool": {"filter": clauses}}}}
+        plan = QueryPlan(kind, False, dsl, BILDNUMMER_SORT)
+
+    logger.debug(
+        "Query plan: kind=%s scored=%s sort=%s clauses=%d%s",
+        plan.kind, plan.scored, RELEVANCE if plan.scored else "bildnummer",
+        len(filters) + (text is not None),
+        " (relevance requested without text; nothing to score)" if sort == RELEVANCE and not plan.scored else "",
+    )
+    return plan
@@ -0,0 +1,224 @@
+"""
+Speculative prefetch of the next result page (opt-in).
+
+Most sessions that load page N of /search/ ask for page N+1 within
+seconds. With MEDIA_SEARCH_PREFETCH["ENABLED"], each full page that
+execute_media_search serves schedules a search for the page after it,
+using its next_search_after. That search runs on a small thread pool and
+lands in the result cache, where the follow-up request finds it. The page
+is stored under two keys: with the search_after the frontend sends along
+with page N+1, and, when page N was requested by number, by number too.
+
+Prefetch only uses spare capacity. Nothing is scheduled when:
+- MAX_PENDING prefetches are already queued or running,
+- MAX_FOREGROUND user searches are waiting on ES in this process,
+- the moving average of their ES latency is above BUSY_LATENCY, or
+- the circuit breaker is not closed.
+A prefetch that finds its page already cached returns without an ES call.
+
+Outcomes are counted in media_search_prefetch_total on /metrics. A "hit"
+is a cache hit on a page this process prefetched, so the hit rate is
+hits / stored. A hit on a page prefetched by another worker is not seen.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .breaker import CLOSED, es_breaker
+from .cache import result_cache
+from .timing import Counter, register
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFETCH_SETTINGS = {
+    "ENABLED": False,
+    "MAX_WORKERS": 2,
+    # Prefetches queued or running at once; more are dropped, not queued
+    "MAX_PENDING": 4,
+    # User searches in flight to ES above which nothing is prefetched
+    "MAX_FOREGROUND": 16,
+    # Seconds; moving average of user searches' ES time that counts as busy
+    "BUSY_LATENCY": 0.5,
+}
+
+# Prefetched keys remembered per process to count hits
+TRACKED_KEYS = 4096
+
+# Weight of the newest sample in the foreground latency average
+LATENCY_SMOOTHING = 0.2
+
+prefetch_events = register(Counter(
+    "media_search_prefetch_total",
+    "Next-page prefetches by outcome; hit/stored is the prefetch hit rate.",
+    ("outcome",),
+))
+
+# Set inside prefetch tasks: their searches are not user traffic and
+# must not schedule prefetches of their own
+_prefetching = ContextVar("media_search_prefetching", default=False)
+
+
+def prefetch_settings():
+    configured = getattr(settings, "MEDIA_SEARCH_PREFETCH", {})
+    return {**DEFAULT_PREFETCH_SETTINGS, **configured}
+
+
+class Prefetcher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._pending = 0
+        self._foreground = 0
+        self._latency = 0.0
+        self._prefetched = OrderedDict()
+
+    # Foreground load
+
+    @contextmanager
+    def foreground(self):
+        """Wraps a user search's ES call, to tell when ES is busy."""
+        if _prefetching.get():
+            yield
+            return
+        with self._lock:
+            self._foreground += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._foreground -= 1
+                self._latency += LATENCY_SMOOTHING * (elapsed - self._latency)
+
+    def busy(self, config):
+        return (
+            self._foreground >= config["MAX_FOREGROUND"]
+            or self._latency >= config["BUSY_LATENCY"]
+            or es_breaker.state != CLOSED
+        )
+
+    # Scheduling
+
+    def schedule(self, search, search_kwargs, result):
+        """
+        Queues `search(**kwargs)` for the page after `result`, if the
+        result is a full, fresh page and there is capacity to spare.
+        """
+        if _prefetching.get():
+            return
+        config = prefetch_settings()
+        if not config["ENABLED"] or not result_cache.enabled:
+            return
+        next_search_after = result.get("next_search_after")
+        if next_search_after is None or result.get("stale"):
+            return
+        if len(result.get("results", ())) < search_kwargs["page_size"]:
+            return
+
+        if self.busy(config):
+            prefetch_events.inc(("skipped_busy",))
+            return
+        with self._lock:
+            if self._pending >= config["MAX_PENDING"]:
+                prefetch_events.inc(("skipped_budget",))
+                return
+            self._pending += 1
+
+        next_page = search_kwargs["page"] + 1
+        next_kwargs = {**search_kwargs, "page": next_page, "search_after": next_search_after}
+        by_number = None
+        if search_kwargs.get("search_after") is None:
+            by_number = {**search_kwargs, "page": next_page}
+        prefetch_events.inc(("scheduled",))
+        try:
+            self._get_executor(config).submit(self._run, search, next_kwargs, by_number)
+        except RuntimeError:
+            # Interpreter shutting down
+            self._release()
+
+    def _get_executor(self, config):
+        # A forked worker can't use the parent's threads
+        if self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=config["MAX_WORKERS"], thread_name_prefix="search-prefetch"
+                    )
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def _run(self, search, next_kwargs, by_number):
+        from .search_utils import result_cache_key
+
+        token = _prefetching.set(True)
+        try:
+            key = result_cache_key(**next_kwargs)
+            if result_cache.local.get(key) is not None or result_cache.peek(key) is not None:
+                prefetch_events.inc(("already_cached",))
+                return
+            result = search(**next_kwargs)
+            if result.get("stale"):
+                prefetch_events.inc(("failed",))
+                return
+            keys = [key]
+            if by_number is not None:
+                keys.append(result_cache_key(**by_number))
+                result_cache.set(keys[-1], result)
+            self._remember(keys)
+            prefetch_events.inc(("stored",))
+        except Exception as e:
+            prefetch_events.inc(("failed",))
+            logger.warning("Prefetch failed: %s", e)
+        finally:
+            _prefetching.reset(token)
+            self._release()
+
+    # Hit accounting
+
+    def _remember(self, keys):
+        with self._lock:
+            for key in keys:
+                self._prefetched[key] = True
+                self._prefetched.move_to_end(key)
+            while len(self._prefetched) > TRACKED_KEYS:
+                self._prefetched.popitem(last=False)
+
+    def note_hit(self, key):
+        """Called on a result cache hit; counts it if the page was prefetched."""
+        if not self._prefetched or _prefetching.get():
+            return
+        with self._lock:
+            hit = self._prefetched.pop(key, None)
+        if hit:
+            prefetch_events.inc(("hit",))
+
+    def stats(self):
+        stored = prefetch_events.value(("stored",))
+        hits = prefetch_events.value(("hit",))
+        return {
+            "enabled": prefetch_settings()["ENABLED"],
+            **{
+                outcome: prefetch_events.value((outcome,))
+                for outcome in ("scheduled", "stored", "hit", "already_cached", "skipped_busy", "skipped_budget", "failed")
+            },
+            "hit_rate": hits / stored if stored else 0.0,
+            "pending": self._pending,
+            "foreground_in_flight": self._foreground,
+            "foreground_latency": round(self._latency, 4),
+        }
+
+
+prefetcher = Prefetcher()
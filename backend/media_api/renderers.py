@@ -0,0 +1,65 @@
+"""
+JSON rendering for the search endpoints. Uses orjson when it is
+installed and falls back to the stdlib encoder DRF uses otherwise, so
+the output is the same compact UTF-8 JSON either way, including DRF's
+escaping of U+2028 and U+2029. The search views opt in through
+`renderer_classes`; every other endpoint keeps DRF's defaults.
+"""
+import json
+
+from django.http import HttpResponse
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .timing import phase
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+_encoder = JSONEncoder()
+
+def _escape_line_separators(content):
+    # Valid JSON but not valid JavaScript before ES2019; DRF escapes them too
+    return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+def dumps(data):
+    """Encodes `data` as compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        try:
+            return _escape_line_separators(
+                orjson.dumps(data, default=_encoder.default, option=orjson.OPT_NON_STR_KEYS)
+            )
+        except TypeError:
+            # e.g. integers beyond 64 bits, which orjson refuses
+            pass
+    return _escape_line_separators(json.dumps(
+        data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8"))
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in for DRF's JSONRenderer. Indented output (`?format=json` with
+    an `indent` media type parameter) still goes through DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        with phase("render"):
+            if self.get_indent(accepted_media_type, renderer_context or {}):
+                return super().render(data, accepted_media_type, renderer_context)
+            return dumps(data)
+
+# renderer_classes of the DRF search views
+SEARCH_RENDERERS = [FastJSONRenderer, BrowsableAPIRenderer]
+
+class FastJsonResponse(HttpResponse):
+    """JsonResponse counterpart for the plain (async) Django views."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        with phase("render"):
+            content = dumps(data)
+        super().__init__(content=content, **kwargs)
@@ -1,8 +1,292 @@
-from .es_client import search_media, normalize_hit
+from .es_client import (
+    fetch_media,
+    async_fetch_media,
+    msearch_media,
+    lookup_bildnummer,
+    async_lookup_bildnummer,
+    open_point_in_time,
+    close_point_in_time,
+    fetch_media_in_pit,
+    fetch_facets,
+    async_fetch_facets,
+    FACET_FIELDS,
+    NotFoundError,
+    parse_count_mode,
+    count_is_exact,
+    normalize_hits,
+    ConnectionError,
+    TransportError,
+)
+from .cache import result_cache, bildnummer_cache, canonical_query, cache_settings
+from .cursors import (
+    CURSOR_START,
+    InvalidCursor,
+    cursor_keep_alive,
+    decode_cursor,
+    encode_cursor,
+    query_fingerprint,
+)
+from .breaker import SearchUnavailable, degraded_responses, is_unavailable
+from .federation import federated_search, federation_enabled
+from .planner import RELEVANCE
+from .prefetch import prefetcher
+from .singleflight import single_flight
+from .timing import phase, query_type, set_query_type, set_search
+from asgiref.sync import sync_to_async
 import logging
 
 logger = logging.getLogger(__name__)
 
+def result_cache_key(**search_kwargs):
+    if not result_cache.enabled:
+        return None
+    return result_cache.key_for("results", canonical_query(**search_kwargs))
+
+# Parameters that select a page of a result set rather than the set itself
+PAGE_PARAMS = ("page", "page_size", "search_after", "fields", "count_mode", "sort")
+
+def count_cache_key(**search_kwargs):
+    """Key for the total of a query, shared by all of its pages with the same count_mode."""
+    filters = {name: value for name, value in search_kwargs.items() if name not in PAGE_PARAMS}
+    canonical = canonical_query(**filters) + (
+        ("track_total_hits", parse_count_mode(search_kwargs.get("count_mode"))),
+    )
+    return result_cache.key_for("count", canonical)
+
+def check_cursor_sort(sort):
+    if sort == RELEVANCE:
+        raise InvalidCursor('Cursors page in bildnummer order; use "page" with sort=relevance.')
+
+def fetch_kwargs(search_kwargs, track_total_hits):
+    """fetch_media arguments for execute_media_search keyword arguments."""
+    kwargs = {name: value for name, value in search_kwargs.items() if name != "count_mode"}
+    kwargs["track_total_hits"] = track_total_hits
+    return kwargs
+
+def build_search_result(hits, total, page, page_size, search_after=None, track_total_hits=None):
+    with phase("normalize"):
+        results = normalize_hits(hits)
+    next_search_after = hits[-1]["sort"] if hits and "sort" in hits[-1] else None
+
+    logger.debug(
+        "Search page %s: search_after=%s next_search_after=%s results=%s",
+        page, search_after, next_search_after, len(results)
+    )
+
+    return {
+        "count": total,
+        "count_exact": count_is_exact(total, track_total_hits),
+        "page": page,
+        "page_size": page_size,
+        "results": results,
+        "next_search_after": next_search_after
+    }
+
+def stale_result(cache_key, error):
+    """
+    The last good result of a search ES cannot answer now, marked stale.
+    Raises SearchUnavailable when nothing was ever cached for it.
+    """
+    stale = result_cache.get_stale(cache_key) if cache_key is not None else None
+    return _serve_stale(stale, error)
+
+async def astale_result(cache_key, error):
+    stale = await result_cache.aget_stale(cache_key) if cache_key is not None else None
+    return _serve_stale(stale, error)
+
+def _unavailable(error):
+    degraded_responses.inc(("unavailable",))
+    return SearchUnavailable(retry_after=getattr(error, "retry_after", None))
+
+def _serve_stale(stale, error):
+    if stale is None:
+        raise _unavailable(error) from error
+    degraded_responses.inc(("stale",))
+    return {**stale, "stale": True}
+
+def is_bildnummer_lookup(bildnummer, page=1, search_after=None):
+    # Only the first page of an exact bildnummer query takes the lookup path
+    return bool(bildnummer) and page == 1 and search_after is None
+
+# `bildnummer` is mapped as a long
+MAX_BILDNUMMER = 2 ** 63 - 1
+
+def _lookup_key(bildnummer):
+    bildnummer = str(bildnummer).strip()
+    if not bildnummer.isdigit() or int(bildnummer) > MAX_BILDNUMMER:
+        return None
+    return str(int(bildnummer))
+
+def execute_bildnummer_lookup(bildnummer, page_size=1, fields=None):
+    """
+    Exact bildnummer lookup: a multi-get by document id or a non-scoring
+    term filter instead of a scored search, fronted by positive and negative
+    caches. Falls back to the regular search when the lookup fails on
+    anything but an unavailable cluster.
+    """
+    set_query_type("bildnummer")
+    key = _lookup_key(bildnummer)
+    if key is None:
+        return build_search_result([], 0, 1, page_size)
+
+    with phase("cache"):
+        known, cached = bildnummer_cache.get(key, page_size, fields)
+    if known:
+        return cached if cached is not None else build_search_result([], 0, 1, page_size)
+
+    try:
+        hits, total = lookup_bildnummer(key, size=page_size, fields=fields)
+    except Exception as e:
+        if is_unavailable(e):
+            logger.error("Bildnummer lookup failed: %s", e)
+            raise _unavailable(e) from e
+        # A lookup that can't work here (e.g. a misconfigured id template)
+        # is a bug to fix, not an empty result: answer it with a search
+        logger.exception("Bildnummer lookup failed, searching instead")
+        hits, total = fetch_media(bildnummer=key, page_size=page_size, fields=fields)
+
+    result = build_search_result(hits, total, 1, page_size)
+    bildnummer_cache.set(key, page_size, result, fields)
+    return result
+
+async def aexecute_bildnummer_lookup(bildnummer, page_size=1, fields=None):
+    set_query_type("bildnummer")
+    key = _lookup_key(bildnummer)
+    if key is None:
+        return build_search_result([], 0, 1, page_size)
+
+    with phase("cache"):
+        known, cached = bildnummer_cache.get(key, page_size, fields)
+    if known:
+        return cached if cached is not None else build_search_result([], 0, 1, page_size)
+
+    try:
+        hits, total = await async_lookup_bildnummer(key, size=page_size, fields=fields)
+    except Exception as e:
+        if is_unavailable(e):
+            logger.error("Bildnummer lookup failed: %s", e)
+            raise _unavailable(e) from e
+        # A lookup that can't work here (e.g. a misconfigured id template)
+        # is a bug to fix, not an empty result: answer it with a search
+        logger.exception("Bildnummer lookup failed, searching instead")
+        hits, total = await async_fetch_media(bildnummer=key, page_size=page_size, fields=fields)
+
+    result = build_search_result(hits, total, 1, page_size)
+    bildnummer_cache.set(key, page_size, result, fields)
+    return result
+
+def execute_cursor_search(
+    cursor,
+    query=None,
+    page_size=10,
+    fotografen=None,
+    datum_von=None,
+    datum_bis=None,
+    bildnummer=None,
+    fields=None,
+    count_mode=None
+):
+    """
+    Cursor pagination over a point in time. `cursor` is CURSOR_START for the
+    first page, then the signed `next_cursor` token of the previous page.
+    The PIT keep-alive is renewed on every page and the PIT is closed once
+    the last page has been served.
+    """
+    set_query_type(query_type(query, fotografen, datum_von, datum_bis, bildnummer))
+    filters = dict(
+        query=query,
+        fotografen=fotografen,
+        datum_von=datum_von,
+        datum_bis=datum_bis,
+        bildnummer=bildnummer,
+        fields=fields
+    )
+    fingerprint = query_fingerprint(canonical_query(page_size=0, **filters))
+    keep_alive = cursor_keep_alive()
+
+    track_total_hits = parse_count_mode(count_mode)
+    try:
+        if cursor == CURSOR_START:
+            pit_id, search_after = open_point_in_time(keep_alive), None
+        else:
+            pit_id, search_after = decode_cursor(cursor, fingerprint)
+        hits, total, pit_id = fetch_media_in_pit(
+            pit_id, keep_alive, page_size=page_size, search_after=search_after,
+            track_total_hits=track_total_hits, **filters
+        )
+    except NotFoundError:
+        raise InvalidCursor("Cursor has expired.")
+    except (ConnectionError, TransportError) as e:
+        # A PIT page can't be stood in for by a cached one
+        logger.error("Elasticsearch error: %s", e)
+        raise _unavailable(e) from e
+
+    result = build_search_result(hits, total, None, page_size, search_after, track_total_hits)
+    if len(hits) == page_size and hits[-1].get("sort"):
+        result["next_cursor"] = encode_cursor(pit_id, hits[-1]["sort"], fingerprint)
+    else:
+        close_point_in_time(pit_id)
+        result["next_cursor"] = None
+    return result
+
+def close_cursor(cursor):
+    """Releases the PIT behind a cursor a client no longer needs."""
+    pit_id, _ = decode_cursor(cursor)
+    close_point_in_time(pit_id)
+
+def _export_rows(pit_id, keep_alive, batch_size, limit, filters):
+    search_after = None
+    sent = 0
+    try:
+        while limit is None or sent < limit:
+            size = batch_size if limit is None else min(batch_size, limit - sent)
+            hits, _, pit_id = fetch_media_in_pit(
+                pit_id, keep_alive, page_size=size, search_after=search_after,
+                track_total_hits=False, **filters
+            )
+            yield from normalize_hits(hits)
+            sent += len(hits)
+            if len(hits) < size:
+                return
+            search_after = hits[-1]["sort"]
+    except (ConnectionError, TransportError, NotFoundError, SearchUnavailable) as e:
+        # NotFoundError: the PIT expired while the client stalled
+        logger.error("Export aborted after %s rows: %s", sent, e)
+    finally:
+        # Also reached via GeneratorExit when the client goes away mid-stream
+        try:
+            close_point_in_time(pit_id)
+        except (ConnectionError, TransportError, NotFoundError, SearchUnavailable) as e:
+            logger.warning("Could not close export PIT: %s", e)
+
+def iter_media_export(
+    query=None,
+    fotografen=None,
+    datum_von=None,
+    datum_bis=None,
+    bildnummer=None,
+    fields=None,
+    batch_size=1000,
+    limit=None
+):
+    """
+    Lazily yields every matching hit, normalized, paging over a point in
+    time in `batch_size` chunks so memory stays flat for any result size.
+    The PIT is opened eagerly, so connection errors surface before the
+    response starts; close the generator to stop early.
+    """
+    filters = dict(
+        query=query,
+        fotografen=fotografen,
+        datum_von=datum_von,
+        datum_bis=datum_bis,
+        bildnummer=bildnummer,
+        fields=fields
+    )
+    keep_alive = cursor_keep_alive()
+    pit_id = open_point_in_time(keep_alive)
+    return _export_rows(pit_id, keep_alive, batch_size, limit, filters)
+
 def execute_media_search(
     query=None,
     page=1,
@@ -11,9 +295,33 @@ def execute_media_search(
     datum_von=None,
     datum_bis=None,
     bildnummer=None,
-    search_after=None
+    search_after=None,
+    fields=None,
+    cursor=None,
+    count_mode=None,
+    sort=None
 ):
-    hits, total = search_media(
+    if federation_enabled():
+        check_federated_cursor(cursor)
+        search_kwargs = dict(
+            query=query, page=page, page_size=page_size, fotografen=fotografen, datum_von=datum_von,
+            datum_bis=datum_bis, bildnummer=bildnummer, search_after=search_after, fields=fields,
+            count_mode=count_mode, sort=sort
+        )
+        set_query_type(query_type(query, fotografen, datum_von, datum_bis, bildnummer))
+        set_search(search_kwargs)
+        return federated_search(**search_kwargs)
+
+    if cursor is not None:
+        check_cursor_sort(sort)
+        return execute_cursor_search(
+            cursor, query, page_size, fotografen, datum_von, datum_bis, bildnummer, fields, count_mode
+        )
+
+    if is_bildnummer_lookup(bildnummer, page, search_after):
+        return execute_bildnummer_lookup(bildnummer, page_size, fields)
+
+    search_kwargs = dict(
         query=query,
         page=page,
         page_size=page_size,
@@ -21,24 +329,354 @@ def execute_media_search(
         datum_von=datum_von,
         datum_bis=datum_bis,
         bildnummer=bildnummer,
-        search_after=search_after
+        search_after=search_after,
+        fields=fields,
+        count_mode=count_mode,
+        sort=sort
     )
+    track_total_hits = parse_count_mode(count_mode)
+    set_query_type(query_type(query, fotografen, datum_von, datum_bis, bildnummer))
+    set_search(search_kwargs)
 
-    results = [normalize_hit(hit) for hit in hits]
-    next_search_after = hits[-1]["sort"] if hits and "sort" in hits[-1] else None
+    cache_key = result_cache_key(**search_kwargs)
+    if cache_key is not None:
+        with phase("cache"):
+            cached = result_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("Result cache hit: %s", cache_key)
+            prefetcher.note_hit(cache_key)
+            prefetcher.schedule(execute_media_search, search_kwargs, cached)
+            return cached
 
-    # Debug logging
-    logger.debug("-------- Elasticsearch Scroll Debug --------")
-    logger.debug("Current page: %s", page)
-    logger.debug("Search after received: %s", search_after)
-    logger.debug("Next search_after to return: %s", next_search_after)
-    logger.debug("Number of results returned: %s", len(results))
-    logger.debug("-------------------------------------------")
+    def search():
+        # Later pages reuse the total from page 1 and skip counting, which
+        # lets ES stop at a full page on an index sorted like the search
+        count_key, cached_total = None, None
+        if track_total_hits is not False and result_cache.enabled:
+            count_key = count_cache_key(**search_kwargs)
+            if page > 1 or search_after is not None:
+                cached_total = result_cache.get(count_key)
 
-    return {
-        "count": total,
-        "page": page,
-        "page_size": page_size,
-        "results": results,
-        "next_search_after": next_search_after
-    }
+        cacheable = True
+        try:
+            with prefetcher.foreground():
+                hits, total = fetch_media(**fetch_kwargs(
+                    search_kwargs, False if cached_total is not None else track_total_hits
+                ))
+        except Exception as e:
+            if is_unavailable(e):
+                logger.error("Elasticsearch unavailable: %s", e)
+                return stale_result(cache_key, e)
+            logger.error("Unexpected error during search: %s", e)
+            hits, total, cacheable = [], 0, False
+
+        if cached_total is not None:
+            total = cached_total
+        elif count_key is not None and cacheable:
+            result_cache.set(count_key, total, ttl=cache_settings()["COUNT_TTL"])
+
+        result = build_search_result(hits, total, page, page_size, search_after, track_total_hits)
+
+        # Never cache the empty page served for a failed ES call
+        if cache_key is not None and cacheable:
+            result_cache.set(cache_key, result)
+            result_cache.set_stale(cache_key, result)
+
+        return result
+
+    # Identical searches already in flight share this one's ES call
+    if cache_key is None:
+        return single_flight.run(("results", canonical_query(**search_kwargs)), search)
+    result = single_flight.run(cache_key, search, lambda: result_cache.peek(cache_key))
+    # Opt-in: warm the cache with the page the client will likely ask for next
+    prefetcher.schedule(execute_media_search, search_kwargs, result)
+    return result
+
+async def aexecute_media_search(
+    query=None,
+    page=1,
+    page_size=10,
+    fotografen=None,
+    datum_von=None,
+    datum_bis=None,
+    bildnummer=None,
+    search_after=None,
+    fields=None,
+    cursor=None,
+    count_mode=None,
+    sort=None
+):
+    """Async twin of execute_media_search, built on AsyncElasticsearch."""
+    if federation_enabled():
+        check_federated_cursor(cursor)
+        search_kwargs = dict(
+            query=query, page=page, page_size=page_size, fotografen=fotografen, datum_von=datum_von,
+            datum_bis=datum_bis, bildnummer=bildnummer, search_after=search_after, fields=fields,
+            count_mode=count_mode, sort=sort
+        )
+        set_query_type(query_type(query, fotografen, datum_von, datum_bis, bildnummer))
+        set_search(search_kwargs)
+        # Targets are already fanned out on federation's own threads
+        return await sync_to_async(federated_search)(**search_kwargs)
+
+    if cursor is not None:
+        check_cursor_sort(sort)
+        # PIT bookkeeping is rare next to plain searches; reuse the sync path
+        return await sync_to_async(execute_cursor_search)(
+            cursor, query, page_size, fotografen, datum_von, datum_bis, bildnummer, fields, count_mode
+        )
+
+    if is_bildnummer_lookup(bildnummer, page, search_after):
+        return await aexecute_bildnummer_lookup(bildnummer, page_size, fields)
+
+    search_kwargs = dict(
+        query=query,
+        page=page,
+        page_size=page_size,
+        fotografen=fotografen,
+        datum_von=datum_von,
+        datum_bis=datum_bis,
+        bildnummer=bildnummer,
+        search_after=search_after,
+        fields=fields,
+        count_mode=count_mode,
+        sort=sort
+    )
+    track_total_hits = parse_count_mode(count_mode)
+    set_query_type(query_type(query, fotografen, datum_von, datum_bis, bildnummer))
+    set_search(search_kwargs)
+
+    cache_key = result_cache_key(**search_kwargs)
+    if cache_key is not None:
+        with phase("cache"):
+            cached = await result_cache.aget(cache_key)
+        if cached is not None:
+            logger.debug("Result cache hit: %s", cache_key)
+            prefetcher.note_hit(cache_key)
+            prefetcher.schedule(execute_media_search, search_kwargs, cached)
+            return cached
+
+    async def search():
+        # Later pages reuse the total from page 1 and skip counting, which
+        # lets ES stop at a full page on an index sorted like the search
+        count_key, cached_total = None, None
+        if track_total_hits is not False and result_cache.enabled:
+            count_key = count_cache_key(**search_kwargs)
+            if page > 1 or search_after is not None:
+                cached_total = await result_cache.aget(count_key)
+
+        cacheable = True
+        try:
+            with prefetcher.foreground():
+                hits, total = await async_fetch_media(**fetch_kwargs(
+                    search_kwargs, False if cached_total is not None else track_total_hits
+                ))
+        except Exception as e:
+            if is_unavailable(e):
+                logger.error("Elasticsearch unavailable: %s", e)
+                return await astale_result(cache_key, e)
+            logger.error("Unexpected error during search: %s", e)
+            hits, total, cacheable = [], 0, False
+
+        if cached_total is not None:
+            total = cached_total
+        elif count_key is not None and cacheable:
+            await result_cache.aset(count_key, total, ttl=cache_settings()["COUNT_TTL"])
+
+        result = build_search_result(hits, total, page, page_size, search_after, track_total_hits)
+
+        if cache_key is not None and cacheable:
+            await result_cache.aset(cache_key, result)
+            await result_cache.aset_stale(cache_key, result)
+
+        return result
+
+    if cache_key is None:
+        return await single_flight.arun(("results", canonical_query(**search_kwargs)), search)
+    result = await single_flight.arun(cache_key, search, lambda: result_cache.apeek(cache_key))
+    # The prefetch runs on its own threads, so the sync search serves it
+    prefetcher.schedule(execute_media_search, search_kwargs, result)
+    return result
+
+def _federated_outcome(search_kwargs):
+    # Each federated search is already one parallel round trip per target
+    try:
+        return federated_search(**search_kwargs)
+    except (InvalidCursor, SearchUnavailable) as e:
+        return {"error": str(e)}
+
+def check_federated_cursor(cursor):
+    if cursor is not None:
+        raise InvalidCursor('Cursors are not available for federated search; use "search_after".')
+
+def _batch_error(error):
+    """The message for a failed sub-search, from ES's error object when there is one."""
+    if isinstance(error, dict):
+        return error.get("reason") or error.get("type") or "Search failed."
+    return "Search failed."
+
+def execute_media_search_batch(searches):
+    """
+    Runs a list of execute_media_search keyword dicts, sending every search
+    that is not already cached in a single `_msearch` call. Returns results
+    in request order; a failed sub-search yields {"error": ...} in its slot
+    instead of failing the batch.
+    """
+    if federation_enabled():
+        return [_federated_outcome(search_kwargs) for search_kwargs in searches]
+
+    outcomes = [None] * len(searches)
+    cache_keys = [None] * len(searches)
+    pending = []
+
+    for index, search_kwargs in enumerate(searches):
+        cache_key = result_cache_key(**search_kwargs)
+        cache_keys[index] = cache_key
+        if cache_key is not None:
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                outcomes[index] = cached
+                continue
+        pending.append(index)
+
+    if not pending:
+        return outcomes
+
+    try:
+        responses = msearch_media([
+            fetch_kwargs(searches[index], parse_count_mode(searches[index].get("count_mode")))
+            for index in pending
+        ])
+    except Exception as e:
+        if not is_unavailable(e):
+            # ES rejected the request as a whole (or it could not be sent):
+            # every sub-search in it failed, not the batch endpoint
+            logger.exception("Batch _msearch failed")
+            body = getattr(e, "body", None)
+            error = body.get("error") if isinstance(body, dict) else None
+            for index in pending:
+                outcomes[index] = {"error": _batch_error(error)}
+            return outcomes
+        logger.error("Elasticsearch unavailable: %s", e)
+        for index in pending:
+            try:
+                outcomes[index] = stale_result(cache_keys[index], e)
+            except SearchUnavailable:
+                outcomes[index] = {"error": "Search backend unavailable."}
+        return outcomes
+
+    for index, response in zip(pending, responses):
+        search_kwargs = searches[index]
+        if response is None or isinstance(response, dict):
+            logger.warning("Batch sub-search %s failed: %s", index, response)
+            outcomes[index] = {"error": _batch_error(response)}
+            continue
+
+        hits, total = response
+        result = build_search_result(
+            hits,
+            total,
+            search_kwargs.get("page", 1),
+            search_kwargs.get("page_size", 10),
+            search_kwargs.get("search_after"),
+            parse_count_mode(search_kwargs.get("count_mode"))
+        )
+        if cache_keys[index] is not None:
+            result_cache.set(cache_keys[index], result)
+            result_cache.set_stale(cache_keys[index], result)
+        outcomes[index] = result
+
+    return outcomes
+
+def facets_cache_key(facets, facet_size, interval, **filters):
+    """Facets depend on the filters only, so every page of a query shares them."""
+    canonical = canonical_query(**filters) + (
+        ("facets", tuple(facets)), ("facet_size", facet_size), ("interval", interval),
+    )
+    return result_cache.key_for("facets", canonical)
+
+def execute_facet_search(
+    query=None,
+    fotografen=None,
+    datum_von=None,
+    datum_bis=None,
+    bildnummer=None,
+    facets=FACET_FIELDS,
+    facet_size=10,
+    interval="year"
+):
+    """
+    Returns {"count", "facets"} for the filter sidebar: terms counts on
+    fotografen and db and a date histogram on datum, over the same query
+    as the hits. Cached apart from results, with the longer FACETS_TTL.
+    """
+    filters = dict(
+        query=query,
+        fotografen=fotografen,
+        datum_von=datum_von,
+        datum_bis=datum_bis,
+        bildnummer=bildnummer
+    )
+    cache_key = None
+    if result_cache.enabled:
+        cache_key = facets_cache_key(facets, facet_size, interval, **filters)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    try:
+        facet_counts, total = fetch_facets(
+            facets=facets, facet_size=facet_size, interval=interval, **filters
+        )
+    except Exception as e:
+        if not is_unavailable(e):
+            raise
+        logger.error("Elasticsearch unavailable: %s", e)
+        return stale_result(cache_key, e)
+
+    result = {"count": total, "facets": facet_counts}
+    if cache_key is not None:
+        result_cache.set(cache_key, result, ttl=cache_settings()["FACETS_TTL"])
+        result_cache.set_stale(cache_key, result)
+    return result
+
+async def aexecute_facet_search(
+    query=None,
+    fotografen=None,
+    datum_von=None,
+    datum_bis=None,
+    bildnummer=None,
+    facets=FACET_FIELDS,
+    facet_size=10,
+    interval="year"
+):
+    """Async twin of execute_facet_search."""
+    filters = dict(
+        query=query,
+        fotografen=fotografen,
+        datum_von=datum_von,
+        datum_bis=datum_bis,
+        bildnummer=bildnummer
+    )
+    cache_key = None
+    if result_cache.enabled:
+        cache_key = facets_cache_key(facets, facet_size, interval, **filters)
+        cached = await result_cache.aget(cache_key)
+        if cached is not None:
+            return cached
+
+    try:
+        facet_counts, total = await async_fetch_facets(
+            facets=facets, facet_size=facet_size, interval=interval, **filters
+        )
+    except Exception as e:
+        if not is_unavailable(e):
+            raise
+        logger.error("Elasticsearch unavailable: %s", e)
+        return await astale_result(cache_key, e)
+
+    result = {"count": total, "facets": facet_counts}
+    if cache_key is not None:
+        await result_cache.aset(cache_key, result, ttl=cache_settings()["FACETS_TTL"])
+        await result_cache.aset_stale(cache_key, result)
+    return result
@@ -0,0 +1,190 @@
+"""
+Single-flight coalescing of identical concurrent searches.
+
+Within a worker, concurrent calls for the same key share one execution.
+The first caller (the leader) runs the search, and the others wait for
+its result. Threads and event loops have their own flight tables.
+
+Across workers, the leader also takes a short lock in the shared Django
+cache (cache.add). A worker that finds the lock already taken polls the
+shared result cache for the other worker's result instead of calling
+ES. If the lock disappears without a result, or the wait runs out, it
+runs the search itself. Coalescing never returns an error a caller would
+not otherwise have seen: if a leader raises, its waiters run the search
+themselves.
+
+Every ES call saved this way is counted in the
+media_search_es_calls_avoided_total metric on /metrics.
+"""
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+
+from .timing import Counter, register
+
+DEFAULT_SINGLE_FLIGHT_SETTINGS = {
+    "ENABLED": True,
+    # Coordinate across workers through the shared cache as well
+    "SHARED": True,
+    # Seconds a cross-worker lock may be held, i.e. an upper bound on one search
+    "LOCK_TTL": 10,
+    # Seconds a follower waits for a leader before searching itself
+    "WAIT": 10.0,
+    "POLL_INTERVAL": 0.005,
+    "MAX_POLL_INTERVAL": 0.05,
+}
+
+es_calls_avoided = register(Counter(
+    "media_search_es_calls_avoided_total",
+    "Searches answered by an identical in-flight search instead of their own ES call.",
+    ("scope",),
+))
+
+
+def single_flight_settings():
+    configured = getattr(settings, "MEDIA_SEARCH_SINGLE_FLIGHT", {})
+    return {**DEFAULT_SINGLE_FLIGHT_SETTINGS, **configured}
+
+
+class _Flight:
+    __slots__ = ("done", "ok", "result")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.ok = False
+        self.result = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self._async_flights = {}
+        self._lock = threading.Lock()
+
+    def stats(self):
+        return {
+            "in_flight": len(self._flights) + len(self._async_flights),
+            "es_calls_avoided": {
+                scope: es_calls_avoided.value((scope,)) for scope in ("worker", "shared")
+            },
+        }
+
+    # Sync
+
+    def run(self, key, fn, shared_lookup=None):
+        """
+        Returns fn(), sharing one execution among concurrent callers with
+        the same key. With `shared_lookup` (reads the finished result from
+        the shared cache) other workers are coordinated too.
+        """
+        config = single_flight_settings()
+        if not config["ENABLED"]:
+            return fn()
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if flight.done.wait(config["WAIT"]) and flight.ok:
+                es_calls_avoided.inc(("worker",))
+                return flight.result
+            return fn()
+
+        try:
+            flight.result = self._run_shared(key, fn, shared_lookup, config)
+            flight.ok = True
+            return flight.result
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _run_shared(self, key, fn, shared_lookup, config):
+        if shared_lookup is None or not config["SHARED"]:
+            return fn()
+        lock_key = f"{key}:flight"
+        if shared_cache.add(lock_key, 1, timeout=config["LOCK_TTL"]):
+            try:
+                return fn()
+            finally:
+                shared_cache.delete(lock_key)
+
+        deadline = time.monotonic() + config["WAIT"]
+        delay = config["POLL_INTERVAL"]
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            result = shared_lookup()
+            if result is not None:
+                es_calls_avoided.inc(("shared",))
+                return result
+            if shared_cache.get(lock_key) is None:
+                # The other worker finished without a cacheable result
+                break
+            delay = min(delay * 2, config["MAX_POLL_INTERVAL"])
+        return fn()
+
+    # Async
+
+    async def arun(self, key, fn, shared_lookup=None):
+        """
+        Async twin of run: `fn` and `shared_lookup` are coroutine
+        functions, and followers await the leader's future.
+        """
+        config = single_flight_settings()
+        if not config["ENABLED"]:
+            return await fn()
+
+        flight_key = (asyncio.get_running_loop(), key)
+        future = self._async_flights.get(flight_key)
+        if future is not None:
+            try:
+                ok, result = await asyncio.wait_for(asyncio.shield(future), config["WAIT"])
+            except asyncio.TimeoutError:
+                ok = False
+            if ok:
+                es_calls_avoided.inc(("worker",))
+                return result
+            return await fn()
+
+        future = self._async_flights[flight_key] = asyncio.get_running_loop().create_future()
+        outcome = (False, None)
+        try:
+            result = await self._arun_shared(key, fn, shared_lookup, config)
+            outcome = (True, result)
+            return result
+        finally:
+            self._async_flights.pop(flight_key, None)
+            # A (ok, result) pair rather than set_exception: nobody may be waiting
+            future.set_result(outcome)
+
+    async def _arun_shared(self, key, fn, shared_lookup, config):
+        if shared_lookup is None or not config["SHARED"]:
+            return await fn()
+        lock_key = f"{key}:flight"
+        if await shared_cache.aadd(lock_key, 1, timeout=config["LOCK_TTL"]):
+            try:
+                return await fn()
+            finally:
+                await shared_cache.adelete(lock_key)
+
+        deadline = time.monotonic() + config["WAIT"]
+        delay = config["POLL_INTERVAL"]
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            result = await shared_lookup()
+            if result is not None:
+                es_calls_avoided.inc(("shared",))
+                return result
+            if await shared_cache.aget(lock_key) is None:
+                break
+            delay = min(delay * 2, config["MAX_POLL_INTERVAL"])
+        return await fn()
+
+
+single_flight = SingleFlight()
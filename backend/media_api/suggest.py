@@ -0,0 +1,220 @@
+"""
+Search-box suggestions served from memory.
+
+Every worker keeps two PrefixIndex structures: photographer names with
+their document counts, from a terms aggregation on `fotografen`, and
+frequent suchtext terms, counted over a sample of the newest documents.
+A background thread rebuilds them every REFRESH_INTERVAL seconds. The
+raw counts are shared through the Django cache for half an interval, so
+every worker gets them at most 1.5 intervals old, and ES sees at most two
+round trips per interval however many workers there are. A lookup is two
+bisects on a sorted list; keystrokes never reach ES.
+
+The first suggestion request of a worker builds the index synchronously.
+A failed build is retried after RETRY_MIN_INTERVAL seconds. The wait
+doubles after each further failure, up to REFRESH_INTERVAL. If ES is down
+on the first build, suggestions are empty until a retry succeeds, and a
+failed rebuild keeps serving the previous index.
+"""
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+
+from .es_client import fetch_suggest_sources
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUGGEST_SETTINGS = {
+    "ENABLED": True,
+    "REFRESH_INTERVAL": 300,
+    # Seconds before retrying a failed build; doubles up to REFRESH_INTERVAL
+    "RETRY_MIN_INTERVAL": 5,
+    # Photographers fetched by the terms aggregation
+    "FOTOGRAFEN_SIZE": 10000,
+    # Newest documents whose suchtext is counted for frequent terms
+    "SAMPLE_SIZE": 5000,
+    "MAX_TERMS": 20000,
+    "MIN_TERM_LENGTH": 3,
+}
+
+SOURCES_KEY = "media_api:suggest:sources"
+
+WORD = re.compile(r"\w+")
+
+# Frequent in any caption, useless as a completion
+STOPWORDS = frozenset("""
+    der die das den dem des ein eine einer eines einem einen und oder aber mit von vom zum zur
+    für fuer auf aus bei beim nach über ueber unter vor hinter neben zwischen durch gegen ohne
+    ist sind war waren wird werden wurde wurden hat haben hatte sich nicht auch als wie noch
+    the and for with from that this are was were has have had not but its into onto over
+""".split())
+
+
+def suggest_settings():
+    configured = getattr(settings, "MEDIA_SEARCH_SUGGEST", {})
+    return {**DEFAULT_SUGGEST_SETTINGS, **configured}
+
+
+def normalize(text):
+    return " ".join(WORD.findall(text.casefold()))
+
+
+class PrefixIndex:
+    """
+    Values with counts, found by the prefix of any of their words, so
+    "sim" finds "IMAGO / Sven Simon". Values are ranked by count once,
+    and every word suffix of a value is a key in one sorted list pointing
+    at that rank. A prefix then covers a contiguous slice of keys, found
+    with two bisects, and the best matches are the smallest ranks in it.
+    Slices for one- and two-letter prefixes can be long, so their top
+    matches are computed up front.
+    """
+
+    def __init__(self, counts, precomputed_length=2, precomputed_size=50):
+        ranked = sorted(counts, key=lambda item: (-item[1], item[0]))
+        self.values = [value for value, _ in ranked]
+        self.counts = [count for _, count in ranked]
+
+        entries = []
+        for rank, value in enumerate(self.values):
+            words = normalize(value).split()
+            for start in range(len(words)):
+                entries.append((" ".join(words[start:]), rank))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.ranks = [rank for _, rank in entries]
+
+        self.precomputed_length = precomputed_length
+        self.precomputed_size = precomputed_size
+        short = {}
+        for key, rank in entries:
+            for length in range(1, min(precomputed_length, len(key)) + 1):
+                short.setdefault(key[:length], set()).add(rank)
+        self._short = {
+            prefix: heapq.nsmallest(precomputed_size, ranks) for prefix, ranks in short.items()
+        }
+
+    def __len__(self):
+        return len(self.values)
+
+    def complete(self, prefix, limit=10):
+        """Returns up to `limit` (value, count) pairs, most frequent first."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if len(prefix) <= self.precomputed_length and limit <= self.precomputed_size:
+            ranks = self._short.get(prefix, ())[:limit]
+        else:
+            start = bisect_left(self.keys, prefix)
+            end = bisect_left(self.keys, prefix + "\U0010ffff", start)
+            ranks = heapq.nsmallest(limit, set(self.ranks[start:end]))
+        return [(self.values[rank], self.counts[rank]) for rank in ranks]
+
+
+def frequent_terms(texts, max_terms=20000, min_length=3):
+    """(term, count) pairs of the most frequent words in `texts`."""
+    counts = Counter()
+    for text in texts:
+        counts.update(WORD.findall(text.casefold()))
+    return [
+        (term, count) for term, count in counts.most_common()
+        if len(term) >= min_length and not term.isdigit() and term not in STOPWORDS
+    ][:max_terms]
+
+
+def load_sources(config):
+    """The raw counts, from the shared cache or else from ES."""
+    sources = shared_cache.get(SOURCES_KEY)
+    if sources is None:
+        fotografen, texts = fetch_suggest_sources(config["FOTOGRAFEN_SIZE"], config["SAMPLE_SIZE"])
+        sources = {
+            "fotografen": fotografen,
+            "terms": frequent_terms(texts, config["MAX_TERMS"], config["MIN_TERM_LENGTH"]),
+        }
+        # Shorter than the interval, so a refresh never picks up counts
+        # another worker fetched almost a whole interval ago
+        shared_cache.set(SOURCES_KEY, sources, timeout=max(1, config["REFRESH_INTERVAL"] // 2))
+    return sources
+
+
+class Suggester:
+    def __init__(self):
+        self._fotografen = None
+        self._terms = None
+        self._built_at = None
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._refresher_pid = None
+
+    def clear(self):
+        with self._lock:
+            self._fotografen = self._terms = self._built_at = None
+
+    def refresh(self):
+        """Rebuilds both indexes; keeps the previous ones if ES fails."""
+        config = suggest_settings()
+        try:
+            sources = load_sources(config)
+        except Exception as e:
+            self._failures += 1
+            logger.error("Refreshing search suggestions failed (%s in a row): %s", self._failures, e)
+            if self._fotografen is None:
+                self._fotografen, self._terms = PrefixIndex([]), PrefixIndex([])
+            return False
+        # Build before swapping, so readers never see a half-built index
+        fotografen, terms = PrefixIndex(sources["fotografen"]), PrefixIndex(sources["terms"])
+        self._fotografen, self._terms, self._built_at = fotografen, terms, time.time()
+        self._failures = 0
+        return True
+
+    def next_delay(self):
+        """Seconds until the next refresh: the interval, or a backoff after failures."""
+        config = suggest_settings()
+        if not self._failures:
+            return config["REFRESH_INTERVAL"]
+        return min(config["REFRESH_INTERVAL"], config["RETRY_MIN_INTERVAL"] * 2 ** (self._failures - 1))
+
+    def _refresh_forever(self):
+        while True:
+            time.sleep(self.next_delay())
+            self.refresh()
+
+    def _ensure_ready(self):
+        # Threads don't survive a fork, so each worker process starts its own
+        if self._refresher_pid == os.getpid() and self._fotografen is not None:
+            return
+        with self._lock:
+            if self._fotografen is None:
+                self.refresh()
+            if self._refresher_pid != os.getpid():
+                self._refresher_pid = os.getpid()
+                threading.Thread(target=self._refresh_forever, name="suggest-refresh", daemon=True).start()
+
+    def suggest(self, prefix, limit=10):
+        if not suggest_settings()["ENABLED"] or not normalize(prefix):
+            return {"fotografen": [], "terms": []}
+        self._ensure_ready()
+        fotografen, terms = self._fotografen, self._terms
+        return {
+            "fotografen": [{"value": value, "count": count} for value, count in fotografen.complete(prefix, limit)],
+            "terms": [{"value": value, "count": count} for value, count in terms.complete(prefix, limit)],
+        }
+
+    def stats(self):
+        return {
+            "fotografen": len(self._fotografen or ()),
+            "terms": len(self._terms or ()),
+            "age_seconds": None if self._built_at is None else round(time.time() - self._built_at, 1),
+            "failures": self._failures,
+        }
+
+
+suggester = Suggester()
@@ -1,10 +1,16 @@
+import asyncio
 import os
 import pytest
 import urllib3
 import requests
 from dotenv import load_dotenv
 from django.core.cache import cache
+from django.test.signals import setting_changed
 from django.test.utils import override_settings
+from media_api import es_client, search_utils
+from media_api.breaker import es_breaker
+from media_api.cache import result_cache, bildnummer_cache
+from media_api.fake_es import AsyncFakeElasticsearch, FakeElasticsearch
 
 # Load environment variables
 load_dotenv()
@@ -12,6 +18,21 @@ load_dotenv()
 # Suppress SSL warnings for local/insecure testing
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+
+def refresh_throttle_rates(*, setting, **kwargs):
+    """
+    DRF copies DEFAULT_THROTTLE_RATES onto SimpleRateThrottle when the
+    module is first imported, so overrides made after any view import would
+    otherwise be ignored.
+    """
+    if setting == 'REST_FRAMEWORK':
+        from rest_framework.settings import api_settings
+        from rest_framework.throttling import SimpleRateThrottle
+        api_settings.reload()
+        SimpleRateThrottle.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+
+setting_changed.connect(refresh_throttle_rates)
+
 # Constants
 NO_THROTTLE_SETTINGS = {
     'DEFAULT_THROTTLE_CLASSES': [],
@@ -39,6 +60,10 @@ def http_session(verify_ssl):
 def clear_cache_before_test():
     """Clears Django cache before each test."""
     cache.clear()
+    result_cache.clear_local()
+    result_cache.stale_local.clear()
+    bildnummer_cache.clear()
+    es_breaker.reset()
     yield
 
 @pytest.fixture
@@ -46,3 +71,56 @@ def disable_throttling():
     """Temporarily disables DRF throttling for a test."""
     with override_settings(REST_FRAMEWORK=NO_THROTTLE_SETTINGS):
         yield
+
+@pytest.fixture(scope="session")
+def fake_corpus():
+    """A small synthetic corpus, built once per test session."""
+    return FakeElasticsearch.synthetic(3000, seed=7)
+
+@pytest.fixture
+def fake_es(monkeypatch, fake_corpus):
+    """Serves es_client's sync and async searches from fake_corpus."""
+    monkeypatch.setattr(es_client, "es", fake_corpus)
+    monkeypatch.setattr(es_client, "get_async_es", lambda: AsyncFakeElasticsearch(fake_corpus))
+    fake_corpus.calls.clear()
+    return fake_corpus
+
+def make_hit(bildnummer, db="st"):
+    """A hit as parse_search_response returns it, with the default sort values."""
+    return {
+        "_source": {"bildnummer": str(bildnummer), "db": db, "suchtext": "Barcelona"},
+        "sort": [bildnummer, db],
+    }
+
+class SearchStub(list):
+    """
+    Stands in for search_utils.fetch_media and async_fetch_media. Keeps
+    the keyword arguments of every call and answers with respond(**kwargs),
+    a two-hit page by default; tests replace `respond` to answer otherwise.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.respond = lambda **kwargs: ([make_hit(100), make_hit(99)], 2)
+
+    def __call__(self, **kwargs):
+        self.append(kwargs)
+        return self.respond(**kwargs)
+
+    async def acall(self, **kwargs):
+        # Yields once, as a real round trip would, so concurrent searches overlap
+        await asyncio.sleep(0)
+        return self(**kwargs)
+
+@pytest.fixture
+def fake_hit():
+    """make_hit, for fixtures and tests that build their own pages."""
+    return make_hit
+
+@pytest.fixture
+def es_calls(monkeypatch):
+    """Stubs search_utils' sync and async fetch_media; returns the SearchStub."""
+    stub = SearchStub()
+    monkeypatch.setattr(search_utils, "fetch_media", stub)
+    monkeypatch.setattr(search_utils, "async_fetch_media", stub.acall)
+    return stub
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.test import AsyncRequestFactory
+
+from media_api import search_utils
+
+
+def async_get(path, params=None):
+    request = AsyncRequestFactory().get(path, params or {})
+    request.user = AnonymousUser()
+    return request
+
+
+def test_aexecute_media_search_matches_sync_result_shape(es_calls):
+    result = asyncio.run(search_utils.aexecute_media_search(query="Barcelona", page_size=2))
+    assert result["count"] == 2
+    assert result["next_search_after"] == [99, "st"]
+    assert result["results"][0]["thumbnail_url"].endswith("/st/0000000100/s.jpg")
+
+
+def test_aexecute_media_search_uses_result_cache(es_calls):
+    async def twice():
+        await search_utils.aexecute_media_search(query="Barcelona")
+        await search_utils.aexecute_media_search(query="barcelona ")
+
+    asyncio.run(twice())
+    assert len(es_calls) == 1
+
+
+@pytest.mark.django_db
+def test_async_media_search_view_routes_text_queries(es_calls):
+    # Imported lazily: DRF binds throttle rates when the views module loads
+    from media_api import async_views
+
+    request = async_get("/api/media/search/", {"q": "Barcelona", "page_size": 2})
+    response = asyncio.run(async_views.media_search(request))
+
+    assert response.status_code == 200
+    assert json.loads(response.content)["count"] == 2
+    assert es_calls[0]["query"] == "Barcelona"
+
+
+def test_async_search_by_fotograf_requires_parameter(es_calls):
+    from media_api import async_views
+
+    request = async_get("/api/media/search/by-fotograf/")
+    response = asyncio.run(async_views.search_by_fotograf(request))
+    assert response.status_code == 400
@@ -0,0 +1,100 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from media_api import es_client, search_utils
+from media_api.fake_es import bad_request
+
+
+@pytest.fixture
+def msearch_calls(monkeypatch, fake_hit):
+    calls = []
+
+    def fake_msearch_media(searches):
+        calls.append(searches)
+        outcomes = []
+        for search in searches:
+            if search.get("fotografen") == ["broken"]:
+                outcomes.append({"type": "search_phase_execution_exception", "reason": "boom"})
+            else:
+                outcomes.append(([fake_hit(100)], 1))
+        return outcomes
+
+    monkeypatch.setattr(search_utils, "msearch_media", fake_msearch_media)
+    return calls
+
+
+@pytest.mark.django_db
+def test_batch_returns_results_in_request_order_with_per_item_errors(msearch_calls):
+    response = APIClient().post(
+        reverse("media_search_batch"),
+        {"searches": [
+            {"q": "Barcelona"},
+            {"fotograf": ["broken"]},
+            {"datum_von": "not-a-date"},
+            {"q": "7914100", "page_size": 1},
+        ]},
+        format="json",
+    )
+
+    assert response.status_code == 200
+    responses = response.json()["responses"]
+    assert [item["status"] for item in responses] == [200, 502, 400, 200]
+    assert responses[0]["results"][0]["bildnummer"] == "100"
+    assert responses[1]["error"] == "boom"
+    assert "datum_von" in responses[2]["errors"]
+
+    # All valid sub-searches went out in a single _msearch call
+    assert len(msearch_calls) == 1
+    assert [search.get("bildnummer") for search in msearch_calls[0]] == [None, None, "7914100"]
+
+
+@pytest.mark.django_db
+def test_batch_serves_repeated_searches_from_cache(msearch_calls):
+    url = reverse("media_search_batch")
+    APIClient().post(url, [{"q": "Barcelona"}], format="json")
+    response = APIClient().post(url, [{"q": "barcelona"}, {"q": "Madrid"}], format="json")
+
+    assert response.status_code == 200
+    assert len(msearch_calls) == 2
+    assert [search["query"] for search in msearch_calls[1]] == ["Madrid"]
+
+
+@pytest.mark.django_db
+def test_rejected_msearch_fails_each_item_not_the_batch(monkeypatch):
+    def rejecting_msearch_media(searches):
+        raise bad_request("request body is malformed")
+
+    monkeypatch.setattr(search_utils, "msearch_media", rejecting_msearch_media)
+    response = APIClient().post(reverse("media_search_batch"), [{"q": "Barcelona"}, {"q": "Madrid"}], format="json")
+
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()["responses"]] == [502, 502]
+    assert response.json()["responses"][0]["error"] == "request body is malformed"
+
+
+def test_unbuildable_sub_search_does_not_sink_the_rest(fake_es):
+    outcomes = es_client.msearch_media([{"query": "Berlin"}, {"fields": ["no_such_field"]}])
+
+    assert outcomes[0][1] > 0
+    assert outcomes[1]["type"] == "invalid_search"
+    assert fake_es.calls["msearch"] == 1
+
+
+@pytest.mark.django_db
+def test_batch_rejects_non_list_payload():
+    response = APIClient().post(reverse("media_search_batch"), {"q": "Barcelona"}, format="json")
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_batch_is_throttled_per_search(msearch_calls, monkeypatch):
+    from media_api.throttling import SlidingWindowAnonThrottle
+
+    monkeypatch.setattr(SlidingWindowAnonThrottle, "THROTTLE_RATES", {"anon": "10/minute"})
+    client = APIClient()
+    searches = [{"q": f"Barcelona {n}"} for n in range(6)]
+
+    assert client.post(reverse("media_search_batch"), searches, format="json").status_code == 200
+    assert client.post(reverse("media_search_batch"), searches, format="json").status_code == 429
+    assert client.post(reverse("media_search_batch"), searches[:4], format="json").status_code == 200
@@ -0,0 +1,122 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from media_api import es_client, search_utils
+from media_api.cache import bildnummer_cache
+from media_api.fake_es import FakeElasticsearch
+from media_api.planner import BILDNUMMER_SORT
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    calls = []
+    existing = {"7914100": {"bildnummer": "7914100", "db": "st", "suchtext": "Barcelona"}}
+
+    def fake_lookup_bildnummer(bildnummer, size=1, fields=None):
+        calls.append((bildnummer, size))
+        source = existing.get(bildnummer)
+        return ([{"_source": dict(source)}], 1) if source else ([], 0)
+
+    monkeypatch.setattr(search_utils, "lookup_bildnummer", fake_lookup_bildnummer)
+    return calls
+
+
+def test_lookup_body_is_a_non_scoring_filter():
+    body = es_client.build_bildnummer_lookup_body("7914100")
+    assert body["query"]["bool"] == {"filter": [{"term": {"bildnummer": 7914100}}]}
+    assert body["sort"] == BILDNUMMER_SORT
+    assert body["track_scores"] is False
+
+
+def test_found_bildnummer_is_cached(lookups):
+    first = search_utils.execute_bildnummer_lookup("7914100")
+    second = search_utils.execute_bildnummer_lookup("7914100")
+
+    assert first["results"][0]["thumbnail_url"].endswith("/st/0007914100/s.jpg")
+    assert second == first
+    assert lookups == [("7914100", 1)]
+
+
+def test_missing_bildnummer_is_negatively_cached(lookups):
+    for _ in range(3):
+        assert search_utils.execute_bildnummer_lookup("0001234")["results"] == []
+    # Leading zeros and page size share the negative entry
+    search_utils.execute_bildnummer_lookup("1234", page_size=10)
+
+    assert lookups == [("1234", 1)]
+    assert bildnummer_cache.stats()["missing_hits"] == 3
+
+
+def test_non_numeric_bildnummer_never_reaches_es(lookups):
+    assert search_utils.execute_bildnummer_lookup("abc")["count"] == 0
+    assert search_utils.execute_bildnummer_lookup("9" * 30)["count"] == 0
+    assert lookups == []
+
+
+def test_only_first_page_of_digit_query_uses_lookup(lookups, es_calls):
+    es_calls.respond = lambda **kwargs: ([], 0)
+
+    search_utils.execute_media_search(bildnummer="7914100", page=1, page_size=10)
+    search_utils.execute_media_search(bildnummer="7914100", page=2, page_size=10)
+
+    assert lookups == [("7914100", 10)]
+    assert es_calls[0]["page"] == 2
+
+
+@pytest.mark.django_db
+def test_search_by_bildnummer_view_uses_lookup(lookups):
+    response = APIClient().get(reverse("media_search_by_bildnummer"), {"bildnummer": "7914100"})
+
+    assert response.status_code == 200
+    assert response.json()["count"] == 1
+    assert response.json()["results"][0]["bildnummer"] == "7914100"
+    assert lookups == [("7914100", 1)]
+
+
+@pytest.fixture
+def two_dbs(monkeypatch):
+    """An index with ids from the default template and 7914100 in both dbs."""
+    corpus = FakeElasticsearch.from_documents([
+        {"_id": f"{db}-{n}", "_source": {"bildnummer": n, "db": db, "suchtext": f"Bild {n}"}}
+        for n in (7914101, 7914100, 7914099) for db in ("sp", "st")
+    ])
+    monkeypatch.setattr(es_client, "es", corpus)
+    monkeypatch.setattr(es_client, "ES_BILDNUMMER_ID_TEMPLATE", "{db}-{bildnummer}")
+    monkeypatch.setattr(es_client, "ES_DBS", ["st", "sp"])
+    return corpus
+
+
+def test_db_template_gets_one_id_per_db(two_dbs):
+    hits, total = es_client.lookup_bildnummer("7914100", size=1)
+
+    assert total == 2
+    assert [(hit["_id"], hit["sort"]) for hit in hits] == [("sp-7914100", [7914100, "sp"])]
+    assert two_dbs.calls["mget"] == 1 and two_dbs.calls["search"] == 0
+
+
+def test_lookup_cursor_continues_with_the_next_db(two_dbs):
+    first = search_utils.execute_bildnummer_lookup("7914100")
+    rest, _ = es_client.fetch_media(bildnummer="7914100", search_after=first["next_search_after"])
+
+    assert [hit["_id"] for hit in rest] == ["st-7914100"]
+
+
+def test_broken_id_template_falls_back_to_search(two_dbs, monkeypatch, caplog):
+    monkeypatch.setattr(es_client, "ES_BILDNUMMER_ID_TEMPLATE", "{db}-{nummer}")
+
+    result = search_utils.execute_bildnummer_lookup("7914100", page_size=10)
+
+    assert [item["db"] for item in result["results"]] == ["sp", "st"]
+    assert two_dbs.calls["mget"] == 0 and two_dbs.calls["search"] == 1
+    assert "searching instead" in caplog.text
+
+
+def test_id_template_without_db_is_refused_like_index_media_does(two_dbs, monkeypatch):
+    monkeypatch.setattr(es_client, "ES_BILDNUMMER_ID_TEMPLATE", "{bildnummer}")
+    with pytest.raises(ValueError, match="must use"):
+        es_client.bildnummer_doc_ids("7914100")
+
+    result = search_utils.execute_bildnummer_lookup("7914100", page_size=10)
+    assert [item["db"] for item in result["results"]] == ["sp", "st"]
+    assert two_dbs.calls["mget"] == 0
@@ -0,0 +1,159 @@
+import time
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from elasticsearch8.exceptions import ApiError, BadRequestError, ConnectionError, ConnectionTimeout
+from rest_framework.test import APIClient
+
+from media_api import es_client, search_utils
+from media_api.breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    degraded_responses,
+    es_breaker,
+    is_unavailable,
+)
+from media_api.fake_es import _api_error, bad_request
+
+FAST_BREAKER = {"MIN_CALLS": 4, "FAILURE_RATE": 0.5, "WINDOW": 30, "OPEN_SECONDS": 0.05}
+
+
+class DownElasticsearch:
+    """Every call fails as if the cluster could not be reached."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def search(self, **kwargs):
+        self.calls += 1
+        raise ConnectionError("down")
+
+
+@pytest.fixture
+def fast_breaker(settings):
+    settings.MEDIA_SEARCH_BREAKER = FAST_BREAKER
+    degraded_responses.reset()
+
+
+def call(breaker, error=None):
+    with breaker.guard():
+        if error is not None:
+            raise error
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        with pytest.raises(ConnectionError):
+            call(breaker, ConnectionError("down"))
+
+
+def test_is_unavailable_separates_outages_from_bad_requests():
+    assert is_unavailable(ConnectionError("down"))
+    assert is_unavailable(ConnectionTimeout("slow"))
+    assert is_unavailable(_api_error(ApiError, 503, "unavailable", "overloaded"))
+    assert is_unavailable(_api_error(ApiError, 429, "es_rejected_execution_exception", "busy"))
+    assert not is_unavailable(bad_request("no such field"))
+    assert not is_unavailable(ValueError("x"))
+
+
+def test_trips_once_the_error_rate_reaches_the_threshold(fast_breaker):
+    breaker = CircuitBreaker()
+    call(breaker)
+    call(breaker)
+    fail(breaker, 1)
+    assert breaker.state == CLOSED
+    fail(breaker, 1)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError) as excinfo:
+        call(breaker)
+    assert excinfo.value.retry_after >= 1
+
+
+def test_bad_requests_do_not_trip(fast_breaker):
+    breaker = CircuitBreaker()
+    for _ in range(10):
+        with pytest.raises(BadRequestError):
+            call(breaker, bad_request("no such field"))
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_closes_or_reopens(fast_breaker):
+    breaker = CircuitBreaker()
+    fail(breaker, 4)
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    fail(breaker, 1)
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    with breaker.guard():
+        assert breaker.state == HALF_OPEN
+        # Only HALF_OPEN_PROBES calls get through while probing
+        with pytest.raises(CircuitOpenError):
+            call(breaker)
+    assert breaker.state == CLOSED
+
+
+def test_disabled_breaker_never_rejects(settings):
+    settings.MEDIA_SEARCH_BREAKER = {**FAST_BREAKER, "ENABLED": False}
+    breaker = CircuitBreaker()
+    fail(breaker, 10)
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.django_db
+def test_outage_serves_stale_result_then_503(fake_es, fast_breaker, monkeypatch):
+    client = APIClient()
+    url = reverse("media_search")
+    fresh = client.get(url, {"q": "Barcelona"})
+    assert fresh.status_code == 200
+    assert "stale" not in fresh.data
+
+    # Let the fresh copy expire; the stale copy outlives it
+    cache.delete(search_utils.result_cache_key(query="Barcelona", page=1, page_size=10))
+    search_utils.result_cache.clear_local()
+    down = DownElasticsearch()
+    monkeypatch.setattr(es_client, "es", down)
+
+    stale = client.get(url, {"q": "Barcelona"})
+    assert stale.status_code == 200
+    assert stale.data["stale"] is True
+    assert stale.data["results"] == fresh.data["results"]
+
+    missing = client.get(url, {"q": "nothing cached for this"})
+    assert missing.status_code == 503
+    assert "Retry-After" not in missing
+
+    for _ in range(2):
+        client.get(url, {"q": "nothing cached for this"})
+    assert es_breaker.state == OPEN
+    calls_before = down.calls
+
+    rejected = client.get(url, {"q": "nothing cached either"})
+    assert rejected.status_code == 503
+    assert int(rejected["Retry-After"]) >= 1
+    assert down.calls == calls_before
+    assert degraded_responses.value(("stale",)) == 1
+    assert degraded_responses.value(("unavailable",)) == 4
+
+
+def test_facets_fall_back_to_stale_copy(fast_breaker, monkeypatch):
+    monkeypatch.setattr(search_utils, "fetch_facets", lambda **kwargs: ({"db": []}, 3))
+    fresh = search_utils.execute_facet_search(query="Barcelona", facets=("db",))
+
+    cache.delete(search_utils.facets_cache_key(("db",), 10, "year", query="Barcelona"))
+    search_utils.result_cache.clear_local()
+
+    def failing_fetch_facets(**kwargs):
+        raise ConnectionError("down")
+
+    monkeypatch.setattr(search_utils, "fetch_facets", failing_fetch_facets)
+    assert search_utils.execute_facet_search(query="Barcelona", facets=("db",)) == {**fresh, "stale": True}
+    with pytest.raises(search_utils.SearchUnavailable):
+        search_utils.execute_facet_search(query="Madrid", facets=("db",))
@@ -0,0 +1,74 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from media_api import es_client, search_utils
+
+
+@pytest.fixture
+def es_calls(es_calls, fake_hit):
+    def respond(track_total_hits=None, **kwargs):
+        total = None if track_total_hits is False else (
+            25000 if track_total_hits is True else min(25000, track_total_hits or 10000)
+        )
+        return [fake_hit(1)], total
+
+    es_calls.respond = respond
+    return es_calls
+
+
+@pytest.mark.parametrize("count_mode, expected", [
+    (None, None),
+    ("exact", True),
+    ("none", False),
+    ("lower_bound:500", 500),
+])
+def test_count_mode_maps_onto_track_total_hits(count_mode, expected):
+    assert es_client.parse_count_mode(count_mode) == expected
+
+
+@pytest.mark.parametrize("count_mode", ["approx", "lower_bound:", "lower_bound:-1"])
+def test_invalid_count_mode_is_rejected(count_mode):
+    with pytest.raises(ValueError):
+        es_client.parse_count_mode(count_mode)
+
+
+def test_response_reports_whether_count_is_exact(es_calls):
+    exact = search_utils.execute_media_search(query="der", count_mode="exact")
+    capped = search_utils.execute_media_search(query="der", count_mode="lower_bound:500")
+    skipped = search_utils.execute_media_search(query="der", count_mode="none")
+
+    assert (exact["count"], exact["count_exact"]) == (25000, True)
+    assert (capped["count"], capped["count_exact"]) == (500, False)
+    assert (skipped["count"], skipped["count_exact"]) == (None, None)
+    assert [call.get("track_total_hits") for call in es_calls] == [True, 500, False]
+
+
+def test_later_pages_reuse_exact_total_from_page_one(es_calls):
+    search_utils.execute_media_search(query="der", page=1, count_mode="exact")
+    page_2 = search_utils.execute_media_search(query="der", page=2, count_mode="exact")
+    after = search_utils.execute_media_search(query="der", search_after=[1, "st"], count_mode="exact")
+
+    assert [call.get("track_total_hits") for call in es_calls] == [True, False, False]
+    assert page_2["count"] == after["count"] == 25000
+    assert page_2["count_exact"] is True
+
+
+@pytest.mark.django_db
+def test_search_view_validates_count_mode(es_calls):
+    client = APIClient()
+    assert client.get(reverse("media_search"), {"q": "der", "count_mode": "approx"}).status_code == 400
+    response = client.get(reverse("media_search"), {"q": "der", "count_mode": "none"})
+    assert response.status_code == 200
+    assert response.json()["count"] is None
+
+
+def test_later_pages_skip_counting_in_every_count_mode(es_calls):
+    search_utils.execute_media_search(query="der")
+    page_2 = search_utils.execute_media_search(query="der", page=2)
+    search_utils.execute_media_search(query="der", count_mode="lower_bound:500")
+    capped_2 = search_utils.execute_media_search(query="der", page=2, count_mode="lower_bound:500")
+
+    assert [call.get("track_total_hits") for call in es_calls] == [None, False, 500, False]
+    assert (page_2["count"], page_2["count_exact"]) == (10000, False)
+    assert (capped_2["count"], capped_2["count_exact"]) == (500, False)
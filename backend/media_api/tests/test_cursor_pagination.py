@@ -0,0 +1,88 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from media_api import search_utils
+from media_api.cursors import (
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    parse_search_after,
+)
+
+
+@pytest.fixture
+def pit(monkeypatch, fake_hit):
+    state = {"opened": [], "closed": [], "pages": []}
+    # A PIT search adds the shard doc as a last sort value
+    corpus = [dict(fake_hit(n), sort=[n, "st", n]) for n in range(105, 100, -1)]
+
+    def fake_open(keep_alive):
+        state["opened"].append(keep_alive)
+        return "pit-1"
+
+    def fake_fetch(pit_id, keep_alive, page_size=10, search_after=None, **filters):
+        state["pages"].append((pit_id, search_after, filters))
+        start = 0 if search_after is None else next(
+            i + 1 for i, hit in enumerate(corpus) if hit["sort"] == search_after
+        )
+        return corpus[start:start + page_size], len(corpus), f"pit-{len(state['pages']) + 1}"
+
+    monkeypatch.setattr(search_utils, "open_point_in_time", fake_open)
+    monkeypatch.setattr(search_utils, "fetch_media_in_pit", fake_fetch)
+    monkeypatch.setattr(search_utils, "close_point_in_time", state["closed"].append)
+    return state
+
+
+def test_parse_search_after_accepts_arrays_and_scalars():
+    assert parse_search_after('[7914100, "st"]') == [7914100, "st"]
+    assert parse_search_after("7914100") == [7914100]
+    assert parse_search_after(None) is None
+
+
+@pytest.mark.parametrize("raw", ["not-a-valid-json-array", "[]", '{"a": 1}', "[[1]]"])
+def test_parse_search_after_rejects_malformed_values(raw):
+    with pytest.raises(InvalidCursor):
+        parse_search_after(raw)
+
+
+def test_cursor_round_trip_and_tamper_detection():
+    token = encode_cursor("pit-1", [100, "st"], "abc")
+    assert decode_cursor(token, "abc") == ("pit-1", [100, "st"])
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, "other-query")
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token[:-2] + "xx")
+
+
+def test_cursor_walks_all_pages_and_closes_pit(pit):
+    seen = []
+    result = search_utils.execute_media_search(query="Barcelona", page_size=2, cursor="start")
+    while True:
+        seen += [hit["bildnummer"] for hit in result["results"]]
+        if result["next_cursor"] is None:
+            break
+        result = search_utils.execute_media_search(query="Barcelona", page_size=2, cursor=result["next_cursor"])
+
+    assert seen == ["105", "104", "103", "102", "101"]
+    assert pit["opened"] == ["120s"]
+    # Every page continues from the PIT id returned by the previous one
+    assert [page[0] for page in pit["pages"]] == ["pit-1", "pit-2", "pit-3"]
+    assert pit["closed"] == ["pit-4"]
+
+
+def test_cursor_cannot_be_reused_for_another_query(pit):
+    first = search_utils.execute_media_search(query="Barcelona", page_size=2, cursor="start")
+    with pytest.raises(InvalidCursor):
+        search_utils.execute_media_search(query="Madrid", page_size=2, cursor=first["next_cursor"])
+
+
+@pytest.mark.django_db
+def test_search_view_rejects_invalid_search_after_and_cursor(pit):
+    client = APIClient()
+    url = reverse("media_search")
+    assert client.get(url, {"q": "Barcelona", "search_after": "not-a-valid-json-array"}).status_code == 400
+    assert client.get(url, {"q": "Barcelona", "cursor": "garbage"}).status_code == 400
+    response = client.get(url, {"q": "Barcelona", "cursor": "start", "page_size": 2})
+    assert response.status_code == 200
+    assert response.json()["next_cursor"]
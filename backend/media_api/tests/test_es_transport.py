@@ -0,0 +1,56 @@
+import socket
+
+import pytest
+
+from media_api import es_client
+
+
+@pytest.fixture
+def two_nodes(monkeypatch):
+    monkeypatch.setattr(es_client, "ES_HOSTS", ["https://es-1:9200", "https://es-2:9200"])
+    monkeypatch.setattr(es_client, "ES_USER", "elastic")
+    monkeypatch.setattr(es_client, "ES_PASS", "secret")
+
+
+def test_client_spans_every_configured_node(two_nodes):
+    client = es_client.create_es()
+    nodes = client.transport.node_pool.all()
+
+    assert sorted(node.config.host for node in nodes) == ["es-1", "es-2"]
+    assert all(node.config.http_compress for node in nodes)
+    assert all(node.config.connections_per_node == es_client.ES_CONNECTIONS_PER_NODE for node in nodes)
+    assert client._max_retries == es_client.ES_MAX_RETRIES
+    assert client._retry_on_status == es_client.ES_RETRY_ON_STATUS
+
+
+def test_pooled_connections_use_tcp_keepalive(two_nodes):
+    node = es_client.create_es().transport.node_pool.get()
+
+    assert isinstance(node, es_client.KeepAliveUrllib3HttpNode)
+    assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in node.pool.conn_kw["socket_options"]
+
+
+def test_keepalive_can_be_turned_off(two_nodes, monkeypatch):
+    monkeypatch.setattr(es_client, "ES_TCP_KEEPALIVE", 0)
+    node = es_client.create_es().transport.node_pool.get()
+    assert not isinstance(node, es_client.KeepAliveUrllib3HttpNode)
+
+
+def test_env_bool(monkeypatch):
+    monkeypatch.setenv("ES_FLAG", "yes")
+    assert es_client._env_bool("ES_FLAG", False) is True
+    monkeypatch.setenv("ES_FLAG", "0")
+    assert es_client._env_bool("ES_FLAG", True) is False
+    monkeypatch.setenv("ES_FLAG", "")
+    assert es_client._env_bool("ES_FLAG", True) is True
+
+
+def test_forked_worker_gets_its_own_clients(two_nodes, monkeypatch):
+    parent = es_client.create_es()
+    monkeypatch.setattr(es_client, "es", parent)
+    monkeypatch.setattr(es_client, "_async_es", object())
+
+    es_client._reset_after_fork()
+
+    assert es_client.es is not parent
+    assert es_client._async_es is None
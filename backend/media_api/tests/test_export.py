@@ -0,0 +1,126 @@
+import asyncio
+import csv
+import io
+import json
+
+import pytest
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.test import AsyncRequestFactory
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from media_api import search_utils
+
+
+def async_get(path, params):
+    request = AsyncRequestFactory().get(path, params)
+    request.user = AnonymousUser()
+    return request
+
+
+@pytest.fixture
+def pit(monkeypatch):
+    state = {"closed": [], "sizes": []}
+    corpus = [
+        {"_source": {"bildnummer": str(n), "db": "st", "suchtext": f"Text {n}"}, "sort": [n, "st"]}
+        for n in range(250, 0, -1)
+    ]
+
+    def fake_fetch(pit_id, keep_alive, page_size=10, search_after=None, **filters):
+        state["sizes"].append(page_size)
+        start = 0 if search_after is None else 251 - search_after[0]
+        # Fresh dicts: normalize_hit mutates _source in place
+        page = [dict(hit, _source=dict(hit["_source"])) for hit in corpus[start:start + page_size]]
+        return page, None, pit_id
+
+    monkeypatch.setattr(search_utils, "open_point_in_time", lambda keep_alive: "pit-export")
+    monkeypatch.setattr(search_utils, "fetch_media_in_pit", fake_fetch)
+    monkeypatch.setattr(search_utils, "close_point_in_time", state["closed"].append)
+    return state
+
+
+def test_export_pages_lazily_and_closes_pit(pit):
+    rows = list(search_utils.iter_media_export(query="Text", batch_size=100))
+
+    assert len(rows) == 250
+    assert rows[0]["thumbnail_url"].endswith("/st/0000000250/s.jpg")
+    assert pit["sizes"] == [100, 100, 100]
+    assert pit["closed"] == ["pit-export"]
+
+
+def test_closing_export_early_stops_iteration_and_closes_pit(pit):
+    rows = search_utils.iter_media_export(batch_size=100)
+    next(rows)
+    rows.close()
+
+    assert pit["sizes"] == [100]
+    assert pit["closed"] == ["pit-export"]
+
+
+def test_export_respects_limit(pit):
+    rows = list(search_utils.iter_media_export(batch_size=100, limit=120))
+    assert len(rows) == 120
+    assert pit["sizes"] == [100, 20]
+
+
+@pytest.mark.django_db
+def test_export_view_streams_ndjson(pit):
+    response = APIClient().get(reverse("media_export"), {"q": "Text", "batch_size": 100})
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/x-ndjson"
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    assert len(lines) == 250
+    assert json.loads(lines[-1])["bildnummer"] == "1"
+
+
+@pytest.mark.django_db
+def test_export_view_streams_csv(pit):
+    response = APIClient().get(reverse("media_export"), {"format": "csv", "limit": 3})
+
+    rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+    assert rows[0][:2] == ["bildnummer", "db"]
+    assert [row[0] for row in rows[1:]] == ["250", "249", "248"]
+
+
+@pytest.mark.django_db
+def test_export_view_rejects_unknown_format(pit):
+    assert APIClient().get(reverse("media_export"), {"format": "xml"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_async_export_view_streams_batches(pit):
+    from media_api import async_views
+
+    async def collect():
+        request = async_get(reverse("media_export"), {"q": "Text", "batch_size": 100})
+        response = await async_views.export_media(request)
+        assert response.is_async
+        return [chunk async for chunk in response]
+
+    chunks = asyncio.run(collect())
+
+    assert len(chunks) == 3
+    lines = b"".join(chunks).decode().splitlines()
+    assert len(lines) == 250
+    assert pit["closed"] == ["pit-export"]
+
+
+@pytest.mark.django_db
+def test_async_export_closes_pit_when_client_goes_away(pit):
+    from media_api import async_views
+
+    async def first_chunk():
+        request = async_get(reverse("media_export"), {"format": "csv", "batch_size": 100})
+        response = await async_views.export_media(request)
+        chunk = await anext(aiter(response))
+        # What the ASGI handler does once the client has gone away
+        await sync_to_async(response.close)()
+        return chunk
+
+    rows = list(csv.reader(io.StringIO(asyncio.run(first_chunk()).decode())))
+
+    assert len(rows) == 100
+    assert pit["sizes"] == [100]
+    assert pit["closed"] == ["pit-export"]
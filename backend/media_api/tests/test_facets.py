@@ -0,0 +1,92 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from media_api import es_client, search_utils
+
+
+FACETS_RESPONSE = {
+    "hits": {"total": {"value": 42, "relation": "eq"}, "hits": []},
+    "aggregations": {
+        "fotografen": {"buckets": [{"key": "IMAGO / Sven Simon", "doc_count": 30}]},
+        "db": {"buckets": [{"key": "st", "doc_count": 40}, {"key": "sp", "doc_count": 2}]},
+        "datum": {"buckets": [{"key": 1577836800000, "key_as_string": "2020-01-01T00:00:00.000Z", "doc_count": 42}]},
+    },
+}
+
+
+@pytest.fixture
+def facet_calls(monkeypatch, es_calls, fake_hit):
+    calls = []
+
+    def fake_fetch_facets(**kwargs):
+        calls.append(kwargs)
+        return es_client.parse_facets_response(FACETS_RESPONSE)
+
+    monkeypatch.setattr(search_utils, "fetch_facets", fake_fetch_facets)
+    es_calls.respond = lambda **kwargs: ([fake_hit(1)], 42)
+    return calls
+
+
+def test_facets_body_fetches_no_hits_and_reuses_build_query():
+    body = es_client.build_facets_body(query="Barcelona", fotografen=["a"], facets=("db", "datum"), interval="month")
+
+    assert body["size"] == 0
+    assert body["query"] == es_client.build_query("Barcelona", ["a"])["query"]
+    assert body["aggs"] == {
+        "db": {"terms": {"field": "db", "size": 10}},
+        "datum": {"date_histogram": {"field": "datum", "calendar_interval": "month", "min_doc_count": 1}},
+    }
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("", ()),
+    ("all", es_client.FACET_FIELDS),
+    ("datum, db,db", ("db", "datum")),
+])
+def test_parse_facets(value, expected):
+    assert es_client.parse_facets(value) == expected
+
+
+def test_parse_facets_rejects_unknown_names():
+    with pytest.raises(ValueError):
+        es_client.parse_facets("db,bildnummer")
+
+
+@pytest.mark.django_db
+def test_facets_endpoint_returns_counts(es_calls, facet_calls):
+    response = APIClient().get(reverse("media_search_facets"), {"q": "Barcelona"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 42
+    assert body["facets"]["db"] == [{"value": "st", "count": 40}, {"value": "sp", "count": 2}]
+    assert body["facets"]["datum"][0]["value"] == "2020-01-01T00:00:00.000Z"
+    assert es_calls == []
+
+
+@pytest.mark.django_db
+def test_search_facets_are_cached_across_pages(es_calls, facet_calls):
+    client = APIClient()
+    first = client.get(reverse("media_search"), {"q": "Barcelona", "facets": "db"})
+    second = client.get(reverse("media_search"), {"q": "Barcelona", "facets": "db", "page": 2})
+
+    assert first.json()["facets"]["db"][0]["value"] == "st"
+    assert second.json()["facets"] == first.json()["facets"]
+    assert len(es_calls) == 2
+    assert len(facet_calls) == 1
+    assert facet_calls[0]["facets"] == ("db",)
+
+
+@pytest.mark.django_db
+def test_search_without_facets_param_skips_aggregations(facet_calls):
+    response = APIClient().get(reverse("media_search"), {"q": "Barcelona"})
+
+    assert "facets" not in response.json()
+    assert facet_calls == []
+
+
+@pytest.mark.django_db
+def test_invalid_facets_are_rejected(facet_calls):
+    response = APIClient().get(reverse("media_search_facets"), {"facets": "suchtext"})
+    assert response.status_code == 400
@@ -0,0 +1,169 @@
+import asyncio
+from collections import Counter
+from datetime import date
+
+import pytest
+
+from media_api import es_client, search_utils
+from media_api.fake_es import FakeElasticsearch, tokenize
+from elasticsearch8.exceptions import BadRequestError, NotFoundError
+
+
+def brute_force(store, query=None, fotografen=None, datum_von=None, datum_bis=None):
+    """Reference evaluation of build_query over every document."""
+    tokens = set(tokenize(query))
+    matches = []
+    for position in range(len(store)):
+        source = store.source(position)
+        if query and not (tokens & set(tokenize(source["suchtext"])) or source["fotografen"] == query):
+            continue
+        if fotografen and source["fotografen"] not in fotografen:
+            continue
+        day = source["datum"][:10]
+        if datum_von and day < datum_von.isoformat():
+            continue
+        if datum_bis and day > datum_bis.isoformat():
+            continue
+        matches.append(source)
+    matches.sort(key=lambda source: (-int(source["bildnummer"]), source["db"]))
+    return matches
+
+
+SEARCHES = [
+    dict(),
+    dict(query="Berlin"),
+    dict(query="berlin GALA1"),
+    dict(query="Tor", fotografen=["IMAGO / Schulz 000", "IMAGO / Koch 004"]),
+    dict(datum_von=date(2010, 1, 1), datum_bis=date(2012, 6, 30)),
+    dict(query="Finale", datum_bis=date(2008, 1, 1)),
+]
+
+
+@pytest.mark.parametrize("search", SEARCHES)
+def test_search_matches_brute_force(fake_es, search):
+    expected = brute_force(fake_es, **search)
+
+    hits, total = es_client.fetch_media(page=2, page_size=25, track_total_hits=True, **search)
+
+    assert total == len(expected)
+    assert [hit["_source"] for hit in hits] == expected[25:50]
+
+
+@pytest.mark.parametrize("search", SEARCHES)
+def test_unsorted_index_returns_the_same_pages(fake_es, search, monkeypatch):
+    sorted_page = es_client.fetch_media(page=2, page_size=25, **search)
+    monkeypatch.setattr(fake_es, "index_sorted", False)
+    first = es_client.fetch_media(page_size=25, **search)[0]
+    assert es_client.fetch_media(page=2, page_size=25, **search) == sorted_page
+    if first:
+        after = es_client.fetch_media(page_size=25, search_after=first[-1]["sort"], **search)[0]
+        assert after == sorted_page[0]
+
+
+@pytest.mark.parametrize("search", SEARCHES)
+def test_search_after_walks_the_whole_result_set(fake_es, search):
+    expected = [source["bildnummer"] for source in brute_force(fake_es, **search)]
+
+    seen, search_after = [], None
+    while True:
+        hits, _ = es_client.fetch_media(page_size=400, search_after=search_after, **search)
+        seen += [hit["_source"]["bildnummer"] for hit in hits]
+        if len(hits) < 400:
+            break
+        search_after = hits[-1]["sort"]
+
+    assert seen == expected
+
+
+def test_total_is_a_lower_bound_past_track_total_hits(fake_es):
+    _, total = es_client.fetch_media(track_total_hits=100)
+    response = fake_es.search(body=es_client.build_search_body(track_total_hits=100))
+
+    assert total == 100
+    assert response["hits"]["total"]["relation"] == "gte"
+    assert es_client.fetch_media(track_total_hits=False)[1] is None
+
+
+def test_source_projection(fake_es):
+    hits, _ = es_client.fetch_media(page_size=1, fields=es_client.resolve_source_fields("card"))
+    assert set(hits[0]["_source"]) == {"bildnummer", "datum", "db", "fotografen"}
+
+
+def test_point_in_time_paging_and_close(fake_es):
+    pit_id = es_client.open_point_in_time("1m")
+    hits, _, pit_id = es_client.fetch_media_in_pit(pit_id, "1m", query="Berlin", page_size=5)
+    more, _, _ = es_client.fetch_media_in_pit(pit_id, "1m", query="Berlin", page_size=5, search_after=hits[-1]["sort"])
+
+    expected = [source["bildnummer"] for source in brute_force(fake_es, query="Berlin")[:10]]
+    assert [hit["_source"]["bildnummer"] for hit in hits + more] == expected
+
+    fake_es.close_point_in_time(id=pit_id)
+    with pytest.raises(NotFoundError):
+        es_client.fetch_media_in_pit(pit_id, "1m")
+
+
+def test_realtime_get_and_mget(fake_es):
+    assert es_client.lookup_bildnummer("42")[0][0]["_source"]["bildnummer"] == "42"
+
+    docs = fake_es.mget(ids=["42", "99999999"])["docs"]
+    assert [doc["found"] for doc in docs] == [True, False]
+    assert fake_es.get(id="42")["_source"]["bildnummer"] == "42"
+    with pytest.raises(NotFoundError):
+        fake_es.get(id="99999999")
+
+
+def test_facets_match_brute_force(fake_es):
+    matches = brute_force(fake_es, query="Gala")
+
+    facets, total = es_client.fetch_facets(query="Gala", facet_size=3)
+
+    assert total == len(matches)
+    fotografen = Counter(source["fotografen"] for source in matches)
+    assert [bucket["count"] for bucket in facets["fotografen"]] == [count for _, count in fotografen.most_common(3)]
+    assert sum(bucket["count"] for bucket in facets["datum"]) == len(matches)
+    assert {bucket["value"] for bucket in facets["db"]} == {"st", "sp"}
+
+
+def test_unsupported_query_is_a_bad_request(fake_es):
+    with pytest.raises(BadRequestError):
+        fake_es.search(body={"query": {"wildcard": {"suchtext": "ber*"}}})
+
+    response = fake_es.msearch(searches=[
+        {}, es_client.build_search_body(query="Berlin"),
+        {}, {"query": {"wildcard": {"suchtext": "ber*"}}},
+    ])
+    assert [item["status"] for item in response["responses"]] == [200, 400]
+
+
+def test_documents_are_stored_in_sort_order():
+    store = FakeElasticsearch.from_documents([
+        {"bildnummer": "5", "db": "st", "datum": "2020-05-01", "suchtext": "Eins"},
+        {"_id": "sp-5", "_source": {"bildnummer": 5, "db": "sp", "datum": "2020-05-02", "suchtext": "Zwei"}},
+        {"bildnummer": "9", "db": "st", "datum": "2021-01-01", "suchtext": "Drei Eins"},
+    ])
+
+    response = store.search(body=es_client.build_search_body(query="eins"))
+
+    assert [hit["sort"] for hit in response["hits"]["hits"]] == [[9, "st"], [5, "st"]]
+    assert store.get(id="sp-5")["_source"]["suchtext"] == "Zwei"
+
+
+@pytest.mark.django_db
+def test_execute_media_search_runs_against_fake(fake_es):
+    first = search_utils.execute_media_search(query="Berlin", page_size=5)
+    second = search_utils.execute_media_search(query="Berlin", page_size=5, search_after=first["next_search_after"])
+
+    expected = brute_force(fake_es, query="Berlin")
+    assert first["count"] == len(expected)
+    assert [row["bildnummer"] for row in first["results"] + second["results"]] == [
+        source["bildnummer"] for source in expected[:10]
+    ]
+    assert first["results"][0]["thumbnail_url"].endswith("/s.jpg")
+
+
+@pytest.mark.django_db
+def test_async_search_runs_against_fake(fake_es):
+    result = asyncio.run(search_utils.aexecute_media_search(query="Tor", page_size=3))
+    assert [row["bildnummer"] for row in result["results"]] == [
+        source["bildnummer"] for source in brute_force(fake_es, query="Tor")[:3]
+    ]
@@ -0,0 +1,147 @@
+import json
+import time
+
+import pytest
+from django.urls import reverse
+from elasticsearch8.exceptions import ConnectionError
+from rest_framework.test import APIClient
+
+from media_api import federation, search_utils
+from media_api.fake_es import FakeElasticsearch
+
+# Two clusters sharing the sort key space; bildnummer 10, 20, ... exist in both
+LIVE = FakeElasticsearch.from_documents(
+    [{"bildnummer": n, "db": "st", "suchtext": "Berlin live"} for n in range(2, 101, 2)]
+)
+ARCHIVE = FakeElasticsearch.from_documents(
+    [{"bildnummer": n, "db": "st", "suchtext": "Berlin archiv"} for n in range(1, 100, 2)]
+    + [{"bildnummer": n, "db": "sp", "suchtext": "Berlin archiv"} for n in range(10, 101, 10)]
+)
+EVERYTHING = sorted(
+    [(n, "st") for n in range(1, 101)] + [(n, "sp") for n in range(10, 101, 10)],
+    key=lambda key: (-key[0], key[1]),
+)
+
+
+class SlowElasticsearch:
+    def __init__(self, store, delay):
+        self.store, self.delay = store, delay
+
+    def options(self, **params):
+        return self
+
+    def search(self, **kwargs):
+        time.sleep(self.delay)
+        return self.store.search(**kwargs)
+
+
+class DownElasticsearch:
+    def options(self, **params):
+        return self
+
+    def search(self, **kwargs):
+        raise ConnectionError("down")
+
+
+@pytest.fixture
+def targets(settings, monkeypatch):
+    """Federation over LIVE and ARCHIVE; returns the name -> client map to swap clients in."""
+    settings.MEDIA_SEARCH_FEDERATION = {
+        "ENABLED": True,
+        "TARGETS": [
+            {"name": "live", "index": "imago-live"},
+            {"name": "archive", "index": "imago-archive", "hosts": ["http://archive:9200"], "timeout": 0.2},
+        ],
+    }
+    clients = {"live": LIVE, "archive": ARCHIVE}
+    monkeypatch.setattr(federation, "target_client", lambda target: clients[target["name"]])
+    return clients
+
+
+def keys(result):
+    return [(int(hit["bildnummer"]), hit["db"]) for hit in result["results"]]
+
+
+def test_pages_are_merged_on_the_sort_key(targets):
+    result = search_utils.execute_media_search(page_size=15)
+
+    assert keys(result) == EVERYTHING[:15]
+    assert (result["count"], result["count_exact"], result["partial"]) == (110, True, False)
+    assert result["targets"] == {"live": "ok", "archive": "ok"}
+    # Positions of the last hit each target contributed
+    assert result["next_search_after"] == {"live": [88, "st"], "archive": [89, "st"]}
+
+
+@pytest.mark.django_db
+def test_composite_cursor_walks_every_target_once(targets):
+    client = APIClient()
+    seen, search_after = [], None
+    while True:
+        params = {"q": "Berlin", "page_size": 12}
+        if search_after is not None:
+            params["search_after"] = json.dumps(search_after)
+        response = client.get(reverse("media_search"), params)
+        assert response.status_code == 200
+        seen += keys(response.data)
+        search_after = response.data["next_search_after"]
+        if search_after is None:
+            break
+
+    assert seen == EVERYTHING
+
+
+def test_page_without_cursor_skips_merged_pages(targets):
+    assert keys(search_utils.execute_media_search(page=3, page_size=10)) == EVERYTHING[20:30]
+
+
+def test_slow_target_degrades_to_partial_results(targets):
+    targets["archive"] = SlowElasticsearch(ARCHIVE, 1.0)
+
+    started = time.monotonic()
+    result = search_utils.execute_media_search(page_size=5)
+
+    assert time.monotonic() - started < 0.8
+    assert keys(result) == [(n, "st") for n in range(100, 90, -2)]
+    assert result["partial"] and result["count_exact"] is False
+    assert result["targets"] == {"live": "ok", "archive": "timeout"}
+    # The archive starts from the top again on the next page
+    assert result["next_search_after"] == {"live": [92, "st"]}
+
+
+def test_failed_target_keeps_its_position(targets):
+    targets["archive"] = DownElasticsearch()
+
+    result = search_utils.execute_media_search(search_after={"live": [50, "st"], "archive": [49, "st"]})
+
+    assert result["targets"] == {"live": "ok", "archive": "error"}
+    assert result["next_search_after"]["archive"] == [49, "st"]
+
+
+def test_exhausted_targets_are_not_queried(targets):
+    result = search_utils.execute_media_search(search_after={"live": None, "archive": [3, "st"]})
+
+    assert keys(result) == [(1, "st")]
+    assert result["next_search_after"] is None
+    assert result["targets"] == {"archive": "ok"}
+
+
+@pytest.mark.django_db
+def test_every_target_down_is_unavailable(targets):
+    targets["live"] = targets["archive"] = DownElasticsearch()
+
+    response = APIClient().get(reverse("media_search"), {"q": "Berlin"})
+
+    assert response.status_code == 503
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("params", [
+    {"search_after": json.dumps([100, "st"])},
+    {"search_after": json.dumps({"nearline": [1, "st"]})},
+    {"search_after": json.dumps({"live": "100"})},
+    {"cursor": "start"},
+    {"sort": "relevance"},
+])
+def test_invalid_federated_paging_is_rejected(targets, params):
+    response = APIClient().get(reverse("media_search"), {"q": "Berlin", **params})
+    assert response.status_code == 400
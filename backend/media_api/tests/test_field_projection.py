@@ -0,0 +1,45 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from media_api import es_client
+
+
+def test_card_preset_maps_to_source_includes():
+    fields = es_client.resolve_source_fields("card")
+    body = es_client.build_search_body(query="Barcelona", fields=fields)
+    assert body["_source"] == {"includes": ["bildnummer", "datum", "db", "fotografen"]}
+
+
+def test_full_preset_leaves_source_unfiltered():
+    body = es_client.build_search_body(query="Barcelona", fields=es_client.resolve_source_fields("full"))
+    assert "_source" not in body
+
+
+def test_custom_fields_keep_thumbnail_inputs_and_support_excludes():
+    assert es_client.resolve_source_fields("datum") == (("bildnummer", "datum", "db"), ())
+    assert es_client.resolve_source_fields("-suchtext,-bildnummer") == ((), ("suchtext",))
+    with pytest.raises(ValueError):
+        es_client.resolve_source_fields("secret")
+
+
+def test_normalize_hit_only_touches_present_fields():
+    assert es_client.normalize_hit({"_source": {"datum": "2020-01-01"}}) == {"datum": "2020-01-01"}
+    hit = es_client.normalize_hit({"_source": {"bildnummer": "5", "db": "sp"}})
+    assert hit["thumbnail_url"].endswith("/sp/0000000005/s.jpg")
+
+
+@pytest.mark.django_db
+def test_fields_param_is_passed_through_and_part_of_cache_key(es_calls):
+    client = APIClient()
+    client.get(reverse("media_search"), {"q": "Barcelona", "fields": "card"})
+    client.get(reverse("media_search"), {"q": "Barcelona", "fields": "full"})
+
+    assert es_calls[0]["fields"] == es_client.SOURCE_PRESETS["card"]
+    assert es_calls[1]["fields"] is None
+
+
+@pytest.mark.django_db
+def test_unknown_fields_value_is_rejected():
+    response = APIClient().get(reverse("media_search_by_datum"), {"fields": "secret"})
+    assert response.status_code == 400
@@ -0,0 +1,230 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from elasticsearch8.exceptions import ConnectionError
+
+from media_api import es_client
+from media_api.cache import get_index_generation
+from media_api.indexing import INDEX_SORT, TEMPLATE_VERSION, numbered_batches, read_records
+
+
+class FakeIndices:
+    def __init__(self, cluster):
+        self.cluster = cluster
+
+    def exists(self, index):
+        return index in self.cluster.docs or self.exists_alias(name=index)
+
+    def exists_alias(self, name):
+        return any(name in aliases for aliases in self.cluster.aliases.values())
+
+    def get_alias(self, name):
+        return {index: {"aliases": {name: {}}} for index, aliases in self.cluster.aliases.items() if name in aliases}
+
+    def exists_index_template(self, name):
+        return name in self.cluster.templates
+
+    def get_index_template(self, name):
+        return {"index_templates": [{"name": name, "index_template": self.cluster.templates[name]}]}
+
+    def put_index_template(self, name, **template):
+        self.cluster.templates[name] = template
+
+    def create(self, index, settings):
+        self.cluster.docs[index] = {}
+        self.cluster.settings[index] = dict(settings)
+        self.cluster.aliases[index] = set()
+
+    def get_settings(self, index):
+        return {index: {"settings": {"index": {
+            key: str(value) for key, value in self.cluster.settings[index].items()
+        }}}}
+
+    def put_settings(self, index, settings):
+        self.cluster.settings[index].update(settings)
+
+    def refresh(self, index):
+        self.cluster.refreshed.append(index)
+
+    def update_aliases(self, actions):
+        self.cluster.alias_calls.append(actions)
+        for action in actions:
+            (kind, spec), = action.items()
+            if kind == "add":
+                self.cluster.aliases[spec["index"]].add(spec["alias"])
+            else:
+                self.cluster.aliases[spec["index"]].discard(spec["alias"])
+
+    def delete(self, index):
+        del self.cluster.docs[index], self.cluster.aliases[index]
+
+
+class FakeCluster:
+    """Just enough of the indices and bulk APIs for a load."""
+
+    def __init__(self):
+        self.docs = {"media-old": {"st-1": {}}}
+        self.settings = {"media-old": {"number_of_replicas": 2}}
+        self.aliases = {"media-old": {"media"}}
+        self.refreshed = []
+        self.alias_calls = []
+        self.templates = {}
+        self.bulk_calls = 0
+        self.fail_on_call = None
+        self.indices = FakeIndices(self)
+
+    @property
+    def new_index(self):
+        return next(name for name in self.docs if name != "media-old")
+
+    def options(self, **kwargs):
+        return self
+
+    def bulk(self, operations, refresh):
+        self.bulk_calls += 1
+        if self.bulk_calls == self.fail_on_call:
+            raise ConnectionError("node went away")
+        items = []
+        for action, source in zip(operations[::2], operations[1::2]):
+            meta = action["index"]
+            self.docs[meta["_index"]][meta["_id"]] = source
+            items.append({"index": {"_id": meta["_id"], "status": 201}})
+        return {"errors": False, "items": items}
+
+
+@pytest.fixture
+def cluster(monkeypatch):
+    cluster = FakeCluster()
+    monkeypatch.setattr(es_client, "es", cluster)
+    return cluster
+
+
+@pytest.fixture
+def records(tmp_path):
+    path = tmp_path / "media.ndjson"
+    path.write_text("".join(
+        json.dumps({"bildnummer": str(n), "db": "st", "suchtext": f"Bild {n}", "datum": ""}) + "\n"
+        for n in range(1, 26)
+    ))
+    return path
+
+
+def load(path, *args):
+    call_command("index_media", str(path), "--alias", "media", "--batch-size", "4", *args)
+
+
+def test_csv_and_ndjson_records_are_cleaned(tmp_path):
+    path = tmp_path / "media.csv"
+    path.write_text("bildnummer,db,fotografen,datum\n7,st,IMAGO / Simon,\n")
+    assert list(read_records(str(path))) == [{"bildnummer": 7, "db": "st", "fotografen": "IMAGO / Simon"}]
+    assert [number for number, _ in numbered_batches(range(10), 3, skip={1})] == [0, 2, 3]
+
+
+def test_record_without_bildnummer_stops_the_load_at_its_line(cluster, tmp_path):
+    path = tmp_path / "media.ndjson"
+    path.write_text('{"bildnummer": "1", "db": "st"}\n\n{"db": "st", "suchtext": "Ohne Nummer"}\n')
+    with pytest.raises(CommandError, match=r"line 3: missing bildnummer\. Progress is saved"):
+        load(path)
+
+    path = tmp_path / "media.csv"
+    path.write_text("bildnummer,db\n1,st\nx,st\n")
+    with pytest.raises(CommandError, match=r"line 3: bildnummer is not a number: 'x'"):
+        load(path, "--checkpoint", str(tmp_path / "csv.checkpoint.json"))
+
+
+def test_load_fills_a_new_index_then_swaps_the_alias(cluster, records, capsys):
+    generation = get_index_generation()
+    load(records, "--workers", "3")
+    index = cluster.new_index
+
+    assert index.startswith("media-")
+    assert len(cluster.docs[index]) == 25
+    assert cluster.docs[index]["st-25"] == {"bildnummer": 25, "db": "st", "suchtext": "Bild 25"}
+    assert cluster.bulk_calls == 7
+
+    # Bulk-friendly settings during the load, the old index's ones after
+    assert cluster.settings[index] == {"refresh_interval": "1s", "number_of_replicas": "2"}
+    assert cluster.refreshed == [index]
+    assert cluster.alias_calls == [[
+        {"remove": {"index": "media-old", "alias": "media"}},
+        {"add": {"index": index, "alias": "media"}},
+    ]]
+    assert "docs/s" in capsys.readouterr().out
+    template = cluster.templates["media-template"]
+    assert template["index_patterns"] == ["media-*"]
+    assert template["template"]["settings"]["index"]["sort"] == INDEX_SORT
+    assert not (records.parent / "media.ndjson.checkpoint.json").exists()
+    assert get_index_generation() > generation
+
+
+def test_crashed_load_resumes_where_it_stopped(cluster, records):
+    cluster.fail_on_call = 4
+    with pytest.raises(CommandError, match="--resume"):
+        load(records, "--workers", "1")
+    index = cluster.new_index
+    assert cluster.aliases["media-old"] == {"media"}
+    checkpoint = json.loads((records.parent / "media.ndjson.checkpoint.json").read_text())
+    # The batch read ahead may have finished after the failed one
+    assert checkpoint["done"] in ([0, 1, 2], [0, 1, 2, 4])
+
+    with pytest.raises(CommandError, match="unfinished load"):
+        load(records)
+
+    cluster.bulk_calls, cluster.fail_on_call = 0, None
+    load(records, "--resume", "--delete-old")
+    assert cluster.bulk_calls == 7 - len(checkpoint["done"])
+    assert list(cluster.docs) == [index]
+    assert len(cluster.docs[index]) == 25
+    assert cluster.aliases[index] == {"media"}
+
+
+def test_template_is_only_replaced_by_a_newer_version(cluster, capsys):
+    call_command("install_index_template", "--alias", "media")
+    cluster.templates["media-template"]["priority"] = 1
+    call_command("install_index_template", "--alias", "media")
+    assert cluster.templates["media-template"]["priority"] == 1
+    assert "up to date" in capsys.readouterr().out
+
+    call_command("install_index_template", "--alias", "media", "--force")
+    template = cluster.templates["media-template"]
+    assert (template["priority"], template["version"]) == (100, TEMPLATE_VERSION)
+    properties = template["template"]["mappings"]["properties"]
+    assert {field: properties[field]["type"] for field in ("fotografen", "db", "datum", "bildnummer", "suchtext")} == {
+        "fotografen": "keyword", "db": "keyword", "datum": "date", "bildnummer": "long", "suchtext": "text",
+    }
+
+
+def test_id_template_must_tell_dbs_apart(cluster, records):
+    with pytest.raises(CommandError, match="must use"):
+        load(records, "--id-template", "{bildnummer}")
+    assert list(cluster.docs) == ["media-old"]
+
+
+def test_resume_refuses_a_checkpoint_of_another_file(cluster, records, tmp_path):
+    cluster.fail_on_call = 2
+    with pytest.raises(CommandError, match="--resume"):
+        load(records, "--workers", "1")
+
+    other = tmp_path / "other.ndjson"
+    other.write_text(records.read_text())
+    checkpoint = str(records.parent / "media.ndjson.checkpoint.json")
+    with pytest.raises(CommandError, match="records a load of .*media.ndjson, not .*other.ndjson"):
+        load(other, "--resume", "--checkpoint", checkpoint)
+
+
+def test_failed_alias_swap_can_be_resumed(cluster, records, monkeypatch):
+    def node_went_away(actions):
+        raise ConnectionError("node went away")
+
+    monkeypatch.setattr(cluster.indices, "update_aliases", node_went_away)
+    with pytest.raises(CommandError, match=r"Finishing media-.* failed: .*rerun with --resume"):
+        load(records)
+    assert cluster.aliases["media-old"] == {"media"}
+
+    monkeypatch.delattr(cluster.indices, "update_aliases")
+    cluster.bulk_calls = 0
+    load(records, "--resume")
+    assert cluster.bulk_calls == 0
+    assert cluster.aliases[cluster.new_index] == {"media"}
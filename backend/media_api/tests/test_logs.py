@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from media_api.logs import JsonFormatter, QueueingHandler, SamplingFilter, slow_query_logger
+
+
+class ListHandler(logging.Handler):
+    """Keeps rendered messages and the thread that rendered each one."""
+
+    def __init__(self, gate=None):
+        super().__init__()
+        self.lines = []
+        self.gate = gate
+
+    def emit(self, record):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.lines.append((self.format(record), threading.current_thread()))
+
+
+def make_record(message, *args, level=logging.INFO):
+    return logging.LogRecord("media_api.test", level, __file__, 1, message, args, None)
+
+
+def test_records_are_rendered_on_the_writer_thread():
+    class Query(dict):
+        rendered_on = None
+
+        def __repr__(self):
+            Query.rendered_on = threading.current_thread()
+            return "query"
+
+    target = ListHandler()
+    handler = QueueingHandler([target])
+    handler.handle(make_record("ES Query: %r", Query()))
+    handler.close()
+
+    assert [line for line, _ in target.lines] == ["ES Query: query"]
+    assert Query.rendered_on is target.lines[0][1] is not threading.current_thread()
+
+
+def test_full_queue_drops_instead_of_blocking():
+    gate = threading.Event()
+    target = ListHandler(gate)
+    handler = QueueingHandler([target], queue_size=2)
+    for n in range(6):
+        handler.handle(make_record("record %d", n))
+
+    # One record is held by the blocked writer, two wait in the queue
+    assert handler.stats()["dropped"] >= 3
+    gate.set()
+    handler.close()
+    assert len(target.lines) + handler.dropped == 6
+
+
+def test_a_forked_worker_starts_its_own_writer():
+    target = ListHandler()
+    handler = QueueingHandler([target])
+    handler.handle(make_record("parent"))
+    parent_listener = handler.listener
+    handler._pid = -1  # as seen from a forked child
+
+    handler.handle(make_record("child"))
+    handler.close()
+    parent_listener.stop()
+
+    assert handler.listener is None
+    assert sorted(line for line, _ in target.lines) == ["child", "parent"]
+
+
+def test_sampling_keeps_warnings(settings):
+    sampled = SamplingFilter()
+    settings.MEDIA_SEARCH_LOGGING = {"INFO_SAMPLE_RATE": 0.0}
+    assert not sampled.filter(make_record("plan"))
+    assert sampled.filter(make_record("trouble", level=logging.WARNING))
+
+    settings.MEDIA_SEARCH_LOGGING = {"INFO_SAMPLE_RATE": 0.25}
+    kept = sum(sampled.filter(make_record("plan")) for _ in range(4000))
+    assert 800 < kept < 1200
+
+
+@pytest.fixture
+def slow_queries(caplog):
+    # The slow-query logger does not propagate to caplog's root handler
+    slow_query_logger.addHandler(caplog.handler)
+    yield caplog
+    slow_query_logger.removeHandler(caplog.handler)
+
+
+@pytest.mark.django_db
+def test_slow_search_is_logged_as_json(fake_es, settings, slow_queries):
+    settings.MEDIA_SEARCH_LOGGING = {"SLOW_QUERY_THRESHOLD": 0}
+    APIClient().get(reverse("media_search"), {"q": "Berlin", "page_size": 5})
+
+    [record] = [record for record in slow_queries.records if record.name == "media_api.slow_queries"]
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"].startswith("Slow search: /api/media/search/ took")
+    assert entry["query"]["q"] == "berlin"
+    assert entry["query"]["page_size"] == 5
+    assert (entry["query_type"], entry["status"], entry["hits"]) == ("text", 200, 5)
+    assert entry["count"] > 5
+    assert entry["es_took_ms"] is not None and entry["total_ms"] >= entry["es_ms"]
+
+
+@pytest.mark.django_db
+def test_fast_searches_are_not_logged(fake_es, settings, slow_queries):
+    settings.MEDIA_SEARCH_LOGGING = {"SLOW_QUERY_THRESHOLD": 60}
+    APIClient().get(reverse("media_search"), {"q": "Berlin"})
+
+    settings.MEDIA_SEARCH_LOGGING = {"SLOW_QUERY_THRESHOLD": None}
+    APIClient().get(reverse("media_search"), {"q": "Berlin"})
+
+    assert not [record for record in slow_queries.records if record.name == "media_api.slow_queries"]
+
+
+def test_es_client_imports_without_django_settings():
+    # Standalone scripts (the benchmarks) use es_client without configuring Django
+    env = {name: value for name, value in os.environ.items() if name != "DJANGO_SETTINGS_MODULE"}
+    result = subprocess.run(
+        [sys.executable, "-c", "from media_api import es_client"],
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
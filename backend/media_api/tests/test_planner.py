@@ -0,0 +1,82 @@
+import logging
+from datetime import date
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from media_api import es_client, search_utils
+from media_api.planner import (
+    BILDNUMMER_SORT,
+    FILTER_ONLY,
+    ID_LOOKUP,
+    RELEVANCE,
+    TEXT,
+    TEXT_FILTERS,
+    plan_query,
+)
+
+BERLIN = {"multi_match": {"query": "Berlin", "fields": ["suchtext^3", "fotografen"]}}
+IN_2020 = {"range": {"datum": {"gte": date(2020, 1, 1), "lte": date(2020, 12, 31)}}}
+
+
+@pytest.mark.parametrize("search, kind, query", [
+    (dict(), FILTER_ONLY, {"match_all": {}}),
+    (dict(query="*"), FILTER_ONLY, {"match_all": {}}),
+    (dict(datum_von=date(2020, 1, 1), datum_bis=date(2020, 12, 31)), FILTER_ONLY, {"constant_score": {"filter": IN_2020}}),
+    (dict(query="Berlin", bildnummer="42"), ID_LOOKUP, {"constant_score": {"filter": {"term": {"bildnummer": 42}}}}),
+    (dict(query="Berlin"), TEXT, {"constant_score": {"filter": BERLIN}}),
+    (
+        dict(query="Berlin", fotografen=["IMAGO / Simon"], datum_von=date(2020, 1, 1), datum_bis=date(2020, 12, 31)),
+        TEXT_FILTERS,
+        {"constant_score": {"filter": {"bool": {"filter": [
+            {"term": {"fotografen": "IMAGO / Simon"}}, IN_2020, BERLIN,
+        ]}}}},
+    ),
+])
+def test_every_class_gets_non_scoring_dsl(search, kind, query):
+    plan = plan_query(**search)
+    assert (plan.kind, plan.scored, plan.query, plan.sort) == (kind, False, query, BILDNUMMER_SORT)
+
+    body = es_client.build_search_body(**search)
+    assert body["query"] == query
+    assert body["track_scores"] is False
+
+
+def test_relevance_mode_scores_text_only():
+    plan = plan_query(query="Berlin", fotografen=["IMAGO / Simon"], sort=RELEVANCE)
+    assert plan.scored
+    assert plan.query == {"bool": {"must": [BERLIN], "filter": [{"term": {"fotografen": "IMAGO / Simon"}}]}}
+    assert plan.sort[0] == {"_score": "desc"}
+    assert "track_scores" not in es_client.build_search_body(query="Berlin", sort=RELEVANCE)
+
+    assert not plan_query(fotografen=["IMAGO / Simon"], sort=RELEVANCE).scored
+
+
+def test_plan_is_logged(caplog):
+    with caplog.at_level(logging.DEBUG, logger="media_api.planner"):
+        plan_query(datum_von=date(2020, 1, 1), sort=RELEVANCE)
+    assert caplog.messages == [
+        "Query plan: kind=filter_only scored=False sort=bildnummer clauses=1 "
+        "(relevance requested without text; nothing to score)"
+    ]
+
+
+def test_relevance_ranks_by_score(fake_es):
+    ranked = search_utils.execute_media_search(query="Berlin Tor", sort=RELEVANCE, page_size=50)
+    by_number = search_utils.execute_media_search(query="Berlin Tor", page_size=50)
+
+    assert ranked["count"] == by_number["count"]
+    assert ranked["results"] != by_number["results"]
+
+
+@pytest.mark.django_db
+def test_search_view_accepts_sort(fake_es):
+    client = APIClient()
+    url = reverse("media_search")
+    assert client.get(url, {"q": "Berlin", "sort": "relevance"}).status_code == 200
+    assert client.get(url, {"q": "Berlin", "sort": "bildnummer"}).status_code == 200
+    assert client.get(url, {"q": "Berlin", "sort": "newest"}).status_code == 400
+    response = client.get(url, {"q": "Berlin", "sort": "relevance", "cursor": "start"})
+    assert response.status_code == 400
+    assert "bildnummer order" in response.data["error"]
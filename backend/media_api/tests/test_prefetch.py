@@ -0,0 +1,77 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from media_api import prefetch, search_utils
+from media_api.breaker import OPEN
+from media_api.prefetch import DEFAULT_PREFETCH_SETTINGS, prefetch_events, prefetcher
+
+
+@pytest.fixture
+def prefetch_on(settings):
+    settings.MEDIA_SEARCH_PREFETCH = {**DEFAULT_PREFETCH_SETTINGS, "ENABLED": True}
+    prefetch_events.reset()
+    prefetcher._latency = 0.0
+    yield settings.MEDIA_SEARCH_PREFETCH
+    wait_for_prefetches()
+
+
+def wait_for_prefetches(timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while prefetcher._pending and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert prefetcher._pending == 0
+
+
+def test_next_page_is_served_from_the_prefetch(fake_es, prefetch_on):
+    first = search_utils.execute_media_search(query="Barcelona")
+    wait_for_prefetches()
+    assert fake_es.calls["search"] == 2
+
+    # Both ways of asking for page 2 find it cached, and the prefetched
+    # search did not schedule page 3 by itself
+    by_cursor = search_utils.execute_media_search(
+        query="Barcelona", page=2, search_after=first["next_search_after"]
+    )
+    wait_for_prefetches()
+    by_number = search_utils.execute_media_search(query="Barcelona", page=2)
+    assert by_cursor == by_number
+    assert by_cursor["page"] == 2
+    assert by_cursor["results"][0] != first["results"][0]
+
+    # Serving page 2 queued page 3
+    wait_for_prefetches()
+    assert fake_es.calls["search"] == 3
+
+    stats = prefetcher.stats()
+    assert stats["stored"] == 2
+    assert stats["hit"] == 2
+    assert stats["hit_rate"] == 1.0
+
+
+def test_prefetch_is_off_by_default(fake_es):
+    search_utils.execute_media_search(query="Barcelona")
+    assert prefetcher._pending == 0
+    assert fake_es.calls["search"] == 1
+
+
+def test_last_page_is_not_prefetched(fake_es, prefetch_on):
+    search_utils.execute_media_search(query="Barcelona", page_size=100, page=100)
+    assert prefetch_events.value(("scheduled",)) == 0
+
+
+def test_busy_cluster_gets_no_prefetch(fake_es, prefetch_on, monkeypatch):
+    prefetch_on["BUSY_LATENCY"] = 0.0
+    search_utils.execute_media_search(query="Barcelona")
+    assert prefetch_events.value(("skipped_busy",)) == 1
+
+    prefetch_on.update(BUSY_LATENCY=DEFAULT_PREFETCH_SETTINGS["BUSY_LATENCY"], MAX_PENDING=0)
+    search_utils.execute_media_search(query="Madrid")
+    assert prefetch_events.value(("skipped_budget",)) == 1
+
+    prefetch_on["MAX_PENDING"] = 4
+    monkeypatch.setattr(prefetch, "es_breaker", SimpleNamespace(state=OPEN))
+    search_utils.execute_media_search(query="Berlin")
+    assert prefetch_events.value(("skipped_busy",)) == 2
+    assert fake_es.calls["search"] == 3
@@ -0,0 +1,85 @@
+import copy
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from media_api import es_client, renderers, search_utils
+
+
+PAYLOAD = {
+    "count": 2,
+    "results": [{"bildnummer": "1", "suchtext": "Zürich – Fußball", "datum": date(2020, 1, 1)}],
+    "ratio": Decimal("0.5"),
+    "next_search_after": [1, "st"],
+}
+
+
+def test_fast_renderer_matches_drf_output():
+    assert renderers.FastJSONRenderer().render(PAYLOAD) == JSONRenderer().render(PAYLOAD)
+
+
+def test_stdlib_fallback_matches(monkeypatch):
+    monkeypatch.setattr(renderers, "orjson", None)
+    assert renderers.dumps(PAYLOAD) == JSONRenderer().render(PAYLOAD)
+
+
+@pytest.mark.parametrize("encoder", ["orjson", "stdlib"])
+def test_line_separators_are_escaped_like_drf(encoder, monkeypatch):
+    if encoder == "stdlib":
+        monkeypatch.setattr(renderers, "orjson", None)
+    payload = {"suchtext": "Zeile\u2028Absatz\u2029Ende"}
+    assert renderers.dumps(payload) == JSONRenderer().render(payload) == b'{"suchtext":"Zeile\\u2028Absatz\\u2029Ende"}'
+
+
+def test_integers_beyond_64_bits_fall_back_to_stdlib():
+    assert renderers.dumps({"n": 2 ** 70}) == b'{"n":%d}' % 2 ** 70
+
+
+def test_indented_output_goes_through_drf():
+    rendered = renderers.FastJSONRenderer().render(
+        {"a": 1}, "application/json; indent=2", {}
+    )
+    assert rendered == b'{\n  "a": 1\n}'
+
+
+def test_normalize_hits_matches_normalize_hit_without_copying():
+    hits = [
+        {"_source": {"bildnummer": "42", "db": "sp"}},
+        {"_source": {"bildnummer": 7}},
+        {"_source": {"db": "st"}},
+        {},
+    ]
+    expected = [es_client.normalize_hit(hit) for hit in copy.deepcopy(hits)]
+
+    results = es_client.normalize_hits(hits)
+
+    assert results == expected
+    assert results[0] is hits[0]["_source"]
+    assert results[1]["thumbnail_url"].endswith("/st/0000000007/s.jpg")
+
+
+@pytest.mark.django_db
+def test_search_endpoint_renders_with_fast_renderer(monkeypatch):
+    monkeypatch.setattr(
+        search_utils, "fetch_media",
+        lambda **kwargs: ([{"_source": {"bildnummer": "1", "db": "st", "suchtext": "Zürich"}, "sort": [1, "st"]}], 1)
+    )
+    response = APIClient().get(reverse("media_search"), {"q": "Zürich"})
+
+    assert response.status_code == 200
+    assert response.content.startswith(b'{"count":1,')
+    assert "Zürich".encode() in response.content
+
+
+@pytest.mark.django_db
+def test_only_search_endpoints_use_fast_renderer():
+    client = APIClient()
+    search = client.get(reverse("media_search_facets"), {"page_size": "abc"})
+    assert isinstance(search.accepted_renderer, renderers.FastJSONRenderer)
+
+    stats = client.get(reverse("media_search_cache_stats"))
+    assert type(stats.accepted_renderer) is JSONRenderer
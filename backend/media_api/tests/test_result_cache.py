@@ -0,0 +1,88 @@
+from datetime import date
+
+import pytest
+from django.core.cache import cache
+
+from media_api import search_utils
+from media_api.cache import (
+    LocalLRUCache,
+    bump_index_generation,
+    canonical_query,
+    result_cache,
+)
+
+
+def test_canonical_query_normalizes_equivalent_requests():
+    a = canonical_query(query="  Barcelona ", fotografen=["b", "a"], datum_von=date(2020, 1, 1))
+    b = canonical_query(query="barcelona", fotografen=["a", "b"], datum_von="2020-01-01")
+    assert a == b
+
+
+def test_canonical_query_distinguishes_pages_and_search_after():
+    assert canonical_query(query="x", page=1) != canonical_query(query="x", page=2)
+    assert canonical_query(query="x", search_after=[1, "st"]) != canonical_query(query="x")
+
+
+def test_local_lru_evicts_oldest_entry():
+    lru = LocalLRUCache(maxsize=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    assert lru.get("a") == 1
+    assert lru.get("b") is None
+    assert lru.get("c") == 3
+
+
+def test_local_lru_expires_entries():
+    lru = LocalLRUCache(maxsize=2, ttl=0)
+    lru.set("a", 1, ttl=-1)
+    assert lru.get("a") is None
+
+
+def test_repeated_search_is_served_from_cache(es_calls):
+    result_cache.reset_stats()
+    first = search_utils.execute_media_search(query="Barcelona", page=1)
+    second = search_utils.execute_media_search(query=" barcelona", page=1)
+
+    assert len(es_calls) == 1
+    assert first == second
+    stats = result_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["local_hits"] == 1
+
+
+def test_bumping_generation_invalidates_cached_results(es_calls):
+    search_utils.execute_media_search(query="Barcelona")
+    bump_index_generation()
+    search_utils.execute_media_search(query="Barcelona")
+    assert len(es_calls) == 2
+
+
+def test_failed_search_is_not_cached(monkeypatch):
+    calls = []
+
+    def failing_fetch_media(**kwargs):
+        calls.append(kwargs)
+        raise search_utils.ConnectionError("down")
+
+    monkeypatch.setattr(search_utils, "fetch_media", failing_fetch_media)
+    for _ in range(2):
+        with pytest.raises(search_utils.SearchUnavailable):
+            search_utils.execute_media_search(query="Barcelona")
+    assert len(calls) == 2
+
+
+def test_stale_copies_stay_out_of_a_small_shared_cache(es_calls, settings):
+    search_utils.execute_media_search(query="Barcelona")
+    key = search_utils.result_cache_key(query="Barcelona", page=1, page_size=10)
+
+    # The test backend is Django's default LocMemCache with 300 entries
+    assert cache.get(f"{key}:stale") is None
+    assert result_cache.get_stale(key)["count"] == 2
+
+    settings.MEDIA_SEARCH_CACHE = {"STALE_MIN_SHARED_ENTRIES": 300}
+    search_utils.execute_media_search(query="Madrid")
+    key = search_utils.result_cache_key(query="Madrid", page=1, page_size=10)
+    assert cache.get(f"{key}:stale")["count"] == 2
+    assert result_cache.stats()["stale_local_size"] == 1
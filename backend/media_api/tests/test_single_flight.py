@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+
+from media_api import search_utils
+from media_api.cache import result_cache
+from media_api.singleflight import SingleFlight, es_calls_avoided
+from media_api.timing import expose_metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_counter():
+    es_calls_avoided.reset()
+    yield
+    es_calls_avoided.reset()
+
+
+@pytest.fixture
+def slow_fetch(es_calls):
+    release = threading.Event()
+    respond = es_calls.respond
+
+    def slow_respond(**kwargs):
+        release.wait(2)
+        return respond(**kwargs)
+
+    es_calls.respond = slow_respond
+    return es_calls, release
+
+
+def run_concurrently(count, target):
+    results = [None] * count
+
+    def worker(index):
+        results[index] = target()
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+@pytest.mark.parametrize("cache_enabled", [True, False])
+def test_concurrent_identical_searches_share_one_es_call(slow_fetch, settings, cache_enabled):
+    settings.MEDIA_SEARCH_CACHE = {**settings.MEDIA_SEARCH_CACHE, "ENABLED": cache_enabled}
+    calls, release = slow_fetch
+
+    threads, results = run_concurrently(8, lambda: search_utils.execute_media_search(query="Barcelona"))
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result == results[0] for result in results)
+    assert results[0]["count"] == 2
+    assert es_calls_avoided.value(("worker",)) == 7
+    assert 'media_search_es_calls_avoided_total{scope="worker"} 7' in expose_metrics()
+
+
+def test_different_queries_are_not_coalesced(slow_fetch):
+    calls, release = slow_fetch
+    queries = iter(["Barcelona", "Madrid"])
+    threads, _ = run_concurrently(2, lambda: search_utils.execute_media_search(query=next(queries)))
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 2
+    assert es_calls_avoided.value(("worker",)) == 0
+
+
+def test_followers_retry_when_the_leader_raises():
+    flight = SingleFlight()
+    started = threading.Event()
+    calls = []
+
+    def failing():
+        calls.append("leader")
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+
+    errors = []
+
+    def leader():
+        try:
+            flight.run("k", failing)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait(1)
+    assert flight.run("k", lambda: "own result") == "own result"
+    thread.join()
+    assert len(errors) == 1
+    assert es_calls_avoided.value(("worker",)) == 0
+
+
+def test_waits_for_another_workers_result_through_the_shared_cache():
+    flight = SingleFlight()
+    # Another worker holds the lock and publishes its result shortly after
+    cache.add("shared-key:flight", 1, timeout=10)
+    threading.Timer(0.05, cache.set, args=("shared-key", {"total": 5})).start()
+
+    result = flight.run("shared-key", lambda: pytest.fail("should not search"),
+                        lambda: cache.get("shared-key"))
+
+    assert result == {"total": 5}
+    assert es_calls_avoided.value(("shared",)) == 1
+
+
+def test_searches_itself_when_the_other_worker_gives_up():
+    flight = SingleFlight()
+    cache.add("shared-key:flight", 1, timeout=10)
+    threading.Timer(0.05, cache.delete, args=("shared-key:flight",)).start()
+
+    assert flight.run("shared-key", lambda: "own result", lambda: None) == "own result"
+    assert es_calls_avoided.value(("shared",)) == 0
+
+
+def test_lock_is_released_after_the_search(slow_fetch):
+    calls, release = slow_fetch
+    release.set()
+    search_utils.execute_media_search(query="Barcelona")
+    key = search_utils.result_cache_key(**search_utils_kwargs("Barcelona"))
+    assert cache.get(f"{key}:flight") is None
+    assert result_cache.peek(key)["count"] == 2
+
+
+def search_utils_kwargs(query):
+    return dict(query=query, page=1, page_size=10, fotografen=None, datum_von=None, datum_bis=None,
+                bildnummer=None, search_after=None, fields=None, count_mode=None)
+
+
+def test_disabled_runs_every_search(slow_fetch, settings):
+    settings.MEDIA_SEARCH_SINGLE_FLIGHT = {"ENABLED": False}
+    settings.MEDIA_SEARCH_CACHE = {**settings.MEDIA_SEARCH_CACHE, "ENABLED": False}
+    calls, release = slow_fetch
+    release.set()
+    threads, _ = run_concurrently(3, lambda: search_utils.execute_media_search(query="Barcelona"))
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 3
+
+
+def test_async_identical_searches_share_one_es_call(es_calls):
+    async def main():
+        return await asyncio.gather(*(
+            search_utils.aexecute_media_search(query="Barcelona") for _ in range(5)
+        ))
+
+    results = asyncio.run(main())
+    assert len(es_calls) == 1
+    assert all(result["count"] == 2 for result in results)
+    assert es_calls_avoided.value(("worker",)) == 4
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+
+from media_api.throttling import SlidingWindowAnonThrottle
+
+
+@pytest.fixture
+def throttle(monkeypatch):
+    monkeypatch.setattr(SlidingWindowAnonThrottle, "THROTTLE_RATES", {"anon": "10/minute"})
+    return SlidingWindowAnonThrottle()
+
+
+def request_from(ip):
+    return SimpleNamespace(user=AnonymousUser(), META={"REMOTE_ADDR": ip})
+
+
+def send(throttle, at, count=1, ip="10.0.0.1"):
+    throttle.timer = lambda: at
+    return [throttle.allow_request(request_from(ip), None) for _ in range(count)]
+
+
+def test_state_is_two_counters_whatever_the_rate(throttle):
+    assert send(throttle, 600.0, 10) == [True] * 10
+    assert send(throttle, 601.0) == [False]
+    # Rejected requests don't use up the quota
+    assert cache.get(f"{throttle.key}:10") == 10
+    assert send(throttle, 601.0, ip="10.0.0.2") == [True]
+
+
+def test_previous_window_decays_over_the_current_one(throttle):
+    send(throttle, 659.0, 10)
+
+    # At 25% into the next window, 75% of the previous one still counts
+    assert send(throttle, 675.0, 3) == [True, True, False]
+    assert throttle.wait() == pytest.approx(3.0)
+
+    # Halfway through the window after, those two count as one
+    assert send(throttle, 750.0, 10) == [True] * 9 + [False]
+
+
+def test_wait_spans_into_the_next_window(throttle):
+    assert send(throttle, 600.0, 11)[-1] is False
+    assert throttle.wait() == pytest.approx(60.0 + 6.0)
+
+
+def test_authenticated_users_are_not_throttled(throttle):
+    user = SimpleNamespace(user=SimpleNamespace(is_authenticated=True), META={})
+    assert all(throttle.allow_request(user, None) for _ in range(20))
+
+
+def test_views_can_charge_several_requests_at_once(throttle):
+    batch = SimpleNamespace(throttle_cost=lambda request: 4)
+    throttle.timer = lambda: 600.0
+
+    assert [throttle.allow_request(request_from("10.0.0.1"), batch) for _ in range(3)] == [True, True, False]
+    # The rejected batch is not charged; two single requests still fit
+    assert cache.get(f"{throttle.key}:10") == 8
+    assert send(throttle, 600.0, 3) == [True, True, False]
@@ -0,0 +1,132 @@
+import string
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from media_api import suggest
+from media_api.suggest import PrefixIndex, Suggester, frequent_terms
+
+PHOTOGRAPHERS = [
+    ("IMAGO / Sven Simon", 40),
+    ("IMAGO / Simon Wagner", 5),
+    ("IMAGO / Schmidt", 12),
+    ("Sport Images", 7),
+]
+
+
+def test_prefix_matches_any_word_most_frequent_first():
+    index = PrefixIndex(PHOTOGRAPHERS)
+
+    assert index.complete("sim") == [("IMAGO / Sven Simon", 40), ("IMAGO / Simon Wagner", 5)]
+    assert index.complete("SVEN SI") == [("IMAGO / Sven Simon", 40)]
+    assert index.complete("imago", limit=2) == [("IMAGO / Sven Simon", 40), ("IMAGO / Schmidt", 12)]
+    assert index.complete("x") == []
+    assert index.complete("  ") == []
+
+
+def test_precomputed_short_prefixes_match_the_bisect_path():
+    values = [(f"{a}{b}{c} Name", (ord(a) * 7 + ord(c)) % 11) for a in "abc" for b in "xyz" for c in "pq"]
+    precomputed = PrefixIndex(values)
+    bisect_only = PrefixIndex(values, precomputed_length=0)
+
+    for prefix in list(string.ascii_lowercase) + ["ax", "by", "cz", "na", "nam"]:
+        assert precomputed.complete(prefix, 5) == bisect_only.complete(prefix, 5)
+
+
+def test_frequent_terms_skip_stopwords_numbers_and_short_words():
+    terms = frequent_terms(["Jubel der Fans im Stadion", "Fans und Jubel 2024", "Fans"], min_length=3)
+    assert terms == [("fans", 3), ("jubel", 2), ("stadion", 1)]
+
+
+def test_suggester_serves_keystrokes_from_memory(fake_es):
+    suggester = Suggester()
+    first = suggester.suggest("Muel")
+    searches = fake_es.calls["search"]
+
+    assert first["fotografen"]
+    assert all("Mueller" in item["value"] for item in first["fotografen"])
+    counts = [item["count"] for item in first["fotografen"]]
+    assert counts == sorted(counts, reverse=True)
+    assert suggester.suggest("Muen")["terms"][0]["value"].startswith("muenchen")
+
+    for prefix in ("M", "Mu", "Mue", "Muell", "Mueller 0"):
+        suggester.suggest(prefix)
+    assert fake_es.calls["search"] == searches == 1
+
+    # Another worker reuses the counts from the shared cache
+    Suggester().suggest("Fus")
+    assert fake_es.calls["search"] == 1
+
+
+def test_failed_refresh_keeps_the_previous_index(fake_es, monkeypatch):
+    suggester = Suggester()
+    suggester.suggest("Koch")
+    cache.clear()
+
+    def failing(*args):
+        raise RuntimeError("down")
+
+    monkeypatch.setattr(suggest, "fetch_suggest_sources", failing)
+    assert suggester.refresh() is False
+    assert suggester.suggest("Koch")["fotografen"]
+
+
+def test_es_down_on_first_use_gives_empty_suggestions(monkeypatch):
+    def failing(*args):
+        raise RuntimeError("down")
+
+    monkeypatch.setattr(suggest, "fetch_suggest_sources", failing)
+    assert Suggester().suggest("Koch") == {"fotografen": [], "terms": []}
+
+
+def test_failed_builds_are_retried_with_backoff(fake_es, monkeypatch, settings):
+    settings.MEDIA_SEARCH_SUGGEST = {"REFRESH_INTERVAL": 60, "RETRY_MIN_INTERVAL": 5}
+    fetch = suggest.fetch_suggest_sources
+
+    def failing(*args):
+        raise RuntimeError("down")
+
+    monkeypatch.setattr(suggest, "fetch_suggest_sources", failing)
+    suggester = Suggester()
+    delays = []
+    for _ in range(5):
+        suggester.refresh()
+        delays.append(suggester.next_delay())
+    assert delays == [5, 10, 20, 40, 60]
+
+    monkeypatch.setattr(suggest, "fetch_suggest_sources", fetch)
+    assert suggester.refresh() is True
+    assert suggester.next_delay() == 60
+    assert suggester.suggest("Koch")["fotografen"]
+
+
+def test_shared_counts_expire_before_the_next_refresh(fake_es, monkeypatch, settings):
+    settings.MEDIA_SEARCH_SUGGEST = {"REFRESH_INTERVAL": 300}
+    timeouts = []
+    set_cache = cache.set
+
+    def recording_set(key, value, timeout):
+        timeouts.append(timeout)
+        set_cache(key, value, timeout)
+
+    monkeypatch.setattr(suggest.shared_cache, "set", recording_set)
+
+    Suggester().refresh()
+    assert timeouts == [150]
+
+
+@pytest.mark.django_db
+def test_suggest_endpoint(fake_es):
+    suggest.suggester.clear()
+    client = APIClient()
+    url = reverse("media_search_suggest")
+
+    response = client.get(url, {"q": "Wag", "limit": 3})
+    assert response.status_code == 200
+    assert response.data["q"] == "Wag"
+    assert 0 < len(response.data["fotografen"]) <= 3
+    assert client.get(url, {"q": "Wag", "limit": 0}).status_code == 400
+    assert client.get(url, {"q": "Wag", "limit": "x"}).status_code == 400
+    assert client.get(url).data == {"q": "", "fotografen": [], "terms": []}
@@ -13,7 +13,7 @@ THROTTLE_SETTINGS = {
 
 @pytest.mark.django_db
 @override_settings(REST_FRAMEWORK=THROTTLE_SETTINGS)
-def test_anonymous_throttle_limits_reached():
+def test_anonymous_throttle_limits_reached(fake_es):
     """
     Sends 3 requests to the media_search endpoint with a throttle limit of 2/sec.
     The third request should return 429 (Too Many Requests).
@@ -0,0 +1,79 @@
+from datetime import date
+
+import pytest
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from media_api import timing
+
+
+@pytest.fixture(autouse=True)
+def fresh_histograms():
+    timing.phase_histogram.reset()
+    yield
+    timing.phase_histogram.reset()
+
+
+def server_timing(response):
+    entries = [entry.split(";dur=") for entry in response["Server-Timing"].split(", ")]
+    return {name: float(duration) for name, duration in entries}
+
+
+@pytest.mark.django_db
+def test_search_reports_phases_in_server_timing(fake_es):
+    response = APIClient().get(reverse("media_search"), {"q": "Berlin"})
+
+    phases = server_timing(response)
+    assert {"validate", "cache", "build_query", "es", "es_took", "normalize", "render", "total"} <= set(phases)
+    assert phases["total"] >= phases["es"]
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_exposes_histograms_per_query_type(fake_es):
+    client = APIClient()
+    client.get(reverse("media_search"), {"q": "Berlin"})
+    client.get(reverse("media_search_by_fotograf"), {"fotograf": "IMAGO / Schulz 000"})
+    client.get(reverse("media_search_by_bildnummer"), {"bildnummer": "42"})
+
+    response = client.get("/metrics")
+
+    body = response.content.decode()
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE media_search_phase_seconds histogram" in body
+    assert 'media_search_phase_seconds_count{query_type="text",phase="es"} 1' in body
+    assert 'media_search_phase_seconds_count{query_type="photographer",phase="total"} 1' in body
+    assert 'media_search_phase_seconds_bucket{query_type="bildnummer",phase="total",le="+Inf"} 1' in body
+
+
+@pytest.mark.django_db
+def test_disabled_instrumentation_is_a_noop(fake_es):
+    with override_settings(MEDIA_SEARCH_METRICS={"ENABLED": False}):
+        response = APIClient().get(reverse("media_search"), {"q": "Berlin"})
+
+    assert "Server-Timing" not in response
+    assert timing.phase_histogram.snapshot() == {}
+    assert timing.phase("es") is timing._NOOP
+
+
+@pytest.mark.parametrize("kwargs, expected", [
+    (dict(bildnummer="42", query="x"), "bildnummer"),
+    (dict(query="Berlin", fotografen=["a"]), "text"),
+    (dict(query="*", fotografen=["a"]), "photographer"),
+    (dict(datum_von=date(2020, 1, 1)), "date"),
+    (dict(), "all"),
+])
+def test_query_type(kwargs, expected):
+    assert timing.query_type(**kwargs) == expected
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = timing.Histogram("h", "doc", ("phase",), (0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(("es",), value)
+
+    lines = histogram.expose().splitlines()
+    assert 'h_bucket{phase="es",le="0.1"} 1' in lines
+    assert 'h_bucket{phase="es",le="1.0"} 2' in lines
+    assert 'h_bucket{phase="es",le="+Inf"} 3' in lines
+    assert 'h_count{phase="es"} 3' in lines
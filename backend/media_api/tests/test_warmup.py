@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from media_api import es_client, views, warmup
+from media_api.warmup import PENDING, READY, RUNNING, Warmer
+
+
+class PoolingClient:
+    """Serves searches from the fake corpus and tracks concurrent pings."""
+
+    def __init__(self, store, up=True):
+        self.store = store
+        self.up = up
+        self.active = self.peak = 0
+        self.lock = threading.Lock()
+
+    def ping(self):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        return self.up
+
+    def search(self, **kwargs):
+        return self.store.search(**kwargs)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def warmer(monkeypatch):
+    """A fresh, never-started Warmer behind the ready view."""
+    fresh = Warmer()
+    monkeypatch.setattr(views, "warmer", fresh)
+    return fresh
+
+
+def test_client_is_built_on_first_use(monkeypatch):
+    built = []
+    monkeypatch.setattr(es_client, "es", None)
+    monkeypatch.setattr(es_client, "create_es", lambda: built.append(object()) or built[-1])
+
+    assert es_client.get_es() is es_client.get_es() is built[0]
+    assert len(built) == 1
+
+
+def test_warm_up_opens_connections_and_runs_queries(fake_es, monkeypatch, settings):
+    client = PoolingClient(fake_es)
+    monkeypatch.setattr(es_client, "es", client)
+    settings.MEDIA_SEARCH_WARMUP = {"CONNECTIONS": 4, "QUERIES": [{}, {"query": "Berlin"}]}
+
+    warmup.warm_up()
+
+    assert client.peak == 4
+    assert fake_es.calls["search"] == 2
+
+
+def test_unreachable_cluster_fails_warm_up(fake_es, monkeypatch, settings):
+    monkeypatch.setattr(es_client, "es", PoolingClient(fake_es, up=False))
+    settings.MEDIA_SEARCH_WARMUP = {"CONNECTIONS": 2}
+
+    with pytest.raises(warmup.SearchUnavailable):
+        warmup.warm_up()
+    assert fake_es.calls["search"] == 0
+
+
+@pytest.mark.django_db
+def test_ready_only_after_warm_up(warmer, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(warmup, "warm_up", lambda config: release.wait(5))
+    client = APIClient()
+
+    response = client.get(reverse("media_ready"))
+    assert response.status_code == 503
+    assert (response.data["ready"], response.data["state"]) == (False, RUNNING)
+
+    release.set()
+    wait_for(warmer.ready)
+    response = client.get(reverse("media_ready"))
+    assert response.status_code == 200
+    assert (response.data["state"], response.data["attempts"]) == (READY, 1)
+
+
+def test_failed_attempts_are_retried(warmer, monkeypatch, settings):
+    settings.MEDIA_SEARCH_WARMUP = {"RETRY_INTERVAL": 0}
+    attempts = []
+
+    def flaky(config):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise warmup.SearchUnavailable("down")
+
+    monkeypatch.setattr(warmup, "warm_up", flaky)
+    warmer.start()
+    wait_for(warmer.ready)
+
+    assert (warmer.attempts, warmer.error) == (3, None)
+
+
+@pytest.mark.django_db
+def test_disabled_warm_up_is_always_ready(warmer, settings):
+    settings.MEDIA_SEARCH_WARMUP = {"ENABLED": False}
+    assert APIClient().get(reverse("media_ready")).status_code == 200
+    assert warmer.state == PENDING
+
+
+def test_forked_worker_warms_up_again(warmer, monkeypatch):
+    monkeypatch.setattr(warmup, "warm_up", lambda config: None)
+    warmer.start()
+    wait_for(warmer.ready)
+
+    warmer._after_fork()
+
+    assert not warmer.ready() and warmer.state == PENDING
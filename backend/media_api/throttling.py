@@ -0,0 +1,83 @@
+"""
+Rate limiting with constant-size state per client.
+
+DRF's AnonRateThrottle keeps a list of one timestamp per request in the
+window: at 1000/minute that is up to 1000 floats unpickled, trimmed and
+pickled again on every request. SlidingWindowAnonThrottle keeps two
+integers per client instead, one counter per fixed window of `duration`
+seconds, and estimates the requests in the sliding window ending now as
+
+    previous * (1 - elapsed) + current
+
+where `elapsed` is the fraction of the current window already gone. The
+counter is bumped with the cache backend's atomic incr, so concurrent
+workers sharing a Redis or Memcached cache never lose an update. A request
+costs one get and one incr whatever the rate, plus a decr when rejected,
+since rejected requests don't use up the quota (as with AnonRateThrottle).
+
+It reads the same "anon" rate from DEFAULT_THROTTLE_RATES and likewise
+leaves authenticated users alone. A view that does several searches per
+request can define `throttle_cost(request)`; the request then counts as
+that many against the quota, all or nothing.
+"""
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowAnonThrottle(SimpleRateThrottle):
+    scope = "anon"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
+
+    def get_cost(self, request, view):
+        throttle_cost = getattr(view, "throttle_cost", None)
+        return throttle_cost(request) if throttle_cost is not None else 1
+
+    def _incr(self, key, cost):
+        try:
+            return self.cache.incr(key, cost)
+        except ValueError:
+            # First request of the window; both windows must outlive it
+            if self.cache.add(key, cost, timeout=2 * self.duration + 1):
+                return cost
+            return self.cache.incr(key, cost)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.cost = self.get_cost(request, view)
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.elapsed = self.now / self.duration - window
+        current_key = f"{self.key}:{window}"
+        self.previous = self.cache.get(f"{self.key}:{window - 1}", 0)
+        self.current = self._incr(current_key, self.cost)
+        if self.previous * (1 - self.elapsed) + self.current <= self.num_requests:
+            return True
+
+        try:
+            self.cache.decr(current_key, self.cost)
+        except ValueError:
+            pass
+        self.current -= self.cost
+        return False
+
+    def wait(self):
+        """Seconds until a request of the last one's cost would be let through."""
+        if self.cost > self.num_requests:
+            return None
+        remaining = self.duration * (1 - self.elapsed)
+        # The previous window's share shrinks linearly while this one runs
+        excess = self.previous * (1 - self.elapsed) + self.current + self.cost - self.num_requests
+        if self.previous and excess <= self.previous * (1 - self.elapsed):
+            return excess * self.duration / self.previous
+        # Otherwise wait for the next window, where this one's count decays
+        if self.current + self.cost <= self.num_requests:
+            return remaining
+        return remaining + self.duration * (1 - (self.num_requests - self.cost) / self.current)
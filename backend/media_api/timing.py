@@ -0,0 +1,282 @@
+"""
+Per-request phase timers for the search path.
+
+ServerTimingMiddleware starts a RequestTimer for each /api/media/ request
+when MEDIA_SEARCH_METRICS["ENABLED"] is on. Code along the request path
+wraps its work in `with phase("name"):`. The middleware then:
+- reports the phases in a Server-Timing header, and
+- records them in per-query-type latency histograms, which the /metrics
+  view exposes in the Prometheus text format, and
+- hands slow requests to the slow-query log (see logs.py).
+
+When no timer is active, phase() returns a shared no-op context manager
+after a single ContextVar lookup, so the instrumentation stays in place
+at almost no cost when disabled. Histograms are per process; with
+several workers, scrape each one or aggregate them in Prometheus.
+"""
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .logs import log_slow_query
+
+DEFAULT_METRICS_SETTINGS = {
+    "ENABLED": True,
+    "SERVER_TIMING": True,
+    "PATH_PREFIX": "/api/media/",
+}
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_current = ContextVar("media_search_timer", default=None)
+
+
+def metrics_settings():
+    configured = getattr(settings, "MEDIA_SEARCH_METRICS", {})
+    return {**DEFAULT_METRICS_SETTINGS, **configured}
+
+
+def query_type(query=None, fotografen=None, datum_von=None, datum_bis=None, bildnummer=None):
+    """The histogram label of a search: what its most selective part is."""
+    if bildnummer:
+        return "bildnummer"
+    if query and query.strip() not in ("", "*"):
+        return "text"
+    if fotografen:
+        return "photographer"
+    if datum_von or datum_bis:
+        return "date"
+    return "all"
+
+
+class RequestTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.query_type = None
+        # execute_media_search keyword arguments, for the slow-query log
+        self.search = None
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.phases.items()]
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+
+class _Phase:
+    __slots__ = ("timer", "name", "started")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.add(self.name, time.perf_counter() - self.started)
+
+
+class _NoopPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+
+_NOOP = _NoopPhase()
+
+
+def phase(name):
+    """Times the enclosed block as `name` on the current request, if any."""
+    timer = _current.get()
+    if timer is None:
+        return _NOOP
+    return _Phase(timer, name)
+
+
+def record(name, seconds):
+    """Adds a duration measured elsewhere (e.g. ES's own `took`)."""
+    timer = _current.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+def set_query_type(label):
+    timer = _current.get()
+    if timer is not None and timer.query_type is None:
+        timer.query_type = label
+
+
+def set_search(search_kwargs):
+    timer = _current.get()
+    if timer is not None and timer.search is None:
+        timer.search = search_kwargs
+
+
+def current_timer():
+    return _current.get()
+
+
+class Histogram:
+    """A labelled Prometheus-style histogram with fixed buckets."""
+
+    def __init__(self, name, documentation, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.snapshot().items()):
+            label_text = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter:
+    """A labelled Prometheus-style counter."""
+
+    def __init__(self, name, documentation, label_names):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            label_text = ",".join(f'{name}="{label}"' for name, label in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{label_text}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+phase_histogram = Histogram(
+    "media_search_phase_seconds",
+    "Time spent per phase of a search request, by query type.",
+    ("query_type", "phase"),
+    LATENCY_BUCKETS,
+)
+
+# Exposed on /metrics, in this order
+REGISTRY = [phase_histogram]
+
+
+def register(metric):
+    """Adds a metric defined elsewhere to /metrics."""
+    REGISTRY.append(metric)
+    return metric
+
+
+def observe(timer, total):
+    if timer.query_type is None:
+        return
+    for name, seconds in timer.phases.items():
+        phase_histogram.observe((timer.query_type, name), seconds)
+    phase_histogram.observe((timer.query_type, "total"), total)
+
+
+def expose_metrics():
+    return "".join(metric.expose() for metric in REGISTRY)
+
+
+class ServerTimingMiddleware:
+    """Times /api/media/ requests; works under both WSGI and ASGI."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        config = metrics_settings()
+        if not config["ENABLED"] or not request.path.startswith(config["PATH_PREFIX"]):
+            return None, None
+        timer = RequestTimer()
+        return timer, _current.set(timer)
+
+    def _finish(self, request, timer, token, response):
+        _current.reset(token)
+        total = timer.total()
+        if metrics_settings()["SERVER_TIMING"]:
+            response["Server-Timing"] = timer.server_timing(total)
+        observe(timer, total)
+        log_slow_query(request, response, timer, total)
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timer, token = self._start(request)
+        if timer is None:
+            return self.get_response(request)
+        return self._finish(request, timer, token, self.get_response(request))
+
+    async def __acall__(self, request):
+        timer, token = self._start(request)
+        if timer is None:
+            return await self.get_response(request)
+        return self._finish(request, timer, token, await self.get_response(request))
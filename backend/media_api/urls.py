@@ -1,14 +1,48 @@
+import os
+
 from django.urls import path
 from .views import (
     MediaSearchAPIView,
+    MediaSearchBatchAPIView,
+    MediaFacetsAPIView,
     search_by_fotograf,
     search_by_datum,
     search_by_bildnummer,
+    search_cache_stats,
+    search_ready,
+    search_suggest,
+    close_search_cursor,
+    export_media,
 )
 
-urlpatterns = [
-    path('search/', MediaSearchAPIView.as_view(), name='media_search'),
-    path('search/by-fotograf/', search_by_fotograf, name='media_search_by_fotograf'),
-    path('search/by-datum/', search_by_datum, name='media_search_by_datum'),
-    path('search/by-bildnummer/', search_by_bildnummer, name='media_search_by_bildnummer'),
+# imago_backend/asgi.py turns this on so the search routes and /export/ are
+# served by the async views; WSGI deployments keep the sync DRF views.
+ASYNC_VIEWS = os.getenv("MEDIA_API_ASYNC_VIEWS", "").lower() in ("1", "true", "yes")
+
+if ASYNC_VIEWS:
+    from . import async_views
+
+    search_routes = [
+        path('search/', async_views.media_search, name='media_search'),
+        path('search/by-fotograf/', async_views.search_by_fotograf, name='media_search_by_fotograf'),
+        path('search/by-datum/', async_views.search_by_datum, name='media_search_by_datum'),
+        path('search/by-bildnummer/', async_views.search_by_bildnummer, name='media_search_by_bildnummer'),
+        path('export/', async_views.export_media, name='media_export'),
+    ]
+else:
+    search_routes = [
+        path('search/', MediaSearchAPIView.as_view(), name='media_search'),
+        path('search/by-fotograf/', search_by_fotograf, name='media_search_by_fotograf'),
+        path('search/by-datum/', search_by_datum, name='media_search_by_datum'),
+        path('search/by-bildnummer/', search_by_bildnummer, name='media_search_by_bildnummer'),
+        path('export/', export_media, name='media_export'),
+    ]
+
+urlpatterns = search_routes + [
+    path('search/batch/', MediaSearchBatchAPIView.as_view(), name='media_search_batch'),
+    path('search/facets/', MediaFacetsAPIView.as_view(), name='media_search_facets'),
+    path('search/suggest/', search_suggest, name='media_search_suggest'),
+    path('search/cursor/close/', close_search_cursor, name='media_search_cursor_close'),
+    path('cache/stats/', search_cache_stats, name='media_search_cache_stats'),
+    path('ready/', search_ready, name='media_ready'),
 ]
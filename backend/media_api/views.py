@@ -1,29 +1,79 @@
+import csv
 import logging
 from datetime import datetime
 
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from rest_framework.views import APIView
-from rest_framework.decorators import api_view, throttle_classes
+from rest_framework.decorators import api_view, renderer_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework import status, serializers
-from rest_framework.throttling import AnonRateThrottle
-
-from .search_utils import execute_media_search
+from rest_framework.exceptions import Throttled
+
+from .search_utils import (
+    execute_media_search,
+    execute_media_search_batch,
+    execute_bildnummer_lookup,
+    close_cursor,
+    iter_media_export,
+    execute_facet_search,
+)
+from .breaker import SearchUnavailable, es_breaker
+from .renderers import SEARCH_RENDERERS, dumps
+from .timing import phase, expose_metrics, set_query_type
+from .cache import result_cache, bildnummer_cache
+from .planner import RELEVANCE, SORT_MODES
+from .prefetch import prefetcher
+from .logs import queue_stats
+from .warmup import warmer
+from .singleflight import single_flight
+from .throttling import SlidingWindowAnonThrottle
+from .suggest import suggester
+from .es_client import (
+    resolve_source_fields,
+    parse_count_mode,
+    parse_facets,
+    FACET_FIELDS,
+    FACET_INTERVALS,
+)
+from .cursors import InvalidCursor, parse_search_after
+from .federation import federation_enabled, parse_composite_search_after
 
 logger = logging.getLogger(__name__)
 
-import json
-
-def parse_search_after_param(param):
-    import json
-    try:
-        parsed = json.loads(param)
-        if isinstance(parsed, list):
-            return parsed
-        else:
-            return [parsed]
-    except Exception:
-        # Fallback: treat as string
-        return [param]
+def throttle_response(request):
+    """Applies the anon throttle to a plain Django view; returns a 429 or None."""
+    throttle = SlidingWindowAnonThrottle()
+    if throttle.allow_request(request, None):
+        return None
+    detail = Throttled(throttle.wait()).detail
+    return JsonResponse({"detail": str(detail)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
+def unavailable_response(error, response_class=Response):
+    """The 503 for a search ES can't answer and the cache can't stand in for."""
+    response = response_class(
+        {'error': 'Search is temporarily unavailable.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    if error.retry_after:
+        response["Retry-After"] = str(error.retry_after)
+    return response
+
+def parse_pagination_search_after(raw):
+    """search_after as sort values, or per-target positions in federation mode."""
+    if federation_enabled():
+        return parse_composite_search_after(raw)
+    return parse_search_after(raw)
+
+def pagination_params(request):
+    """
+    Returns (search_after, cursor) from the query string. Raises
+    InvalidCursor for a malformed search_after or when both are given.
+    """
+    search_after = parse_pagination_search_after(request.GET.get("search_after"))
+    cursor = request.GET.get("cursor") or None
+    if search_after is not None and cursor is not None:
+        raise InvalidCursor('Use either "search_after" or "cursor", not both.')
+    return search_after, cursor
 
 
 class MediaSearchParamsSerializer(serializers.Serializer):
@@ -36,6 +86,41 @@ class MediaSearchParamsSerializer(serializers.Serializer):
     datum_bis = serializers.DateField(required=False)
     bildnummer = serializers.CharField(required=False)
     search_after = serializers.JSONField(required=False)
+    # Preset (card, detail, full) or comma-separated _source fields
+    fields = serializers.CharField(required=False, allow_blank=True)
+
+    # exact, lower_bound:N or none
+    count_mode = serializers.CharField(required=False, allow_blank=True)
+
+    # bildnummer (default, unscored) or relevance (scored, for text searches)
+    sort = serializers.ChoiceField(choices=SORT_MODES, required=False)
+
+    # Comma-separated fotografen, db, datum (or "all") for sidebar counts
+    facets = serializers.CharField(required=False, allow_blank=True)
+    facet_size = serializers.IntegerField(required=False, default=10, min_value=1, max_value=100)
+    facet_interval = serializers.ChoiceField(choices=FACET_INTERVALS, required=False, default="year")
+
+    def validate_facets(self, value):
+        try:
+            return parse_facets(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate_count_mode(self, value):
+        try:
+            parse_count_mode(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value or None
+
+    def validate_sort(self, value):
+        return value if value == RELEVANCE else None
+
+    def validate_fields(self, value):
+        try:
+            return resolve_source_fields(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
 
     def validate(self, data):
         if 'datum' in data:
@@ -43,12 +128,88 @@ class MediaSearchParamsSerializer(serializers.Serializer):
             data['datum_bis'] = data['datum']
         return data
 
+def media_search_kwargs(params, search_after=None):
+    """
+    Maps validated MediaSearchParamsSerializer data onto
+    execute_media_search arguments, interpreting `q` as a date or a
+    bildnummer where it looks like one.
+    """
+    query = params.get('q', '')
+    datum_von = params.get('datum_von')
+    datum_bis = params.get('datum_bis')
+
+    # ✨ 1. Try to interpret q as a date string (YYYY-MM-DD)
+    is_date_query = False
+    is_bildnummer_query = False
+
+    try:
+        parsed_date = datetime.strptime(query, "%Y-%m-%d").date()
+        datum_von = datum_bis = parsed_date
+        is_date_query = True
+    except ValueError:
+        pass
+
+    # ✨ 2. Try to interpret q as a bildnummer (exact number match)
+    if query.isdigit():
+        is_bildnummer_query = True
+
+    # ✨ 3. Run search depending on type
+    if is_bildnummer_query:
+        return dict(
+            bildnummer=query,
+            page=params['page'],
+            page_size=params['page_size'],
+            search_after=search_after,
+            fields=params.get('fields'),
+            count_mode=params.get('count_mode')
+        )
+
+    if is_date_query:
+        return dict(
+            datum_von=datum_von,
+            datum_bis=datum_bis,
+            page=params['page'],
+            page_size=params['page_size'],
+            search_after=search_after,
+            fields=params.get('fields'),
+            count_mode=params.get('count_mode')
+        )
+
+    return dict(
+        query=query,
+        fotografen=params.get('fotograf') or None,
+        datum_von=datum_von,
+        datum_bis=datum_bis,
+        page=params['page'],
+        page_size=params['page_size'],
+        search_after=search_after,
+        fields=params.get('fields'),
+        count_mode=params.get('count_mode'),
+        sort=params.get('sort')
+    )
+
+def facet_search_kwargs(params, search_kwargs, facets=None):
+    """execute_facet_search arguments for the filters of a search."""
+    return dict(
+        query=search_kwargs.get('query'),
+        fotografen=search_kwargs.get('fotografen'),
+        datum_von=search_kwargs.get('datum_von'),
+        datum_bis=search_kwargs.get('datum_bis'),
+        bildnummer=search_kwargs.get('bildnummer'),
+        facets=facets or params.get('facets') or FACET_FIELDS,
+        facet_size=params['facet_size'],
+        interval=params['facet_interval']
+    )
+
 class MediaSearchAPIView(APIView):
-    throttle_classes = [AnonRateThrottle]
+    throttle_classes = [SlidingWindowAnonThrottle]
+    renderer_classes = SEARCH_RENDERERS
 
     def get(self, request):
-        serializer = MediaSearchParamsSerializer(data=request.GET)
-        if not serializer.is_valid():
+        with phase("validate"):
+            serializer = MediaSearchParamsSerializer(data=request.GET)
+            valid = serializer.is_valid()
+        if not valid:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         params = serializer.validated_data
@@ -62,83 +223,158 @@ class MediaSearchAPIView(APIView):
                 )
 
         try:
-            raw_search_after = request.GET.get("search_after")
-            search_after = parse_search_after_param(raw_search_after) if raw_search_after else None
+            search_after, cursor = pagination_params(request)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            query = params.get('q', '')
-            datum_von = params.get('datum_von')
-            datum_bis = params.get('datum_bis')
+        try:
+            search_kwargs = media_search_kwargs(params, search_after)
+            result = execute_media_search(cursor=cursor, **search_kwargs)
+
+            # Opt-in sidebar counts, cached apart from the page of hits
+            if params.get('facets'):
+                try:
+                    facets = execute_facet_search(**facet_search_kwargs(params, search_kwargs))["facets"]
+                except SearchUnavailable:
+                    # The page of hits is still worth serving without its counts
+                    facets = None
+                result = {**result, "facets": facets}
 
-            # ✨ 1. Try to interpret q as a date string (YYYY-MM-DD)
-            from datetime import datetime
+            return Response(result, status=status.HTTP_200_OK)
 
-            is_date_query = False
-            is_bildnummer_query = False
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except SearchUnavailable as e:
+            return unavailable_response(e)
+        except Exception:
+            logger.exception("Search failed")
+            return Response({'error': 'Failed to search media data.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            try:
-                parsed_date = datetime.strptime(query, "%Y-%m-%d").date()
-                datum_von = datum_bis = parsed_date
-                is_date_query = True
-            except ValueError:
-                pass
-
-            # ✨ 2. Try to interpret q as a bildnummer (exact number match)
-            if query.isdigit():
-                is_bildnummer_query = True
-
-            # ✨ 3. Run search depending on type
-            if is_bildnummer_query:
-                result = execute_media_search(
-                    bildnummer=query,
-                    page=params['page'],
-                    page_size=params['page_size'],
-                    search_after=search_after
-                )
 
-            elif is_date_query:
-                result = execute_media_search(
-                    datum_von=datum_von,
-                    datum_bis=datum_bis,
-                    page=params['page'],
-                    page_size=params['page_size'],
-                    search_after=search_after
-                )
+class MediaFacetsAPIView(APIView):
+    """
+    Filter sidebar counts without hits: terms aggregations on fotografen
+    and db and a date histogram on datum, for the /search/ filters.
+    `facets` selects a subset (default all), `facet_size` the number of
+    terms and `facet_interval` the histogram bucket size.
+    """
+    throttle_classes = [SlidingWindowAnonThrottle]
+    renderer_classes = SEARCH_RENDERERS
 
-            else:
-                result = execute_media_search(
-                    query=query,
-                    fotografen=params.get('fotograf') or None,
-                    datum_von=datum_von,
-                    datum_bis=datum_bis,
-                    page=params['page'],
-                    page_size=params['page_size'],
-                    search_after=search_after
-                )
+    def get(self, request):
+        serializer = MediaSearchParamsSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+        params = serializer.validated_data
+        if params.get('datum_von') and params.get('datum_bis') and params['datum_von'] > params['datum_bis']:
+            return Response(
+                {'error': '"datum_von" must be before or equal to "datum_bis".'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            result = execute_facet_search(**facet_search_kwargs(params, media_search_kwargs(params)))
             return Response(result, status=status.HTTP_200_OK)
+        except SearchUnavailable as e:
+            return unavailable_response(e)
+        except Exception:
+            logger.exception("Facet search failed")
+            return Response({'error': 'Failed to load facets.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# Upper bound on sub-searches per batch request
+MAX_BATCH_SEARCHES = 50
+
+class MediaSearchBatchAPIView(APIView):
+    """
+    Runs up to MAX_BATCH_SEARCHES searches in one request and one ES
+    `_msearch` round trip. Accepts a JSON list of search parameter objects
+    (or {"searches": [...]}) using the same fields as /search/, and returns
+    {"responses": [...]} in request order with a per-item "status".
+    """
+    throttle_classes = [SlidingWindowAnonThrottle]
+    renderer_classes = SEARCH_RENDERERS
+
+    def throttle_cost(self, request):
+        """Each search of the batch counts against the quota like a /search/ call."""
+        searches = request.data.get("searches") if isinstance(request.data, dict) else request.data
+        if not isinstance(searches, list):
+            return 1
+        return min(max(len(searches), 1), MAX_BATCH_SEARCHES)
+
+    def post(self, request):
+        searches = request.data.get("searches") if isinstance(request.data, dict) else request.data
+        if not isinstance(searches, list) or not searches:
+            return Response(
+                {'error': 'Expected a non-empty list of searches.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(searches) > MAX_BATCH_SEARCHES:
+            return Response(
+                {'error': f'At most {MAX_BATCH_SEARCHES} searches are allowed per batch.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        responses = [None] * len(searches)
+        valid = []
+        for index, item in enumerate(searches):
+            serializer = MediaSearchParamsSerializer(data=item if isinstance(item, dict) else {})
+            if not isinstance(item, dict) or not serializer.is_valid():
+                errors = serializer.errors if isinstance(item, dict) else {'error': 'Expected an object.'}
+                responses[index] = {"status": status.HTTP_400_BAD_REQUEST, "errors": errors}
+                continue
+
+            params = serializer.validated_data
+            if params.get('datum_von') and params.get('datum_bis') and params['datum_von'] > params['datum_bis']:
+                responses[index] = {
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "errors": {'error': '"datum_von" must be before or equal to "datum_bis".'}
+                }
+                continue
 
-        except Exception as e:
-            logger.error(f"Search failed: {str(e)}")
+            try:
+                search_after = parse_pagination_search_after(params.get('search_after'))
+            except InvalidCursor as e:
+                responses[index] = {"status": status.HTTP_400_BAD_REQUEST, "errors": {'error': str(e)}}
+                continue
+            valid.append((index, media_search_kwargs(params, search_after)))
+
+        try:
+            outcomes = execute_media_search_batch([kwargs for _, kwargs in valid])
+        except Exception:
+            logger.exception("Batch search failed")
             return Response({'error': 'Failed to search media data.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        for (index, _), outcome in zip(valid, outcomes):
+            if "error" in outcome:
+                responses[index] = {"status": status.HTTP_502_BAD_GATEWAY, "error": outcome["error"]}
+            else:
+                responses[index] = {"status": status.HTTP_200_OK, **outcome}
+
+        return Response({"responses": responses}, status=status.HTTP_200_OK)
+
 
 @api_view(['GET'])
-@throttle_classes([AnonRateThrottle])
+@throttle_classes([SlidingWindowAnonThrottle])
+@renderer_classes(SEARCH_RENDERERS)
 def search_by_fotograf(request):
+    try:
+        fields = resolve_source_fields(request.GET.get("fields"))
+        count_mode = request.GET.get("count_mode") or None
+        parse_count_mode(count_mode)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    try:
+        search_after, cursor = pagination_params(request)
+    except InvalidCursor as e:
+        return Response({"error": str(e)}, status=400)
+
     fotograf = request.GET.get("fotograf")
     page = int(request.GET.get("page", 1))
     page_size = int(request.GET.get("page_size", 10))
 
-    raw_search_after = request.GET.get("search_after")
-    search_after = None
-    if raw_search_after:
-        try:
-            search_after = json.loads(raw_search_after)
-            if not isinstance(search_after, list):
-                search_after = [search_after]
-        except json.JSONDecodeError:
-            search_after = [raw_search_after]
-
     if not fotograf:
         return Response({"error": "Missing fotograf parameter"}, status=400)
 
@@ -147,24 +383,41 @@ def search_by_fotograf(request):
             page=page,
             page_size=page_size,
             fotografen=[fotograf],  # ✅ Must be a list
-            search_after=search_after
+            search_after=search_after,
+            fields=fields,
+            cursor=cursor,
+            count_mode=count_mode
         )
         return Response(results)
+    except InvalidCursor as e:
+        return Response({"error": str(e)}, status=400)
+    except SearchUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         logger.exception("Error in search_by_fotograf:")
         return Response({"error": str(e)}, status=500)
 
 @api_view(["GET"])
-@throttle_classes([AnonRateThrottle])
+@throttle_classes([SlidingWindowAnonThrottle])
+@renderer_classes(SEARCH_RENDERERS)
 def search_by_datum(request):
+    try:
+        fields = resolve_source_fields(request.GET.get("fields"))
+        count_mode = request.GET.get("count_mode") or None
+        parse_count_mode(count_mode)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    try:
+        search_after, cursor = pagination_params(request)
+    except InvalidCursor as e:
+        return Response({"error": str(e)}, status=400)
+
     try:
         datum_von_raw = request.GET.get("datum_von")
         datum_bis_raw = request.GET.get("datum_bis")
         page = int(request.GET.get("page", 1))
         page_size = int(request.GET.get("page_size", 10))
-        raw_search_after = request.GET.get("search_after")
-
-        search_after = parse_search_after_param(raw_search_after) if raw_search_after else None
 
         # Parse dates
         datum_von = datetime.strptime(datum_von_raw, "%Y-%m-%d").date() if datum_von_raw else None
@@ -179,29 +432,37 @@ def search_by_datum(request):
             datum_bis=datum_bis,
             page=page,
             page_size=page_size,
-            search_after=search_after
+            search_after=search_after,
+            fields=fields,
+            cursor=cursor,
+            count_mode=count_mode
         )
 
         return Response(result)
 
+    except InvalidCursor as e:
+        return Response({"error": str(e)}, status=400)
+    except SearchUnavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         logger.exception("Search by datum failed:")
         return Response({'error': 'Search by datum failed.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(["GET"])
-@throttle_classes([AnonRateThrottle])
+@throttle_classes([SlidingWindowAnonThrottle])
+@renderer_classes(SEARCH_RENDERERS)
 def search_by_bildnummer(request):
+    try:
+        fields = resolve_source_fields(request.GET.get("fields"))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
     bildnummer = request.GET.get("bildnummer")
     if not bildnummer:
         return Response({"error": "Missing bildnummer parameter"}, status=400)
 
     try:
-        result = execute_media_search(
-            bildnummer=bildnummer,
-            page=1,
-            page_size=1,
-            search_after=None
-        )
+        result = execute_bildnummer_lookup(bildnummer, page_size=1, fields=fields)
 
         results = result.get("results", [])
         count = result.get("count", len(results))
@@ -221,6 +482,177 @@ def search_by_bildnummer(request):
 
         return Response(response_data)
 
-    except Exception as e:
-        logger.error(f"Search by bildnummer failed: {str(e)}")
-        return Response({'error': 'Search by bildnummer failed.'}, status=500)
\ No newline at end of file
+    except SearchUnavailable as e:
+        return unavailable_response(e)
+    except Exception:
+        logger.exception("Search by bildnummer failed")
+        return Response({'error': 'Search by bildnummer failed.'}, status=500)
+
+MAX_SUGGESTIONS = 50
+
+@api_view(["GET"])
+@throttle_classes([SlidingWindowAnonThrottle])
+@renderer_classes(SEARCH_RENDERERS)
+def search_suggest(request):
+    """
+    Search-box completions for a prefix `q`: photographer names (matched
+    on any word) and frequent suchtext terms, from memory without an ES
+    call. `limit` caps each list (default 10).
+    """
+    set_query_type("suggest")
+    try:
+        limit = int(request.GET.get("limit", 10))
+    except ValueError:
+        return Response({"error": "limit must be an integer."}, status=400)
+    if not 1 <= limit <= MAX_SUGGESTIONS:
+        return Response({"error": f"limit must be between 1 and {MAX_SUGGESTIONS}."}, status=400)
+
+    prefix = request.GET.get("q", "")
+    return Response({"q": prefix, **suggester.suggest(prefix, limit)})
+
+@api_view(["GET"])
+def search_cache_stats(request):
+    """Per-worker hit/miss counters of the search result caches."""
+    return Response({
+        **result_cache.stats(),
+        "bildnummer": bildnummer_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "breaker": es_breaker.stats(),
+        "suggest": suggester.stats(),
+        "prefetch": prefetcher.stats(),
+        "logging": queue_stats(),
+    })
+
+@api_view(["GET"])
+@throttle_classes([])
+def search_ready(request):
+    """
+    Readiness check for the load balancer: 200 once this worker has warmed
+    up its ES connections (see warmup.py), 503 until then.
+    """
+    warmer.start()
+    ready = warmer.ready()
+    return Response(
+        {"ready": ready, **warmer.stats()},
+        status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+@api_view(["POST"])
+@throttle_classes([SlidingWindowAnonThrottle])
+def close_search_cursor(request):
+    """Closes the point in time behind a cursor the client is done with."""
+    cursor = request.data.get("cursor") if isinstance(request.data, dict) else None
+    if not cursor:
+        return Response({"error": "Missing cursor parameter"}, status=400)
+
+    try:
+        close_cursor(cursor)
+    except InvalidCursor as e:
+        return Response({"error": str(e)}, status=400)
+    except SearchUnavailable as e:
+        return unavailable_response(e)
+    except Exception:
+        logger.exception("Closing cursor failed")
+        return Response({'error': 'Closing cursor failed.'}, status=500)
+    return Response({"closed": True})
+
+# Columns of a CSV export, in order; projected-away fields are left empty
+EXPORT_COLUMNS = ["bildnummer", "db", "datum", "fotografen", "hoehe", "breite", "suchtext", "thumbnail_url"]
+EXPORT_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+MAX_EXPORT_BATCH_SIZE = 10000
+
+class _LineBuffer:
+    """File-like sink that hands csv.writer output straight back."""
+
+    def write(self, value):
+        return value
+
+# Both close `rows` when the response is closed early (client disconnect)
+
+def _ndjson_lines(rows):
+    try:
+        for row in rows:
+            yield dumps(row) + b"\n"
+    finally:
+        rows.close()
+
+def _csv_lines(rows):
+    writer = csv.writer(_LineBuffer())
+    try:
+        yield writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            yield writer.writerow([row.get(column, "") for column in EXPORT_COLUMNS])
+    finally:
+        rows.close()
+
+def export_params(request):
+    """
+    Validated (format, batch_size, limit, search kwargs) of an export
+    request, or the 400 response to return instead.
+    """
+    export_format = request.GET.get("format", "ndjson")
+    if export_format not in EXPORT_CONTENT_TYPES:
+        return JsonResponse({"error": 'format must be "ndjson" or "csv".'}, status=400)
+
+    serializer = MediaSearchParamsSerializer(data=request.GET)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    params = serializer.validated_data
+
+    try:
+        batch_size = min(int(request.GET.get("batch_size", 1000)), MAX_EXPORT_BATCH_SIZE)
+        limit = int(request.GET["limit"]) if request.GET.get("limit") else None
+    except ValueError:
+        return JsonResponse({"error": "batch_size and limit must be integers."}, status=400)
+    if batch_size < 1 or (limit is not None and limit < 1):
+        return JsonResponse({"error": "batch_size and limit must be positive."}, status=400)
+
+    search_kwargs = media_search_kwargs(params)
+    for name in ("page", "page_size", "search_after", "count_mode", "sort"):
+        search_kwargs.pop(name, None)
+    return export_format, batch_size, limit, search_kwargs
+
+def export_lines(rows, export_format):
+    return _csv_lines(rows) if export_format == "csv" else _ndjson_lines(rows)
+
+def export_response(lines, export_format):
+    response = StreamingHttpResponse(lines, content_type=EXPORT_CONTENT_TYPES[export_format])
+    response["Content-Disposition"] = f'attachment; filename="media_export.{export_format}"'
+    return response
+
+# Plain Django view: DRF would treat `format` as a renderer override.
+# ASGI deployments route /export/ to async_views.export_media instead,
+# since Django buffers sync streaming content under ASGI.
+@require_GET
+def export_media(request):
+    """
+    Streams every hit of a search as NDJSON (default) or CSV. Accepts the
+    /search/ filter parameters plus `format`, `fields`, `batch_size` and
+    `limit`; results are paged internally over a point in time.
+    """
+    throttled = throttle_response(request)
+    if throttled is not None:
+        return throttled
+
+    spec = export_params(request)
+    if isinstance(spec, HttpResponse):
+        return spec
+    export_format, batch_size, limit, search_kwargs = spec
+
+    try:
+        rows = iter_media_export(batch_size=batch_size, limit=limit, **search_kwargs)
+    except SearchUnavailable as e:
+        return unavailable_response(e, JsonResponse)
+    except Exception:
+        logger.exception("Export failed")
+        return JsonResponse({'error': 'Failed to export media data.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return export_response(export_lines(rows, export_format), export_format)
+
+@require_GET
+def prometheus_metrics(request):
+    """Per-phase search latency histograms of this process, Prometheus text format."""
+    return HttpResponse(expose_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
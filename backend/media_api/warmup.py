@@ -0,0 +1,134 @@
+"""
+Worker warm-up and the readiness check behind /api/media/ready/.
+
+A fresh worker has no ES connections yet, and ES has not seen its queries
+recently. Without warm-up, the first searches after a deploy pay for TCP
+and TLS handshakes and cold caches. warm_up():
+1. opens CONNECTIONS pooled connections (ES_CONNECTIONS_PER_NODE per node
+   by default) by pinging the cluster concurrently, then
+2. runs the representative QUERIES through es_client.fetch_media.
+
+`warmer` warms each process up once, on a background thread.
+imago_backend/wsgi.py and asgi.py start it when a worker loads the app.
+/api/media/ready/ starts it too, which covers workers forked from a
+`--preload` master. The endpoint answers 503 until warm-up has finished,
+so a load balancer that checks it only sends traffic to warm workers. A
+failed attempt (ES unreachable) is retried every RETRY_INTERVAL seconds.
+
+The async client's connections belong to the server's event loop and are
+not opened here; the queries still warm ES's caches for the async views.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import es_client
+from .breaker import SearchUnavailable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WARMUP_SETTINGS = {
+    "ENABLED": True,
+    # Connections to open up front; None is ES_CONNECTIONS_PER_NODE per node
+    "CONNECTIONS": None,
+    # es_client.fetch_media keyword arguments, run in order
+    "QUERIES": [
+        {},
+        {"query": "Berlin"},
+        {"datum_von": "2020-01-01", "datum_bis": "2020-12-31"},
+    ],
+    # Seconds between failed attempts
+    "RETRY_INTERVAL": 5,
+}
+
+PENDING = "pending"
+RUNNING = "running"
+READY = "ready"
+
+
+def warmup_settings():
+    configured = getattr(settings, "MEDIA_SEARCH_WARMUP", {})
+    return {**DEFAULT_WARMUP_SETTINGS, **configured}
+
+
+def open_connections(client, count):
+    """Sends `count` pings at once, so the pool opens as many connections."""
+    with ThreadPoolExecutor(max_workers=count, thread_name_prefix="warmup") as pool:
+        answered = list(pool.map(lambda _: client.ping(), range(count)))
+    if not all(answered):
+        raise SearchUnavailable("Elasticsearch did not answer the warm-up pings.")
+
+
+def warm_up(config=None):
+    """Opens pooled connections and runs the warm-up queries; raises when ES can't be reached."""
+    config = config or warmup_settings()
+    count = config["CONNECTIONS"] or es_client.ES_CONNECTIONS_PER_NODE * max(1, len(es_client.ES_HOSTS))
+    open_connections(es_client.get_es(), count)
+    for search in config["QUERIES"]:
+        es_client.fetch_media(**search)
+
+
+class Warmer:
+    """Runs warm_up once per process on a background thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.state = PENDING
+        self.attempts = 0
+        self.error = None
+        self.seconds = None
+
+    def _after_fork(self):
+        # A preloading parent's warm-up says nothing about the child's connections
+        self._lock = threading.Lock()
+        self._reset()
+
+    def start(self):
+        """Starts warming up this process unless it already has; returns the state."""
+        if not warmup_settings()["ENABLED"]:
+            return READY
+        with self._lock:
+            if self.state == PENDING:
+                self.state = RUNNING
+                threading.Thread(target=self._run, name="search-warmup", daemon=True).start()
+            return self.state
+
+    def _run(self):
+        config = warmup_settings()
+        started = time.perf_counter()
+        while True:
+            self.attempts += 1
+            try:
+                warm_up(config)
+                break
+            except Exception as e:
+                self.error = str(e)
+                logger.warning("Warm-up attempt %s failed: %s", self.attempts, e)
+                time.sleep(config["RETRY_INTERVAL"])
+        self.seconds = time.perf_counter() - started
+        self.error = None
+        self.state = READY
+        logger.info("Warm-up done in %.2fs after %s attempt(s)", self.seconds, self.attempts)
+
+    def ready(self):
+        return not warmup_settings()["ENABLED"] or self.state == READY
+
+    def stats(self):
+        return {
+            "state": READY if self.ready() else self.state,
+            "attempts": self.attempts,
+            "error": self.error,
+            "seconds": self.seconds,
+            "pid": os.getpid(),
+        }
+
+
+warmer = Warmer()
+os.register_at_fork(after_in_child=warmer._after_fork)